@@ -0,0 +1,272 @@
+"""
+Micro-benchmarks of the parsers and of the `spotify_api.Client` methods,
+run offline against the mock Web API of benchmarks/mock_spotify.py.
+
+- parse: time per call of each utils.parse_* function on mock responses
+- client: latency of each Client method with empty caches (cold) and right
+  after (warm), and the number of upstream requests each one sends
+
+Results are compared with the stored baselines (benchmarks/baselines.json): a
+method sending more requests than its baseline, or slower than `--tolerance`
+times its baseline, is reported as a regression and the exit status is 1.
+
+    uv run python benchmarks/bench_client.py
+    uv run python benchmarks/bench_client.py --update     # store new baselines
+    uv run python benchmarks/bench_client.py --suite client --latency-ms 50
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from mock_spotify import Catalog, MockSpotify, spotify_id
+
+HERE = Path(__file__).resolve().parent
+SRC = HERE.parent / "src"
+BASELINES = HERE / "baselines.json"
+
+# Temps minimal tolérable en plus de la marge relative, pour les mesures courtes
+SLACK_MS = 2.0
+
+
+def load_package(api_url: str, workdir: Path):
+    """Imports the package configured for the mock server, without OAuth."""
+    os.environ.update(
+        SPOTIFY_CLIENT_ID="bench",
+        SPOTIFY_CLIENT_SECRET="bench",
+        SPOTIFY_REDIRECT_URI="http://127.0.0.1:8888/callback",
+        SPOTIFY_API_URL=api_url,
+        SPOTIFY_LIBRARY_DB=str(workdir / "library.db"),
+        SPOTIFY_LOG_FILE=os.devnull,
+        # Pas de limitation de débit : on mesure le client, pas l'ordonnanceur
+        SPOTIFY_RATE_LIMIT="1000000",
+        SPOTIFY_RATE_BURST="1000000",
+    )
+    # Jeton factice dans le cache de spotipy (.cache du répertoire courant)
+    os.chdir(workdir)
+    token = {
+        "access_token": "bench",
+        "token_type": "Bearer",
+        "expires_in": 3600,
+        "refresh_token": "bench",
+        "scope": "user-library-read user-read-playback-state "
+        "user-modify-playback-state user-read-currently-playing user-top-read "
+        "playlist-modify-public playlist-modify-private",
+        "expires_at": int(time.time()) + 86400,
+    }
+    (workdir / ".cache").write_text(json.dumps(token))
+
+    sys.path.insert(0, str(SRC))
+    from spotify_mcp import scope, spotify_api, utils
+
+    return spotify_api, scope, utils
+
+
+def bench_parsers(utils, repeat: int) -> dict:
+    catalog = Catalog()
+    username = "Bench User"
+    search = catalog.search("bench", "track,album,artist,playlist", 20)
+    # Les objets sont construits d'avance : seul le parsing est mesuré
+    inputs = {
+        "parse_track": (catalog.track(1),),
+        "parse_track detailed": (catalog.track(1), True),
+        "parse_artist detailed": (catalog.artist(1, simplified=False), True),
+        "parse_album detailed": (catalog.album(1, simplified=False), True),
+        "parse_playlist detailed": (
+            catalog.playlist(1, simplified=False),
+            username,
+            True,
+        ),
+        "parse_playlist_track": (catalog.playlist_tracks(1)[0],),
+        "parse_search_results": (search, "track,album,artist,playlist", username),
+    }
+    results = {}
+    for name, args in inputs.items():
+        func = getattr(utils, name.split()[0])
+        number = 1000
+        best = min(
+            _timed(lambda: [func(*args) for _ in range(number)]) for _ in range(repeat)
+        )
+        results[name] = {"us": round(best / number * 1e6, 2)}
+    return results
+
+
+def _timed(run) -> float:
+    started = time.perf_counter()
+    run()
+    return time.perf_counter() - started
+
+
+def client_cases(client) -> dict:
+    """Name -> factory of the coroutine to measure."""
+    track = f"spotify:track:{spotify_id('tr', 42)}"
+    album = f"spotify:album:{spotify_id('al', 7)}"
+    artist = f"spotify:artist:{spotify_id('ar', 3)}"
+    playlist = f"spotify:playlist:{spotify_id('pl', 3)}"
+    player_playlist = f"spotify:playlist:{spotify_id('pl', 0)}"
+    return {
+        "search": lambda: client.search("bench", "track", limit=10),
+        "search all types": lambda: client.search(
+            "bench", "track,album,artist,playlist", limit=10
+        ),
+        "get_info track": lambda: client.get_info(track),
+        "get_info album": lambda: client.get_info(album),
+        "get_info artist": lambda: client.get_info(artist),
+        "get_info playlist": lambda: client.get_info(playlist),
+        "get_infos 10 tracks 5 albums": lambda: client.get_infos(
+            [f"spotify:track:{spotify_id('tr', n)}" for n in range(10)]
+            + [f"spotify:album:{spotify_id('al', n)}" for n in range(5)]
+        ),
+        "get_top_items artists": lambda: client.get_top_items("artists"),
+        "get_top_items tracks": lambda: client.get_top_items("tracks"),
+        "get_top_items all tracks": lambda: client.get_top_items("tracks", "all"),
+        "get_current_track": lambda: client.get_current_track(),
+        "get_now_playing": lambda: client.get_now_playing(),
+        "get_queue": lambda: client.get_queue(),
+        "start_playback": lambda: client.start_playback(player_playlist),
+        "pause_playback": lambda: client.pause_playback(),
+        "skip_track 1": lambda: client.skip_track(1),
+        "skip_track 5": lambda: client.skip_track(5),
+        "add_to_queue": lambda: client.add_to_queue(spotify_id("tr", 9)),
+        "get_user_playlists": lambda: client.get_user_playlists(),
+        "find_track": lambda: client.find_track("bench"),
+        "create_playlist": lambda: client.create_playlist("Bench"),
+        "search_and_add 20 queries": lambda: client.search_and_add(
+            spotify_id("pl", 1), [f"query {n}" for n in range(20)]
+        ),
+        "sync_library full": lambda: client.sync_library(full=True),
+        "recommendations": lambda: client.recommendations(tracks=[track]),
+    }
+
+
+def reset(client):
+    """Empties the client's caches, for a cold measurement."""
+    client.cache.clear()
+    client.devices.invalidate()
+    client.playback.invalidate()
+    client.playlists.invalidate()
+    client.recommender.invalidate()
+    client.username = None
+
+
+async def bench_client(spotify_api, scope, repeat: int) -> dict:
+    logger = logging.getLogger("bench")
+    client = await asyncio.to_thread(spotify_api.Client, logger)
+    results = {}
+    try:
+        for name, make in client_cases(client).items():
+            cold, warm = [], []
+            for _ in range(repeat):
+                reset(client)
+                for times in (cold, warm):
+                    with scope.call_scope() as call:
+                        started = time.perf_counter()
+                        await make()
+                        times.append((time.perf_counter() - started, call.upstream))
+            results[name] = {
+                "cold_ms": round(statistics.median(t for t, _ in cold) * 1000, 2),
+                "warm_ms": round(statistics.median(t for t, _ in warm) * 1000, 2),
+                "cold_requests": max(n for _, n in cold),
+                "warm_requests": max(n for _, n in warm),
+            }
+            # La file de lecture ajoutée par add_to_queue ne doit pas gêner la suite
+            client.playback.invalidate()
+    finally:
+        await client.close()
+        await client.pool.aclose()
+    return results
+
+
+def compare(results: dict, baselines: dict, tolerance: float) -> list[str]:
+    """Returns the regressions of `results` against `baselines`."""
+    regressions = []
+    for suite, rows in results.items():
+        for name, row in rows.items():
+            base = baselines.get(suite, {}).get(name)
+            if base is None:
+                continue
+            for key, value in row.items():
+                if key not in base:
+                    continue
+                if key.endswith("_requests"):
+                    worse = value > base[key]
+                elif key == "us":
+                    worse = value > base[key] * tolerance
+                else:
+                    worse = value > base[key] * tolerance + SLACK_MS
+                if worse:
+                    regressions.append(
+                        f"{suite} / {name}: {key} {base[key]} -> {value}"
+                    )
+    return regressions
+
+
+def print_table(results: dict):
+    for suite, rows in results.items():
+        columns = list(next(iter(rows.values())))
+        print(f"\n{suite:30}" + "".join(f"{c:>15}" for c in columns))
+        for name, row in rows.items():
+            print(f"{name:30}" + "".join(f"{row[c]:>15}" for c in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--suite", choices=["parse", "client", "all"], default="all")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=20.0,
+        help="latency of the mock server, per response",
+    )
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument(
+        "--update", action="store_true", help="store the results as baselines"
+    )
+    args = parser.parse_args()
+
+    results = {}
+    with MockSpotify(latency=args.latency_ms / 1000) as mock:
+        with tempfile.TemporaryDirectory() as workdir:
+            spotify_api, scope, utils = load_package(mock.url, Path(workdir))
+            if args.suite in ("parse", "all"):
+                results["parse"] = bench_parsers(utils, args.repeat)
+            if args.suite in ("client", "all"):
+                results["client"] = asyncio.run(
+                    bench_client(spotify_api, scope, args.repeat)
+                )
+            os.chdir(HERE)
+    print_table(results)
+
+    if args.update:
+        baselines = json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+        baselines.update(results)
+        baselines["latency_ms"] = args.latency_ms
+        BASELINES.write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"\nBaselines written to {BASELINES}")
+        return
+
+    if not BASELINES.exists():
+        print("\nNo baselines yet: run with --update to store them")
+        return
+    baselines = json.loads(BASELINES.read_text())
+    if "client" in results and baselines.get("latency_ms") != args.latency_ms:
+        print(f"\nBaselines were measured with --latency-ms {baselines['latency_ms']}")
+        results.pop("client")
+    regressions = compare(results, baselines, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print("\nNo regression against the baselines")
+
+
+if __name__ == "__main__":
+    main()
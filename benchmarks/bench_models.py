@@ -0,0 +1,199 @@
+"""
+Decoding benchmark: a 10k-track playlist, fetched as 100 pages of 100 items.
+
+Compares, per page, the dict path (json.loads + utils.parse_playlist_track)
+with the models path (models.decode_page + to_dict). Reports CPU time and the
+peak memory allocated while decoding and parsing every page.
+
+    uv run python benchmarks/bench_models.py            # models backend in use
+    uv run python benchmarks/bench_models.py --no-msgspec
+"""
+
+import argparse
+import json
+import random
+import string
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+MARKETS = [
+    "".join(p)
+    for p in zip(string.ascii_uppercase * 7, string.ascii_uppercase[::-1] * 7)
+][:180]
+
+
+def load_package():
+    sys.path.insert(0, str(SRC))
+    from spotify_mcp import models, utils
+
+    return models, utils
+
+
+def spotify_id(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_letters + string.digits, k=22))
+
+
+def artist(rng: random.Random) -> dict:
+    artist_id = spotify_id(rng)
+    return {
+        "external_urls": {"spotify": f"https://open.spotify.com/artist/{artist_id}"},
+        "href": f"https://api.spotify.com/v1/artists/{artist_id}",
+        "id": artist_id,
+        "name": f"Artist {artist_id[:6]}",
+        "type": "artist",
+        "uri": f"spotify:artist:{artist_id}",
+    }
+
+
+def playlist_item(rng: random.Random, position: int) -> dict:
+    """A playlist item shaped like the Web API's, unused fields included."""
+    track_id, album_id = spotify_id(rng), spotify_id(rng)
+    artists = [artist(rng) for _ in range(rng.choice([1, 1, 2, 3]))]
+    return {
+        "added_at": "2024-05-01T10:00:00Z",
+        "added_by": {"id": "user", "type": "user", "uri": "spotify:user:user"},
+        "is_local": False,
+        "primary_color": None,
+        "video_thumbnail": {"url": None},
+        "track": {
+            "album": {
+                "album_type": "album",
+                "artists": artists[:1],
+                "available_markets": MARKETS,
+                "external_urls": {
+                    "spotify": f"https://open.spotify.com/album/{album_id}"
+                },
+                "href": f"https://api.spotify.com/v1/albums/{album_id}",
+                "id": album_id,
+                "images": [
+                    {
+                        "height": size,
+                        "width": size,
+                        "url": f"https://i.scdn.co/image/{album_id}{size}",
+                    }
+                    for size in (640, 300, 64)
+                ],
+                "name": f"Album {album_id[:6]}",
+                "release_date": "2020-01-01",
+                "release_date_precision": "day",
+                "total_tracks": 12,
+                "type": "album",
+                "uri": f"spotify:album:{album_id}",
+            },
+            "artists": artists,
+            "available_markets": MARKETS,
+            "disc_number": 1,
+            "duration_ms": 180000 + position,
+            "explicit": False,
+            "external_ids": {"isrc": f"USRC1{position:07d}"},
+            "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+            "href": f"https://api.spotify.com/v1/tracks/{track_id}",
+            "id": track_id,
+            "is_local": False,
+            "name": f"Track {position}",
+            "popularity": rng.randint(0, 100),
+            "preview_url": None,
+            "track_number": position % 12 + 1,
+            "type": "track",
+            "uri": f"spotify:track:{track_id}",
+        },
+    }
+
+
+def fixture(n_tracks: int, page_size: int) -> list[bytes]:
+    rng = random.Random(42)
+    items = [playlist_item(rng, i) for i in range(n_tracks)]
+    pages = []
+    for offset in range(0, n_tracks, page_size):
+        next_offset = offset + page_size
+        pages.append(
+            json.dumps(
+                {
+                    "href": "https://api.spotify.com/v1/playlists/p/tracks",
+                    "items": items[offset:next_offset],
+                    "limit": page_size,
+                    "next": (
+                        f"https://api.spotify.com/v1/playlists/p/tracks?offset={next_offset}"
+                        if next_offset < n_tracks
+                        else None
+                    ),
+                    "offset": offset,
+                    "previous": None,
+                    "total": n_tracks,
+                }
+            ).encode()
+        )
+    return pages
+
+
+def measure(name: str, run, pages: list[bytes], repeat: int) -> dict:
+    run(pages)  # chauffe, et remplit les caches de décodeurs
+    cpu = []
+    for _ in range(repeat):
+        started = time.process_time()
+        run(pages)
+        cpu.append(time.process_time() - started)
+    tracemalloc.start()
+    result = run(pages)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "name": name,
+        "cpu_ms": min(cpu) * 1000,
+        "peak_mb": peak / 1024**2,
+        "result": result,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tracks", type=int, default=10_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--no-msgspec", action="store_true", help="use the dataclass models"
+    )
+    args = parser.parse_args()
+
+    if args.no_msgspec:
+        sys.modules["msgspec"] = None
+    models, utils = load_package()
+    pages = fixture(args.tracks, args.page_size)
+
+    def dicts(pages):
+        # Le résultat est gardé en entier, comme une fenêtre de get_info
+        return [
+            utils.parse_playlist_track(item)
+            for content in pages
+            for item in json.loads(content)["items"]
+        ]
+
+    def typed(pages):
+        return [
+            utils.parse_playlist_track(item)
+            for content in pages
+            for item in models.decode_page(content, models.PlaylistTrack)["items"]
+        ]
+
+    backend = "msgspec" if models.msgspec is not None else "dataclass"
+    baseline = measure("json + parse_playlist_track", dicts, pages, args.repeat)
+    candidate = measure(f"models ({backend})", typed, pages, args.repeat)
+    assert baseline.pop("result") == candidate.pop("result"), "outputs differ"
+
+    size = sum(map(len, pages)) / 1024**2
+    print(f"{args.tracks} tracks, {len(pages)} pages, {size:.1f} MB of JSON")
+    print(f"{'':30} {'CPU (ms)':>10} {'peak (MB)':>10}")
+    for row in (baseline, candidate):
+        print(f"{row['name']:30} {row['cpu_ms']:10.1f} {row['peak_mb']:10.1f}")
+    print(
+        f"{'ratio':30} {candidate['cpu_ms'] / baseline['cpu_ms']:10.2f}"
+        f" {candidate['peak_mb'] / baseline['peak_mb']:10.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Cold start benchmark of the `spotify-mcp` entry point.
+
+Starts the server over stdio like an MCP host does and measures, per run:
+- import: time to import spotify_mcp.server in a fresh interpreter
+- tools: time from spawning the server to the tools/list response
+No Spotify credentials are needed: the client is only created on a tool call.
+
+    uv run python benchmarks/bench_startup.py --runs 5 --max-ms 3000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import get_default_environment, stdio_client
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+# Les logs du serveur ne doivent pas aller dans le fichier du paquet
+ENV = {
+    **get_default_environment(),
+    "PYTHONPATH": str(SRC),
+    "SPOTIFY_LOG_FILE": os.devnull,
+}
+
+
+def import_time() -> float:
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", "import spotify_mcp.server"],
+        check=True,
+        env=ENV,
+        stderr=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - started
+
+
+async def tools_time() -> tuple[float, int]:
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=["-c", "import spotify_mcp; spotify_mcp.main()"],
+        env=ENV,
+    )
+    started = time.perf_counter()
+    async with stdio_client(params) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            tools = await session.list_tools()
+    return time.perf_counter() - started, len(tools.tools)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        default=None,
+        help="exit with status 1 if the median time to tools/list exceeds this",
+    )
+    args = parser.parse_args()
+
+    imports, tools = [], []
+    for _ in range(args.runs):
+        imports.append(import_time())
+        elapsed, count = asyncio.run(asyncio.wait_for(tools_time(), 60))
+        tools.append(elapsed)
+
+    print(f"{args.runs} runs, {count} tools")
+    print(f"{'':12} {'median (ms)':>12} {'max (ms)':>10}")
+    for name, times in (("import", imports), ("tools/list", tools)):
+        print(
+            f"{name:12} {statistics.median(times) * 1000:12.0f}"
+            f" {max(times) * 1000:10.0f}"
+        )
+    if args.max_ms is not None and statistics.median(tools) * 1000 > args.max_ms:
+        print(f"tools/list median above {args.max_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,615 @@
+"""
+Offline stand-in for the Spotify Web API, used by the benchmarks.
+
+Serves deterministic fixtures, shaped like the Web API's responses, for every
+endpoint `spotify_api.Client` calls: search, tracks, albums, artists,
+playlists, the player and its queue, top items and the library. It can add
+latency to every response and inject errors (503) or rate limiting (429 with
+Retry-After). Recorded responses can replace the generated ones: a GET of
+/v1/<path> is answered with `<fixtures>/<path>.json` when that file exists.
+
+Point the client at it with SPOTIFY_API_URL:
+
+    python benchmarks/mock_spotify.py --port 8901 --latency-ms 50
+    SPOTIFY_API_URL=http://127.0.0.1:8901/v1/ ...
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import random
+import re
+import string
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+N_ARTISTS = 50
+N_ALBUMS = 1000
+ALBUM_SIZE = 12
+N_PLAYLISTS = 60
+N_SAVED = 500
+N_TOP_TRACKS = 120
+# Playlist jouée par le lecteur, assez longue pour être paginée
+PLAYER_PLAYLIST_SIZE = 250
+
+MARKETS = [
+    "".join(p)
+    for p in zip(string.ascii_uppercase * 7, string.ascii_uppercase[::-1] * 7)
+][:180]
+
+
+def spotify_id(prefix: str, n: int) -> str:
+    return f"{prefix}{n:0{22 - len(prefix)}d}"
+
+
+def index_of(item_id: str) -> int:
+    return int(item_id[2:])
+
+
+class Catalog:
+    """
+    Deterministic catalog: objects are derived from their index.
+    - base: URL of the API in the `next` links of paging objects
+    """
+
+    def __init__(self, base: str = "https://api.spotify.com/v1/"):
+        self.base = base
+
+    def artist(self, i: int, simplified: bool = True) -> dict:
+        artist_id = spotify_id("ar", i)
+        artist = {
+            "external_urls": {
+                "spotify": f"https://open.spotify.com/artist/{artist_id}"
+            },
+            "href": f"https://api.spotify.com/v1/artists/{artist_id}",
+            "id": artist_id,
+            "name": f"Artist {i}",
+            "type": "artist",
+            "uri": f"spotify:artist:{artist_id}",
+        }
+        if not simplified:
+            artist["genres"] = [f"genre {i % 7}", f"genre {i % 11}"]
+            artist["popularity"] = i % 100
+            artist["followers"] = {"href": None, "total": 1000 * i}
+            artist["images"] = self.images(artist_id)
+        return artist
+
+    def images(self, key: str) -> list:
+        return [
+            {
+                "height": size,
+                "width": size,
+                "url": f"https://i.scdn.co/image/{key}{size}",
+            }
+            for size in (640, 300, 64)
+        ]
+
+    def album(self, i: int, simplified: bool = True) -> dict:
+        album_id = spotify_id("al", i)
+        album = {
+            "album_type": "album",
+            "artists": [self.artist(i % N_ARTISTS)],
+            "available_markets": MARKETS,
+            "external_urls": {"spotify": f"https://open.spotify.com/album/{album_id}"},
+            "href": f"https://api.spotify.com/v1/albums/{album_id}",
+            "id": album_id,
+            "images": self.images(album_id),
+            "name": f"Album {i}",
+            "release_date": f"{1970 + i % 55}-01-01",
+            "release_date_precision": "day",
+            "total_tracks": ALBUM_SIZE,
+            "type": "album",
+            "uri": f"spotify:album:{album_id}",
+        }
+        if not simplified:
+            album["genres"] = []
+            album["label"] = f"Label {i % 13}"
+            album["popularity"] = i % 100
+            tracks = [
+                self.track(n, simplified=True)
+                for n in range(i * ALBUM_SIZE, (i + 1) * ALBUM_SIZE)
+            ]
+            album["tracks"] = self.page(f"albums/{album_id}/tracks", tracks, 0, 50)
+        return album
+
+    def track(self, i: int, simplified: bool = False) -> dict:
+        track_id = spotify_id("tr", i)
+        album = i // ALBUM_SIZE % N_ALBUMS
+        track = {
+            "artists": [self.artist(album % N_ARTISTS)],
+            "available_markets": MARKETS,
+            "disc_number": 1,
+            "duration_ms": 180000 + i % 120 * 1000,
+            "explicit": False,
+            "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+            "href": f"https://api.spotify.com/v1/tracks/{track_id}",
+            "id": track_id,
+            "is_local": False,
+            "name": f"Track {i}",
+            "preview_url": None,
+            "track_number": i % ALBUM_SIZE + 1,
+            "type": "track",
+            "uri": f"spotify:track:{track_id}",
+        }
+        if not simplified:
+            track["album"] = self.album(album)
+            track["external_ids"] = {"isrc": f"USRC1{i:07d}"}
+            track["popularity"] = i % 100
+        return track
+
+    @functools.cache
+    def saved(self, kind: str) -> list:
+        """The user's saved 'tracks' or 'albums', newest first."""
+        make = self.track if kind == "tracks" else self.album
+        return [
+            {
+                "added_at": f"2024-01-01T00:{n // 60 % 60:02d}:{n % 60:02d}Z",
+                kind[:-1]: make(n * 7 % N_ALBUMS, simplified=False),
+            }
+            for n in reversed(range(N_SAVED))
+        ]
+
+    @functools.cache
+    def top(self, kind: str, time_range: str) -> list:
+        """Top artists or tracks: the same favourites, reshuffled by period."""
+        count = N_ARTISTS if kind == "artists" else N_TOP_TRACKS
+        spread = {"short_term": 20, "medium_term": 8}.get(time_range, 0)
+        rng = random.Random(f"{kind}/{time_range}")
+        order = sorted(range(count), key=lambda n: n + rng.uniform(0, spread))
+        make = self.artist if kind == "artists" else self.track
+        return [make(n * 7 % count, simplified=False) for n in order]
+
+    def playlist_size(self, i: int) -> int:
+        return PLAYER_PLAYLIST_SIZE if i == 0 else 20 + i
+
+    @functools.cache
+    def playlist_tracks(self, i: int) -> list:
+        return [
+            {
+                "added_at": "2024-05-01T10:00:00Z",
+                "added_by": {"id": "bench", "type": "user"},
+                "is_local": False,
+                "primary_color": None,
+                "track": self.track(i * 37 + n),
+                "video_thumbnail": {"url": None},
+            }
+            for n in range(self.playlist_size(i))
+        ]
+
+    def playlist(self, i: int, simplified: bool = True) -> dict:
+        playlist_id = spotify_id("pl", i)
+        playlist = {
+            "collaborative": False,
+            "description": f"Playlist number {i}",
+            "external_urls": {
+                "spotify": f"https://open.spotify.com/playlist/{playlist_id}"
+            },
+            "href": f"https://api.spotify.com/v1/playlists/{playlist_id}",
+            "id": playlist_id,
+            "images": self.images(playlist_id),
+            "name": f"Playlist {i}",
+            "owner": {"display_name": "Bench User", "id": "bench", "type": "user"},
+            "public": True,
+            "snapshot_id": f"snapshot{i}",
+            "type": "playlist",
+            "uri": f"spotify:playlist:{playlist_id}",
+        }
+        path = f"playlists/{playlist_id}/tracks"
+        if simplified:
+            playlist["tracks"] = {"href": path, "total": self.playlist_size(i)}
+        else:
+            playlist["tracks"] = self.page(path, self.playlist_tracks(i), 0, 100)
+        return playlist
+
+    def page(self, path: str, items: list, offset: int, limit: int) -> dict:
+        """A paging object over `items`, with its next link."""
+        end = offset + limit
+        base = self.base + path
+        return {
+            "href": f"{base}?offset={offset}&limit={limit}",
+            "items": items[offset:end],
+            "limit": limit,
+            "next": f"{base}?offset={end}&limit={limit}" if end < len(items) else None,
+            "offset": offset,
+            "previous": None,
+            "total": len(items),
+        }
+
+    def search(self, query: str, types: str, limit: int) -> dict:
+        # Des requêtes différentes donnent des résultats différents, toujours les mêmes
+        start = int(hashlib.md5(query.encode()).hexdigest(), 16) % 10_000
+        catalog, results = self, {}
+        for kind in types.split(","):
+            make = {
+                "track": lambda n: catalog.track(n),
+                "album": lambda n: catalog.album(n % N_ALBUMS),
+                "artist": lambda n: catalog.artist(n % N_ARTISTS, simplified=False),
+                "playlist": lambda n: catalog.playlist(n % N_PLAYLISTS),
+            }[kind]
+            items = [make(start + n) for n in range(limit)]
+            results[f"{kind}s"] = {
+                "href": "https://api.spotify.com/v1/search",
+                "items": items,
+                "limit": limit,
+                "next": None,
+                "offset": 0,
+                "previous": None,
+                "total": limit,
+            }
+        return results
+
+
+class Player:
+    """Playback state: playing a playlist of the catalog, one track at a time."""
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+        self.context = spotify_id("pl", 0)
+        self.position = 0
+        self.is_playing = True
+        self.volume = 50
+        self.started_at = time.time()
+        self.queued: list = []
+
+    def tracks(self) -> list:
+        return self.catalog.playlist_tracks(index_of(self.context))
+
+    def state(self) -> dict:
+        tracks = self.tracks()
+        item = tracks[self.position % len(tracks)]["track"]
+        progress = int((time.time() - self.started_at) * 1000) if self.is_playing else 0
+        return {
+            "device": DEVICES["devices"][0] | {"volume_percent": self.volume},
+            "shuffle_state": False,
+            "repeat_state": "off",
+            "timestamp": int(self.started_at * 1000),
+            "context": {
+                "type": "playlist",
+                "uri": f"spotify:playlist:{self.context}",
+                "href": f"https://api.spotify.com/v1/playlists/{self.context}",
+            },
+            "progress_ms": min(progress, item["duration_ms"]),
+            "item": item,
+            "currently_playing_type": "track",
+            "is_playing": self.is_playing,
+        }
+
+    def queue(self) -> dict:
+        tracks = [t["track"] for t in self.tracks()]
+        current = self.position % len(tracks)
+        upcoming = self.queued + tracks[current + 1 : current + 21]
+        return {"currently_playing": tracks[current], "queue": upcoming[:20]}
+
+    def play(self, payload: dict):
+        context = (payload or {}).get("context_uri")
+        if context and context.startswith("spotify:playlist:"):
+            self.context = context.rsplit(":", 1)[1]
+            self.position = 0
+            offset = payload.get("offset") or {}
+            if "uri" in offset:
+                uris = [t["track"]["uri"] for t in self.tracks()]
+                self.position = (
+                    uris.index(offset["uri"]) if offset["uri"] in uris else 0
+                )
+            elif "position" in offset:
+                self.position = offset["position"]
+        self.is_playing = True
+        self.started_at = time.time()
+
+    def skip(self, step: int):
+        if step > 0 and self.queued:
+            self.queued.pop(0)
+        else:
+            self.position = max(0, self.position + step)
+        self.started_at = time.time()
+
+
+DEVICES = {
+    "devices": [
+        {
+            "id": "dev0000000000000000000",
+            "is_active": True,
+            "is_private_session": False,
+            "is_restricted": False,
+            "name": "Bench speaker",
+            "supports_volume": True,
+            "type": "Speaker",
+            "volume_percent": 50,
+        }
+    ]
+}
+
+
+class MockSpotify:
+    """
+    The mock server, run in a background thread.
+    - latency: seconds added to every response
+    - error_rate / throttle_rate: share of requests answered with a 503 / a 429
+    - retry_after: Retry-After of the injected 429s, in seconds
+    - fixtures: directory of recorded responses, see the module docstring
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 0.0,
+        fixtures: Optional[Path] = None,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.fixtures = fixtures
+        self.random = random.Random(seed)
+        self.requests: Counter = Counter()
+        self.created = 0
+        self._lock = threading.Lock()
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # En-têtes et corps sont écrits séparément : sans ça, l'ACK retardé
+            # ajoute ~40 ms à chaque réponse
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                mock.handle(self, "GET")
+
+            def do_POST(self):
+                mock.handle(self, "POST")
+
+            def do_PUT(self):
+                mock.handle(self, "PUT")
+
+            def do_DELETE(self):
+                mock.handle(self, "DELETE")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.catalog = Catalog(self.url)
+        self.player = Player(self.catalog)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1/"
+
+    def start(self) -> "MockSpotify":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "MockSpotify":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # Requêtes
+
+    def handle(self, request: BaseHTTPRequestHandler, method: str):
+        url = urlsplit(request.path)
+        path = url.path.removeprefix("/v1/")
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+        payload = json.loads(body) if body else None
+
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests[method] += 1
+            draw = self.random.random()
+            if draw < self.throttle_rate:
+                return self.send(
+                    request,
+                    429,
+                    {"error": {"status": 429, "message": "API rate limit exceeded"}},
+                    {"Retry-After": f"{self.retry_after:g}"},
+                )
+            if draw < self.throttle_rate + self.error_rate:
+                return self.send(
+                    request,
+                    503,
+                    {"error": {"status": 503, "message": "Injected error"}},
+                )
+            try:
+                status, response, headers = self.route(
+                    method, path, params, payload, request.headers
+                )
+            except (KeyError, ValueError, IndexError) as e:
+                status, response, headers = (
+                    400,
+                    {"error": {"status": 400, "message": f"Bad request: {e}"}},
+                    {},
+                )
+        self.send(request, status, response, headers)
+
+    def send(
+        self,
+        request: BaseHTTPRequestHandler,
+        status: int,
+        response: Optional[dict],
+        headers: Optional[dict] = None,
+    ):
+        content = json.dumps(response).encode() if response is not None else b""
+        request.send_response(status)
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        if content:
+            request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(content)))
+        request.end_headers()
+        request.wfile.write(content)
+
+    def route(
+        self, method: str, path: str, params: dict, payload: Optional[dict], headers
+    ) -> tuple[int, Optional[dict], dict]:
+        if method == "GET" and self.fixtures is not None:
+            recorded = self.fixtures / f"{path}.json"
+            if recorded.is_file():
+                return 200, json.loads(recorded.read_text()), {}
+        if method == "GET":
+            return self.get(path, params, headers)
+        return self.command(method, path, params, payload)
+
+    def get(self, path: str, params: dict, headers) -> tuple[int, Optional[dict], dict]:
+        catalog, player = self.catalog, self.player
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 20))
+
+        if path == "me":
+            return 200, {"id": "bench", "display_name": "Bench User"}, {}
+        if path == "me/player":
+            return 200, player.state(), {}
+        if path == "me/player/currently-playing":
+            return 200, player.state(), {}
+        if path == "me/player/devices":
+            return 200, DEVICES, {}
+        if path == "me/player/queue":
+            return 200, player.queue(), {}
+        if path == "search":
+            return 200, catalog.search(params["q"], params["type"], limit), {}
+        if path == "recommendations":
+            return 200, {"tracks": [catalog.track(n) for n in range(limit)]}, {}
+
+        if match := re.fullmatch(r"me/top/(artists|tracks)", path):
+            items = catalog.top(match[1], params.get("time_range", "medium_term"))
+            return 200, catalog.page(path, items, offset, limit), {}
+        if path in ("me/tracks", "me/albums"):
+            items = catalog.saved(path.split("/")[1])
+            return 200, catalog.page(path, items, offset, limit), {}
+        if path == "me/playlists":
+            items = [catalog.playlist(n) for n in range(N_PLAYLISTS)]
+            return 200, catalog.page(path, items, offset, limit), {}
+
+        # Recherches groupées : /tracks?ids=..., /albums?ids=..., /artists?ids=...
+        if path in ("tracks", "albums", "artists"):
+            make = {
+                "tracks": catalog.track,
+                "albums": catalog.album,
+                "artists": catalog.artist,
+            }[path]
+            ids = params["ids"].split(",")
+            return 200, {path: [make(index_of(i), simplified=False) for i in ids]}, {}
+
+        if match := re.fullmatch(r"tracks/(\w+)", path):
+            return 200, catalog.track(index_of(match[1])), {}
+        if match := re.fullmatch(r"albums/(\w+)", path):
+            return 200, catalog.album(index_of(match[1]), simplified=False), {}
+        if match := re.fullmatch(r"albums/(\w+)/tracks", path):
+            i = index_of(match[1])
+            items = [
+                catalog.track(n, simplified=True)
+                for n in range(i * ALBUM_SIZE, (i + 1) * ALBUM_SIZE)
+            ]
+            return 200, catalog.page(path, items, offset, limit), {}
+        if match := re.fullmatch(r"artists/(\w+)", path):
+            return 200, catalog.artist(index_of(match[1]), simplified=False), {}
+        if match := re.fullmatch(r"artists/(\w+)/albums", path):
+            i = index_of(match[1])
+            items = [catalog.album(n) for n in range(i, N_ALBUMS, N_ARTISTS)]
+            return 200, catalog.page(path, items, offset, limit), {}
+        if match := re.fullmatch(r"artists/(\w+)/top-tracks", path):
+            i = index_of(match[1])
+            tracks = [
+                catalog.track(n) for n in range(i * ALBUM_SIZE, i * ALBUM_SIZE + 10)
+            ]
+            return 200, {"tracks": tracks}, {}
+        if match := re.fullmatch(r"playlists/(\w+)", path):
+            etag = f'"{match[1]}-v1"'
+            if headers.get("If-None-Match") == etag:
+                return 304, None, {"ETag": etag}
+            playlist = catalog.playlist(index_of(match[1]), simplified=False)
+            return 200, playlist, {"ETag": etag}
+        if match := re.fullmatch(r"playlists/(\w+)/tracks", path):
+            items = catalog.playlist_tracks(index_of(match[1]))
+            return 200, catalog.page(path, items, offset, limit), {}
+        return 404, {"error": {"status": 404, "message": "Not found."}}, {}
+
+    def command(
+        self, method: str, path: str, params: dict, payload: Optional[dict]
+    ) -> tuple[int, Optional[dict], dict]:
+        player = self.player
+        match method, path:
+            case "PUT", "me/player/play":
+                player.play(payload)
+            case "PUT", "me/player/pause":
+                player.is_playing = False
+            case "PUT", "me/player/seek":
+                player.started_at = time.time() - int(params["position_ms"]) / 1000
+            case "PUT", "me/player/volume":
+                player.volume = int(params["volume_percent"])
+            case "POST", "me/player/next":
+                player.skip(1)
+            case "POST", "me/player/previous":
+                player.skip(-1)
+            case "POST", "me/player/queue":
+                player.queued.append(self.catalog.track(index_of(params["uri"][14:])))
+            case "POST", _ if re.fullmatch(r"users/\w+/playlists", path):
+                self.created += 1
+                playlist = self.catalog.playlist(N_PLAYLISTS + self.created)
+                playlist.update(
+                    name=payload["name"],
+                    description=payload.get("description", ""),
+                    public=payload.get("public", True),
+                    collaborative=payload.get("collaborative", False),
+                )
+                playlist["tracks"] = {"href": playlist["href"] + "/tracks", "total": 0}
+                return 201, playlist, {}
+            case "POST", _ if re.fullmatch(r"playlists/\w+/tracks", path):
+                return 201, {"snapshot_id": f"snapshot{len(payload['uris'])}"}, {}
+            case _:
+                return 404, {"error": {"status": 404, "message": "Not found."}}, {}
+        return 204, None, {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--fixtures", type=Path, default=None)
+    args = parser.parse_args()
+
+    mock = MockSpotify(
+        args.host,
+        args.port,
+        latency=args.latency_ms / 1000,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        fixtures=args.fixtures,
+    )
+    print(f"Mock Spotify Web API on {mock.url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
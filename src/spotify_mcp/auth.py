@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from spotipy.oauth2 import SpotifyOAuth, SpotifyOauthError
+
+from .pool import ConnectionPool
+
+TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+
+class TokenManager:
+    """
+    Keeps the OAuth token in memory and refreshes it in the background
+    `refresh_margin` seconds before it expires.
+    - Concurrent callers share a single in-flight refresh.
+    - The cache file is written from a worker thread, off the request path.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        auth_manager: SpotifyOAuth,
+        pool: ConnectionPool,
+        refresh_margin: float = 120.0,
+        expiry_skew: float = 10.0,
+    ):
+        self.logger = logger
+        self.auth_manager = auth_manager
+        self.cache_handler = auth_manager.cache_handler
+        self.pool = pool
+        self.refresh_margin = refresh_margin
+        self.expiry_skew = expiry_skew
+        self._token: Optional[dict] = self.cache_handler.get_cached_token()
+        self._refreshing: Optional[asyncio.Task] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._pending_saves: set[asyncio.Task] = set()
+
+    def seconds_left(self) -> float:
+        if not self._token:
+            return 0.0
+        return self._token.get("expires_at", 0) - time.time()
+
+    def is_valid(self) -> bool:
+        return self.seconds_left() > self.expiry_skew
+
+    async def access_token(self) -> str:
+        """Returns a valid access token, refreshing it only if it expired."""
+        if not self.is_valid():
+            await self.refresh()
+        self._schedule()
+        return self._token["access_token"]
+
+    async def refresh(self):
+        """Refreshes the token; concurrent calls wait for the same refresh."""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._refresh())
+        await asyncio.shield(self._refreshing)
+
+    async def _refresh(self):
+        if not self._token or "refresh_token" not in self._token:
+            # Pas de refresh token : flux OAuth complet de spotipy
+            self.logger.info("No refresh token, running the OAuth flow")
+            await asyncio.to_thread(self.auth_manager.get_access_token, as_dict=False)
+            self._token = await asyncio.to_thread(self.cache_handler.get_cached_token)
+            return
+
+        # Un autre processus (cache partagé) a pu rafraîchir le jeton entre-temps
+        cached = await asyncio.to_thread(self.cache_handler.get_cached_token)
+        if (
+            cached
+            and cached.get("access_token") != self._token.get("access_token")
+            and cached.get("expires_at", 0) - time.time() > self.refresh_margin
+        ):
+            self.logger.info("Using the access token refreshed by another process")
+            self._token = cached
+            return
+
+        self.logger.info("Refreshing access token")
+        response = await self.pool.request(
+            "POST",
+            TOKEN_URL,
+            data={
+                "grant_type": "refresh_token",
+                "refresh_token": self._token["refresh_token"],
+            },
+            auth=(self.auth_manager.client_id, self.auth_manager.client_secret),
+        )
+        if response.status_code != 200:
+            raise SpotifyOauthError(
+                f"Token refresh failed with status {response.status_code}: {response.text}"
+            )
+
+        token = response.json()
+        token.setdefault("refresh_token", self._token["refresh_token"])
+        token["expires_at"] = int(time.time()) + token["expires_in"]
+        self._token = token
+        self._persist(token)
+
+    def _persist(self, token: dict):
+        task = asyncio.create_task(
+            asyncio.to_thread(self.cache_handler.save_token_to_cache, token)
+        )
+        self._pending_saves.add(task)
+        task.add_done_callback(self._pending_saves.discard)
+
+    def _schedule(self):
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(max(self.seconds_left() - self.refresh_margin, 1.0))
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error("Background token refresh failed: %s", e)
+                await asyncio.sleep(30)
+
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._pending_saves:
+            await asyncio.gather(*self._pending_saves, return_exceptions=True)
@@ -0,0 +1,166 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from .store import SharedStore, shared_store
+
+# Durée de vie par type d'objet, en secondes. 0 = revalidation ETag à chaque appel.
+DEFAULT_TTLS = {
+    "track": 24 * 3600,
+    "album": 24 * 3600,
+    "artist": 6 * 3600,
+    "artist_albums": 6 * 3600,
+    "artist_top_tracks": 6 * 3600,
+    # Favoris de l'utilisateur (me/top) : recalculés par Spotify une fois par jour
+    "top_items": 12 * 3600,
+    "playlist": 0,
+}
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    size: int
+    expires_at: float
+    etag: Optional[str] = None
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of decoded API responses.
+    - Entries expire after a per-kind TTL; expired entries with an ETag are
+      kept so the next request can be revalidated with If-None-Match.
+    - Eviction is driven by the total size of the cached response bodies.
+    - With a shared store (see store.py), entries are written through to it,
+      and a missing or stale entry is looked up there before any request:
+      the worker processes of a server share what each of them fetched.
+    Cached values are shared: callers must not mutate them.
+    """
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        ttls: Optional[dict] = None,
+        store: Optional[SharedStore] = None,
+    ):
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("SPOTIFY_CACHE_MAX_MB", "32")) * 1024**2)
+        self.max_bytes = max_bytes
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.store = store
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+    def lookup(self, key: str) -> tuple[Optional[CacheEntry], bool]:
+        """Returns (entry, is_fresh). A stale entry is returned for revalidation."""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if self.store is not None and (entry is None or entry.expires_at <= now):
+            entry = self._load(key) or entry
+        if entry is None:
+            self.misses += 1
+            return None, False
+        self._entries.move_to_end(key)
+        if entry.expires_at > now:
+            self.hits += 1
+            return entry, True
+        self.misses += 1
+        return entry, False
+
+    def _load(self, key: str) -> Optional[CacheEntry]:
+        """Copies an entry of the shared store into memory."""
+        row = self.store.get_response(key)
+        if row is None:
+            return None
+        value, size, expires_at, etag = row
+        # Heure murale du store -> horloge monotone de ce processus
+        entry = CacheEntry(
+            value, size, time.monotonic() + expires_at - time.time(), etag
+        )
+        self._insert(key, entry)
+        return entry
+
+    def put(
+        self, key: str, kind: str, value: Any, size: int, etag: Optional[str] = None
+    ):
+        ttl = self.ttls.get(kind, 0)
+        if size > self.max_bytes or (ttl <= 0 and etag is None):
+            return
+        self._insert(key, CacheEntry(value, size, time.monotonic() + ttl, etag))
+        if self.store is not None:
+            self.store.put_response(key, value, size, time.time() + ttl, etag)
+
+    def _insert(self, key: str, entry: CacheEntry):
+        self.discard(key)
+        self._entries[key] = entry
+        self.size += entry.size
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size
+            self.evictions += 1
+
+    def renew(self, key: str, kind: str, entry: CacheEntry):
+        """
+        Marks a stale entry fresh again after a 304 Not Modified. `entry` is
+        the one returned by `lookup`: it may have been evicted while the
+        request was in flight, and is then cached again.
+        """
+        ttl = self.ttls.get(kind, 0)
+        entry.expires_at = time.monotonic() + ttl
+        current = self._entries.get(key)
+        if current is None:
+            self._insert(key, entry)
+        elif current is entry:
+            self._entries.move_to_end(key)
+        self.revalidated += 1
+        if self.store is not None:
+            self.store.renew_response(key, time.time() + ttl)
+
+    def discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            **({"shared": self.store.stats()} if self.store is not None else {}),
+        }
+
+
+_shared_cache: Optional[ResponseCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def shared_cache(logger: logging.Logger) -> ResponseCache:
+    """
+    Returns the process-wide response cache, shared by every client: catalog
+    objects are the same for all users, and playlists (TTL 0) are revalidated
+    with each user's own token before being served.
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache(store=shared_store(logger))
+    return _shared_cache
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+# Politiques de choix de l'appareil cible
+POLICY_ACTIVE = "active"  # l'appareil actif, sinon le préféré, sinon le premier
+POLICY_PREFERRED = "preferred"  # toujours le préféré s'il est disponible
+POLICIES = (POLICY_ACTIVE, POLICY_PREFERRED)
+
+
+class DeviceRegistry:
+    """
+    Short-lived cache of the user's devices (GET /me/player/devices).
+    The list is fetched again only when it is older than `ttl` seconds or
+    after `invalidate()`, so validated calls usually cost no device lookup.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        fetch: Callable[[], Awaitable[List[dict]]],
+        ttl: float = 30.0,
+        preferred: Optional[str] = None,
+        policy: str = POLICY_ACTIVE,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"device policy must be one of {POLICIES}")
+        self.logger = logger
+        self.fetch = fetch
+        self.ttl = ttl
+        self.preferred = preferred
+        self.policy = policy
+        self._devices: Optional[List[dict]] = None
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def is_stale(self) -> bool:
+        return self._devices is None or time.monotonic() - self._fetched_at > self.ttl
+
+    def invalidate(self):
+        self._devices = None
+
+    async def devices(self, refresh=False) -> List[dict]:
+        """Returns the cached device list, fetching it if stale."""
+        if refresh:
+            self.invalidate()
+        if not self.is_stale():
+            return self._devices
+        async with self._lock:
+            # Un autre appel a pu rafraîchir la liste pendant l'attente
+            if self.is_stale():
+                self._devices = await self.fetch()
+                self._fetched_at = time.monotonic()
+                self.logger.debug(
+                    "Device registry refreshed: %s devices", len(self._devices)
+                )
+            return self._devices
+
+    def mark_active(self, device_id: str):
+        """Records locally that playback was moved to `device_id`."""
+        for device in self._devices or []:
+            device["is_active"] = device.get("id") == device_id
+
+    async def is_active_device(self, refresh=False) -> bool:
+        return any(device.get("is_active") for device in await self.devices(refresh))
+
+    async def target(self, refresh=False) -> Optional[dict]:
+        """
+        Returns the device a player command should be sent to, or None to let
+        Spotify use the active device.
+        """
+        devices = await self.devices(refresh)
+        preferred = self._find_preferred(devices)
+
+        if self.policy == POLICY_PREFERRED and preferred:
+            return None if preferred.get("is_active") else preferred
+        if any(device.get("is_active") for device in devices):
+            return None
+        if preferred:
+            self.logger.info(
+                "No active device, assigning preferred %s.", preferred["name"]
+            )
+            return preferred
+        if devices:
+            self.logger.info("No active device, assigning %s.", devices[0]["name"])
+            return devices[0]
+        self.logger.info("No device available.")
+        return None
+
+    def _find_preferred(self, devices: List[dict]) -> Optional[dict]:
+        if not self.preferred:
+            return None
+        wanted = self.preferred.casefold()
+        for device in devices:
+            if (
+                device.get("id") == self.preferred
+                or device.get("name", "").casefold() == wanted
+            ):
+                return device
+        return None
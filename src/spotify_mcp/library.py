@@ -0,0 +1,379 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import aclosing
+from typing import List, Optional
+
+from .pager import paginate
+from .transport import Transport
+
+KINDS = ("tracks", "albums", "playlists")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    artists TEXT NOT NULL,
+    album TEXT,
+    album_id TEXT,
+    duration_ms INTEGER,
+    added_at TEXT NOT NULL,
+    artist_ids TEXT
+);
+CREATE INDEX IF NOT EXISTS tracks_added_at ON tracks (added_at);
+CREATE TABLE IF NOT EXISTS albums (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    artists TEXT NOT NULL,
+    release_date TEXT,
+    total_tracks INTEGER,
+    added_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS albums_added_at ON albums (added_at);
+CREATE TABLE IF NOT EXISTS playlists (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    owner TEXT,
+    description TEXT,
+    total_tracks INTEGER,
+    snapshot_id TEXT,
+    position INTEGER
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    kind TEXT PRIMARY KEY,
+    last_added_at TEXT,
+    synced_at REAL NOT NULL,
+    unavailable INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS library_fts USING fts5(
+    kind UNINDEXED, item_id UNINDEXED, name, artists, album,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+class LibraryIndex:
+    """
+    Local SQLite copy of the user's library: saved tracks, saved albums and
+    followed playlists, searchable with FTS5.
+    Saved tracks and albums are listed newest first by the API, so a sync
+    stops at the first item already indexed (by `added_at`); a full sync is
+    done when removals are detected: the local count, plus the unavailable
+    items seen (counted in the API total but not indexed), no longer matches
+    the API total, or an indexed item is missing from the API's first page.
+    An indexed item that becomes unavailable keeps the count unchanged: it
+    stays indexed until the next full sync (`sync(full=True)`).
+    SQLite calls run in a worker thread, one at a time.
+    """
+
+    def __init__(self, logger: logging.Logger, path: str, max_age: float = 600.0):
+        self.logger = logger
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._sync_lock = asyncio.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        # Plusieurs processus peuvent servir le même utilisateur (SPOTIFY_WORKERS)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self._migrate()
+        try:
+            self.db.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            self.logger.error("SQLite has no FTS5 support, library search uses LIKE")
+            self.has_fts = False
+
+    def _migrate(self):
+        columns = {row["name"] for row in self.db.execute("PRAGMA table_info(tracks)")}
+        if "artist_ids" not in columns:
+            # Index antérieur aux IDs d'artistes : la prochaine sync relit tout
+            with self.db:
+                self.db.execute("ALTER TABLE tracks ADD COLUMN artist_ids TEXT")
+                self.db.execute("DELETE FROM sync_state WHERE kind = 'tracks'")
+        columns = {
+            row["name"] for row in self.db.execute("PRAGMA table_info(sync_state)")
+        }
+        if "unavailable" not in columns:
+            # Éléments indisponibles non comptés : la prochaine sync relit tout
+            with self.db:
+                self.db.execute(
+                    "ALTER TABLE sync_state "
+                    "ADD COLUMN unavailable INTEGER NOT NULL DEFAULT 0"
+                )
+                self.db.execute("DELETE FROM sync_state")
+
+    async def _run(self, func, *args):
+        def locked():
+            with self._lock:
+                return func(*args)
+
+        return await asyncio.to_thread(locked)
+
+    # Synchronisation
+
+    async def sync(self, api: Transport, full: bool = False) -> dict:
+        """Brings the index up to date. Returns the number of new items per kind."""
+        async with self._sync_lock:
+            return {
+                "tracks": await self._sync_saved(api, "tracks", full),
+                "albums": await self._sync_saved(api, "albums", full),
+                "playlists": await self._sync_playlists(api),
+            }
+
+    async def sync_if_stale(self, api: Transport):
+        states = await self._run(self._sync_states)
+        if any(time.time() - states.get(kind, 0) > self.max_age for kind in KINDS):
+            await self.sync(api)
+
+    async def _sync_saved(self, api: Transport, kind: str, full: bool) -> int:
+        last_added_at = None if full else await self._run(self._last_added_at, kind)
+        first_page = await api.get(f"me/{kind}", limit=50)
+        items = first_page["items"]
+        if last_added_at and items and items[-1]["added_at"] <= last_added_at:
+            # Rien de nouveau au-delà de cette page : inutile de précharger la suivante
+            first_page = {**first_page, "next": None}
+
+        rows, unavailable = [], 0
+        async with aclosing(paginate(api, first_page)) as items:
+            async for item in items:
+                if last_added_at and item["added_at"] <= last_added_at:
+                    break
+                obj = item["track" if kind == "tracks" else "album"]
+                if obj:
+                    rows.append(_row(kind, obj, item["added_at"]))
+                else:
+                    unavailable += 1
+
+        count = await self._run(self._store, kind, rows, full, unavailable)
+        if not full and (
+            count != first_page["total"]
+            or not await self._run(self._matches_first_page, kind, first_page)
+        ):
+            self.logger.info("Saved %s were removed, running a full sync", kind)
+            return await self._sync_saved(api, kind, full=True)
+        self.logger.info("Library sync: %s new %s", len(rows), kind)
+        return len(rows)
+
+    async def _sync_playlists(self, api: Transport) -> int:
+        # Pas d'added_at pour les playlists : la liste est courte, on la relit
+        rows = []
+        async for playlist in paginate(api, await api.get("me/playlists", limit=50)):
+            rows.append(_row("playlists", playlist, None, position=len(rows)))
+        known = await self._run(self._known_ids, "playlists")
+        await self._run(self._store, "playlists", rows, True)
+        return sum(1 for row in rows if row["id"] not in known)
+
+    def _sync_states(self) -> dict:
+        rows = self.db.execute("SELECT kind, synced_at FROM sync_state").fetchall()
+        return {row["kind"]: row["synced_at"] for row in rows}
+
+    def _last_added_at(self, kind: str) -> Optional[str]:
+        row = self.db.execute(
+            "SELECT last_added_at FROM sync_state WHERE kind = ?", (kind,)
+        ).fetchone()
+        return row["last_added_at"] if row else None
+
+    def _matches_first_page(self, kind: str, page: dict) -> bool:
+        """Whether the indexed items newer than the page's last are all on it."""
+        items = [item for item in page["items"] if item.get(kind[:-1])]
+        if not items:
+            return True
+        # Strictement plus récents : les ex aequo peuvent être sur la page suivante
+        newer = self.db.execute(
+            f"SELECT id FROM {kind} WHERE added_at > ?", (items[-1]["added_at"],)
+        )
+        on_page = {item[kind[:-1]]["id"] for item in items}
+        return all(row["id"] in on_page for row in newer)
+
+    def _known_ids(self, kind: str) -> set:
+        return {row["id"] for row in self.db.execute(f"SELECT id FROM {kind}")}
+
+    def _store(
+        self, kind: str, rows: List[dict], replace_all: bool, unavailable: int = 0
+    ) -> int:
+        """
+        Indexes `rows`, after `unavailable` items that couldn't be. Returns
+        the number of items indexed plus those unavailable, as counted in the
+        API total.
+        """
+        with self.db:
+            if replace_all:
+                self.db.execute(f"DELETE FROM {kind}")
+                if self.has_fts:
+                    self.db.execute("DELETE FROM library_fts WHERE kind = ?", (kind,))
+            if rows:
+                columns = list(rows[0])
+                self.db.executemany(
+                    f"INSERT OR REPLACE INTO {kind} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' * len(columns))})",
+                    [tuple(row[c] for c in columns) for row in rows],
+                )
+            if self.has_fts and rows:
+                self.db.executemany(
+                    "DELETE FROM library_fts WHERE kind = ? AND item_id = ?",
+                    [(kind, row["id"]) for row in rows],
+                )
+                self.db.executemany(
+                    "INSERT INTO library_fts (kind, item_id, name, artists, album) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (
+                            kind,
+                            row["id"],
+                            row["name"],
+                            " ".join(json.loads(row.get("artists") or "[]")),
+                            row.get("album") or row.get("owner") or "",
+                        )
+                        for row in rows
+                    ],
+                )
+            newest = max((row.get("added_at") or "" for row in rows), default="")
+            if not replace_all:
+                newest = max(newest, self._last_added_at(kind) or "")
+                row = self.db.execute(
+                    "SELECT unavailable FROM sync_state WHERE kind = ?", (kind,)
+                ).fetchone()
+                unavailable += row["unavailable"] if row else 0
+            self.db.execute(
+                "INSERT OR REPLACE INTO sync_state "
+                "(kind, last_added_at, synced_at, unavailable) VALUES (?, ?, ?, ?)",
+                (kind, newest or None, time.time(), unavailable),
+            )
+            count = self.db.execute(f"SELECT count(*) FROM {kind}").fetchone()[0]
+            return count + unavailable
+
+    # Recherche
+
+    async def query(
+        self,
+        kind: str = "tracks",
+        text: Optional[str] = None,
+        artist: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> dict:
+        """
+        Searches the index.
+        - kind: 'tracks', 'albums' or 'playlists'
+        - text: full-text query on names, artists and album (prefix matching)
+        - artist: only items whose artists contain this string
+        """
+        check_kind(kind)
+        return await self._run(self._query, kind, text, artist, limit, offset)
+
+    def _query(self, kind, text, artist, limit, offset) -> dict:
+        where, params = [], []
+        order = "position" if kind == "playlists" else "added_at DESC"
+        source = kind
+        if text and self.has_fts and _fts_query(text):
+            source = (
+                f"{kind} JOIN library_fts ON library_fts.item_id = {kind}.id "
+                "AND library_fts.kind = ?"
+            )
+            params.append(kind)
+            where.append("library_fts MATCH ?")
+            params.append(_fts_query(text))
+            order = "library_fts.rank"
+        elif text:
+            where.append(f"{kind}.name LIKE ?")
+            params.append(f"%{text}%")
+        if artist and kind != "playlists":
+            where.append(f"{kind}.artists LIKE ?")
+            params.append(f"%{artist}%")
+
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        total = self.db.execute(
+            f"SELECT count(*) FROM {source}{clause}", params
+        ).fetchone()[0]
+        rows = self.db.execute(
+            f"SELECT {kind}.* FROM {source}{clause} ORDER BY {order} LIMIT ? OFFSET ?",
+            [*params, limit, offset],
+        ).fetchall()
+        return {"total": total, "items": [_to_item(dict(row)) for row in rows]}
+
+    async def saved_tracks(self) -> List[dict]:
+        """Every saved track, as a simplified track object (see recommend.py)."""
+        return await self._run(self._saved_tracks)
+
+    def _saved_tracks(self) -> List[dict]:
+        rows = self.db.execute(
+            "SELECT id, name, artists, artist_ids, album, album_id FROM tracks"
+        ).fetchall()
+        return [
+            {
+                "id": row["id"],
+                "name": row["name"],
+                "artists": [
+                    {"id": artist_id, "name": name}
+                    for artist_id, name in zip(
+                        json.loads(row["artist_ids"] or "[]"),
+                        json.loads(row["artists"]),
+                    )
+                ],
+                "album": {"id": row["album_id"], "name": row["album"]},
+            }
+            for row in rows
+        ]
+
+    def close(self):
+        self.db.close()
+
+
+def check_kind(kind: str):
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {KINDS}")
+
+
+def _row(kind: str, obj: dict, added_at: Optional[str], position: int = 0) -> dict:
+    if kind == "playlists":
+        return {
+            "id": obj["id"],
+            "name": obj["name"],
+            "owner": (obj.get("owner") or {}).get("display_name"),
+            "description": obj.get("description"),
+            "total_tracks": (obj.get("tracks") or {}).get("total"),
+            "snapshot_id": obj.get("snapshot_id"),
+            "position": position,
+        }
+    row = {
+        "id": obj["id"],
+        "name": obj["name"],
+        "artists": json.dumps([a["name"] for a in obj["artists"]]),
+        "added_at": added_at,
+    }
+    if kind == "tracks":
+        row["album"] = (obj.get("album") or {}).get("name")
+        row["album_id"] = (obj.get("album") or {}).get("id")
+        row["duration_ms"] = obj.get("duration_ms")
+        row["artist_ids"] = json.dumps([a["id"] for a in obj["artists"]])
+    else:
+        row["release_date"] = obj.get("release_date")
+        row["total_tracks"] = obj.get("total_tracks")
+    return row
+
+
+def _to_item(row: dict) -> dict:
+    """Formats a row like the utils.parse_* functions do."""
+    if "artists" in row:
+        artists = json.loads(row.pop("artists"))
+        if len(artists) == 1:
+            row["artist"] = artists[0]
+        else:
+            row["artists"] = artists
+    row.pop("position", None)
+    row.pop("artist_ids", None)
+    return {k: v for k, v in row.items() if v is not None}
+
+
+def _fts_query(text: str) -> str:
+    """Turns free text into an FTS5 query matching every word as a prefix."""
+    words = [w.replace('"', "") for w in text.split()]
+    return " ".join(f'"{w}"*' for w in words if w)
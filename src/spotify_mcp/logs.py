@@ -0,0 +1,89 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from typing import Any, Optional
+
+LOG_FILE = os.getenv(
+    "SPOTIFY_LOG_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "spotify_mcp.log"),
+)
+LOG_LEVEL = os.getenv("SPOTIFY_LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(float(os.getenv("SPOTIFY_LOG_MAX_MB", "5")) * 1024**2)
+LOG_BACKUPS = int(os.getenv("SPOTIFY_LOG_BACKUPS", "3"))
+# Numéro du processus, posé par le superviseur quand SPOTIFY_WORKERS > 1 (voir
+# web.py) : la rotation n'est pas sûre à plusieurs, chacun a son fichier
+WORKER = os.getenv("SPOTIFY_WORKER")
+# Taille max d'un objet (réponse API, arguments) écrit dans les logs
+PAYLOAD_MAX_CHARS = int(os.getenv("SPOTIFY_LOG_PAYLOAD_MAX", "2000"))
+
+FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+
+class Payload:
+    """
+    Log argument for API responses and tool arguments: serialized only if the
+    record is emitted, and cut to `limit` characters.
+        logger.debug("Playlist: %s", Payload(playlist))
+    """
+
+    __slots__ = ("obj", "limit")
+
+    def __init__(self, obj: Any, limit: int = PAYLOAD_MAX_CHARS):
+        self.obj = obj
+        self.limit = limit
+
+    def __str__(self) -> str:
+        try:
+            text = json.dumps(self.obj, ensure_ascii=False, default=str)
+        except (TypeError, ValueError):
+            text = repr(self.obj)
+        if len(text) > self.limit:
+            return f"{text[: self.limit]}... ({len(text)} chars)"
+        return text
+
+
+def worker_path(path: str, worker: Optional[int | str]) -> str:
+    """'spotify_mcp.log' -> 'spotify_mcp.1.log': one file per worker process."""
+    if worker is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{worker}{ext}"
+
+
+def setup_logger(name: str = "spotify_mcp") -> logging.Logger:
+    """
+    Returns the server logger. Records are put on a queue and written by a
+    background thread to stderr (stdout carries the MCP protocol) and to a
+    rotating log file, so logging never blocks a tool call on disk I/O.
+    A worker process of the HTTP server writes its own file, e.g.
+    'spotify_mcp.1.log'.
+    """
+    logger = logging.getLogger(name)
+    if logger.handlers:
+        return logger
+
+    formatter = logging.Formatter(FORMAT)
+    file_handler = logging.handlers.RotatingFileHandler(
+        worker_path(LOG_FILE, WORKER),
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUPS,
+        encoding="utf-8",
+        delay=True,
+    )
+    stderr_handler = logging.StreamHandler(sys.stderr)
+    for handler in (file_handler, stderr_handler):
+        handler.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, file_handler, stderr_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    return logger
@@ -0,0 +1,224 @@
+import bisect
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+# Fichier de métriques au format texte Prometheus, réécrit toutes les
+# METRICS_INTERVAL secondes (désactivé si vide)
+METRICS_FILE = os.getenv("SPOTIFY_METRICS_FILE")
+METRICS_INTERVAL = float(os.getenv("SPOTIFY_METRICS_INTERVAL", "15"))
+
+# Bornes des histogrammes de latence, en secondes (comme les buckets Prometheus)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Segments d'URL variables, remplacés pour grouper les endpoints
+_ID_SEGMENT = re.compile(r"(?<=/)[0-9A-Za-z]{22}(?=/|$)|(?<=^users/)[^/]+")
+
+
+class Histogram:
+    """Latency histogram with fixed buckets; quantiles are interpolated."""
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # le dernier : au-delà de la borne max
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.max
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = min(self.buckets[i], self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+
+class Series:
+    """Latency, errors and upstream requests of one tool or endpoint."""
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.upstream = 0
+
+    def summary(self) -> dict:
+        latency = self.latency
+        return {
+            "count": latency.count,
+            "errors": self.errors,
+            "upstream_requests": self.upstream,
+            "mean_ms": (
+                round(latency.sum / latency.count * 1000, 1) if latency.count else 0.0
+            ),
+            "p50_ms": round(latency.quantile(0.5) * 1000, 1),
+            "p90_ms": round(latency.quantile(0.9) * 1000, 1),
+            "p99_ms": round(latency.quantile(0.99) * 1000, 1),
+            "max_ms": round(latency.max * 1000, 1),
+        }
+
+
+class Metrics:
+    """
+    Process-wide instrumentation: latency histograms, error counts and
+    upstream request counts per tool and per Web API endpoint.
+    - Tools are recorded by `server.handle_call_tool`; a call is an error if it
+      raised or if one of its upstream requests failed.
+    - Endpoints are recorded by `Transport` for every request sent, retries
+      included; paths are grouped by replacing IDs with '{id}'.
+    Gauges of the other components (cache, scheduler, pool) are passed to
+    `snapshot` and `prometheus` by the caller.
+    - labels: added to every exported series, e.g. the worker process
+    """
+
+    def __init__(self, labels: tuple = ()):
+        self.labels = labels
+        self.started_at = time.time()
+        self.tools: dict[str, Series] = {}
+        self.endpoints: dict[tuple[str, str], Series] = {}
+
+    def observe_tool(self, name: str, seconds: float, error: bool, upstream: int):
+        series = self.tools.setdefault(name, Series())
+        series.latency.observe(seconds)
+        series.errors += error
+        series.upstream += upstream
+
+    def observe_request(self, method: str, path: str, seconds: float, status: int):
+        key = (method, endpoint_of(path))
+        series = self.endpoints.setdefault(key, Series())
+        series.latency.observe(seconds)
+        series.errors += status >= 400
+        series.upstream += 1
+
+    def snapshot(self, gauges: Optional[dict] = None) -> dict:
+        return {
+            "uptime_s": round(time.time() - self.started_at),
+            "tools": {name: s.summary() for name, s in sorted(self.tools.items())},
+            "endpoints": {
+                f"{method} {path}": s.summary()
+                for (method, path), s in sorted(self.endpoints.items())
+            },
+            **(gauges or {}),
+        }
+
+    def prometheus(self, gauges: Optional[dict] = None) -> str:
+        """Text exposition format, for node_exporter's textfile collector."""
+        lines = []
+        _histograms(
+            lines,
+            "spotify_mcp_tool_duration_seconds",
+            "Tool call latency.",
+            {(*self.labels, ("tool", name)): s for name, s in self.tools.items()},
+        )
+        _counters(
+            lines,
+            "spotify_mcp_tool_errors_total",
+            "Tool calls that failed.",
+            {
+                (*self.labels, ("tool", name)): s.errors
+                for name, s in self.tools.items()
+            },
+        )
+        _counters(
+            lines,
+            "spotify_mcp_tool_upstream_requests_total",
+            "Web API requests sent by tool calls.",
+            {
+                (*self.labels, ("tool", name)): s.upstream
+                for name, s in self.tools.items()
+            },
+        )
+        endpoints = {
+            (*self.labels, ("method", method), ("endpoint", path)): s
+            for (method, path), s in self.endpoints.items()
+        }
+        _histograms(
+            lines,
+            "spotify_mcp_request_duration_seconds",
+            "Web API request latency.",
+            endpoints,
+        )
+        _counters(
+            lines,
+            "spotify_mcp_request_errors_total",
+            "Web API requests answered with an error status.",
+            {labels: s.errors for labels, s in endpoints.items()},
+        )
+        for section, values in (gauges or {}).items():
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"spotify_mcp_{section}_{key}"
+                labels = _labels(self.labels) if self.labels else ""
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str, gauges: Optional[dict] = None):
+        """Writes the text dump atomically, so readers never see half a file."""
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as f:
+            f.write(self.prometheus(gauges))
+        os.replace(temporary, path)
+
+
+def endpoint_of(path: str) -> str:
+    """'playlists/37i9.../tracks?offset=100' -> 'playlists/{id}/tracks'"""
+    return _ID_SEGMENT.sub("{id}", path.split("?", 1)[0])
+
+
+def _labels(labels: tuple, extra: str = "") -> str:
+    pairs = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}"
+
+
+def _histograms(lines: list, name: str, help: str, series: dict):
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, s in sorted(series.items()):
+        histogram, cumulative = s.latency, 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            le = f'le="{bound}"'
+            lines.append(f"{name}_bucket{_labels(labels, le)} {cumulative}")
+        le = 'le="+Inf"'
+        lines.append(f"{name}_bucket{_labels(labels, le)} {histogram.count}")
+        lines.append(f"{name}_sum{_labels(labels)} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+
+
+def _counters(lines: list, name: str, help: str, values: dict):
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} counter")
+    for labels, value in sorted(values.items()):
+        lines.append(f"{name}{_labels(labels)} {value}")
+
+
+_shared_metrics: Optional[Metrics] = None
+_shared_metrics_lock = threading.Lock()
+
+
+def shared_metrics() -> Metrics:
+    """Returns the process-wide metrics, creating them on first use."""
+    global _shared_metrics
+    with _shared_metrics_lock:
+        if _shared_metrics is None:
+            _shared_metrics = Metrics()
+    return _shared_metrics
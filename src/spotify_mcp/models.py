@@ -0,0 +1,173 @@
+"""
+Typed models of the Spotify objects found in large pages (playlist and album
+tracks), holding only the fields the tools return.
+
+With msgspec installed (extra 'fast'), pages are decoded straight from the
+response bytes into these models: the fields we don't declare (available
+markets, images, external urls...) are skipped without being allocated.
+Without it, the models are slotted dataclasses built from the decoded JSON.
+`to_dict` returns the same dicts as the matching `utils.parse_*` function.
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
+try:
+    import msgspec
+except ImportError:  # extra 'fast' non installé
+    msgspec = None
+
+if msgspec is not None:
+
+    class Model(msgspec.Struct):
+        pass
+
+    def model(cls):
+        return cls
+
+else:
+
+    class Model:
+        __slots__ = ()
+
+    model = dataclass(slots=True)
+
+
+@model
+class Artist(Model):
+    name: Optional[str] = None
+    id: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, item: dict) -> "Artist":
+        return cls(item.get("name"), item.get("id"))
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "id": self.id}
+
+
+@model
+class Album(Model):
+    name: Optional[str] = None
+    id: Optional[str] = None
+    artists: Sequence[Artist] = ()
+
+    @classmethod
+    def from_dict(cls, item: dict) -> "Album":
+        return cls(
+            item.get("name"),
+            item.get("id"),
+            [Artist.from_dict(a) for a in item.get("artists") or ()],
+        )
+
+    def to_dict(self) -> dict:
+        narrowed_item = {"name": self.name, "id": self.id}
+        _set_artists(narrowed_item, [a.name for a in self.artists])
+        return narrowed_item
+
+
+@model
+class Track(Model):
+    name: Optional[str] = None
+    id: Optional[str] = None
+    artists: Sequence[Artist] = ()
+    album: Optional[Album] = None
+    track_number: Optional[int] = None
+    duration_ms: Optional[int] = None
+    is_playable: bool = True
+
+    @classmethod
+    def from_dict(cls, item: dict) -> "Track":
+        album = item.get("album")
+        return cls(
+            item.get("name"),
+            item.get("id"),
+            [Artist.from_dict(a) for a in item.get("artists") or ()],
+            Album.from_dict(album) if album else None,
+            item.get("track_number"),
+            item.get("duration_ms"),
+            item.get("is_playable", True),
+        )
+
+    def to_dict(self, detailed: bool = False) -> dict:
+        narrowed_item = {"name": self.name, "id": self.id}
+        if detailed:
+            narrowed_item["album"] = self.album.to_dict() if self.album else None
+            narrowed_item["track_number"] = self.track_number
+            narrowed_item["duration_ms"] = self.duration_ms
+        if not self.is_playable:
+            narrowed_item["is_playable"] = False
+        if detailed:
+            _set_artists(narrowed_item, [a.to_dict() for a in self.artists])
+        else:
+            _set_artists(narrowed_item, [a.name for a in self.artists])
+        return narrowed_item
+
+
+@model
+class PlaylistTrack(Model):
+    """An item of a playlist's tracks page. `track` is None for removed tracks."""
+
+    track: Optional[Track] = None
+
+    @classmethod
+    def from_dict(cls, item: dict) -> "PlaylistTrack":
+        track = item.get("track")
+        return cls(Track.from_dict(track) if track else None)
+
+    def to_dict(self) -> Optional[dict]:
+        return self.track.to_dict() if self.track else None
+
+
+if msgspec is not None:
+
+    class Page(msgspec.Struct):
+        items: list[Any] = []
+        next: Optional[str] = None
+        offset: int = 0
+        total: Optional[int] = None
+
+    _decoders = {}
+
+    def decode_page(content: bytes, item_type: type) -> dict:
+        """Decodes a paging object, turning its items into `item_type`."""
+        if item_type not in _decoders:
+            page_type = msgspec.defstruct(
+                f"{item_type.__name__}Page",
+                [("items", list[Optional[item_type]], [])],
+                bases=(Page,),
+            )
+            _decoders[item_type] = msgspec.json.Decoder(page_type)
+        page = _decoders[item_type].decode(content)
+        return {
+            "items": page.items,
+            "next": page.next,
+            "offset": page.offset,
+            "total": page.total,
+        }
+
+else:
+
+    def decode_page(content: bytes, item_type: type) -> dict:
+        """Decodes a paging object, turning its items into `item_type`."""
+        page = json.loads(content)
+        page["items"] = [
+            item_type.from_dict(item) if item else None
+            for item in page.get("items") or ()
+        ]
+        return page
+
+
+def coerce(item: Any, item_type: type) -> Any:
+    """Returns `item` as an `item_type`, building it if it is a decoded dict."""
+    if item is None or isinstance(item, item_type):
+        return item
+    return item_type.from_dict(item)
+
+
+def _set_artists(narrowed_item: dict, artists: list):
+    if len(artists) == 1:
+        narrowed_item["artist"] = artists[0]
+    else:
+        narrowed_item["artists"] = artists
@@ -0,0 +1,101 @@
+import json
+import os
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # extra 'fast' non installé
+    orjson = None
+
+# 'compact' (par défaut) ou 'pretty' (indentation, plus lisible mais ~30% plus gros)
+OUTPUT_MODE = os.getenv("SPOTIFY_OUTPUT_MODE", "compact")
+# Taille max d'une réponse d'outil, en caractères (0 = pas de limite)
+OUTPUT_MAX_CHARS = int(os.getenv("SPOTIFY_OUTPUT_MAX_CHARS", "40000"))
+
+
+def encode(obj: Any, pretty: bool = False) -> str:
+    """Serializes `obj` to JSON with orjson when it's installed, else json."""
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        return orjson.dumps(obj, option=option, default=str).decode()
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=str)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def dumps(
+    result: Any,
+    offset: int = 0,
+    max_chars: Optional[int] = None,
+    mode: Optional[str] = None,
+    paged: Optional[str] = None,
+) -> str:
+    """
+    Serializes a tool result in the configured output mode.
+    If the text exceeds `max_chars`, the longest list of the result (the result
+    itself, or one of its fields) is cut and a cursor is added:
+        "truncated": {"field": ..., "returned": n, "omitted": m, "next_offset": ...}
+    - paged: field holding the window of a collection that the tool pages
+      with `offset` (Info, Library). `next_offset` is only given when that
+      field is the one cut: it can then be passed back as-is.
+    - offset: offset of that window in the whole collection
+    """
+    pretty = (mode or OUTPUT_MODE) == "pretty"
+    max_chars = OUTPUT_MAX_CHARS if max_chars is None else max_chars
+    text = encode(result, pretty)
+    if not max_chars or len(text) <= max_chars:
+        return text
+
+    field, items = _longest_list(result)
+    if not items:
+        return text
+
+    # Chaque élément n'est encodé qu'une fois : on garde le plus long préfixe
+    # qui tient dans ce qui reste après le reste de la réponse et le curseur
+    rest = len(encode({**result, field: []}, pretty)) if field is not None else 2
+    sizes = [len(encode(item, pretty)) + 1 for item in items]
+    scale = (len(text) - rest) / sum(sizes)  # indentation imbriquée en 'pretty'
+    budget = (max_chars - rest - 200) / scale
+    kept = 0
+    while kept < len(items) and budget >= sizes[kept]:
+        budget -= sizes[kept]
+        kept += 1
+
+    # Estimation seulement : on réduit encore si le texte dépasse
+    offset = offset if field is not None and field == paged else None
+    text = _cut(result, field, items, kept, offset, pretty)
+    while len(text) > max_chars and kept > 0:
+        kept = min(kept - 1, int(kept * max_chars / len(text)))
+        text = _cut(result, field, items, kept, offset, pretty)
+    return text
+
+
+def _cut(
+    result: Any,
+    field: Optional[str],
+    items: list,
+    kept: int,
+    offset: Optional[int],
+    pretty: bool,
+) -> str:
+    """offset: None unless `field` is the paged collection."""
+    truncated = {"field": field, "returned": kept, "omitted": len(items) - kept}
+    if offset is not None:
+        truncated["next_offset"] = offset + kept
+    if field is None:
+        return encode({"items": items[:kept], "truncated": truncated}, pretty)
+    cut = {**result, field: items[:kept], "truncated": truncated}
+    if offset is not None and "next_offset" in result:
+        cut["next_offset"] = offset + kept
+    return encode(cut, pretty)
+
+
+def _longest_list(result: Any) -> tuple[Optional[str], list]:
+    if isinstance(result, list):
+        return None, result
+    if not isinstance(result, dict):
+        return None, []
+    lists = [(k, v) for k, v in result.items() if isinstance(v, list) and v]
+    if not lists:
+        return None, []
+    return max(lists, key=lambda kv: len(encode(kv[1])))
@@ -0,0 +1,82 @@
+import asyncio
+from typing import Any, AsyncIterator, Callable, Optional
+
+from .transport import Transport
+
+
+async def paginate(
+    api: Transport,
+    page: dict,
+    limit: Optional[int] = None,
+    parse: Optional[Callable[[dict], Any]] = None,
+    item_type: Optional[type] = None,
+) -> AsyncIterator[Any]:
+    """
+    Yields the items of a paging object ({items, next, offset, total}) and of
+    the following pages, fetching page n+1 while page n is being consumed.
+    - limit: stop after this many items, without fetching further pages
+    - parse: applied to each item before it is yielded
+    - item_type: `models` class the items of the following pages are decoded
+      to; `parse` then receives either these or the dicts of `page`
+    """
+    remaining = limit
+    prefetch: Optional[asyncio.Task] = None
+    try:
+        while page:
+            items = page.get("items") or []
+            if remaining is not None:
+                items = items[:remaining]
+                remaining -= len(items)
+
+            if page.get("next") and (remaining is None or remaining > 0):
+                prefetch = asyncio.create_task(api.get_next(page, item_type))
+            else:
+                prefetch = None
+
+            for item in items:
+                yield parse(item) if parse else item
+
+            page = await prefetch if prefetch else None
+            prefetch = None
+    finally:
+        if prefetch is not None:
+            prefetch.cancel()
+
+
+async def fetch_window(
+    api: Transport,
+    path: str,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    parse: Optional[Callable[[dict], Any]] = None,
+    first_page: Optional[dict] = None,
+    page_size: int = 50,
+    item_type: Optional[type] = None,
+    **params,
+) -> dict:
+    """
+    Returns items [offset, offset + limit) of the collection at `path`.
+    `first_page`, if it covers `offset`, saves the first request (e.g. the
+    tracks page embedded in a playlist object).
+
+    Returns:
+        {"items": [...], "total": int, "offset": int, "next_offset": int or None}
+    """
+    page = first_page
+    page_offset = page.get("offset", 0) if page else 0
+    if page is None or not page_offset <= offset < page_offset + len(page["items"]):
+        page = await api.get(path, item_type, offset=offset, limit=page_size, **params)
+        page_offset = offset
+
+    skip = offset - page_offset
+    page = {**page, "items": page["items"][skip:]}
+    items = [item async for item in paginate(api, page, limit, parse, item_type)]
+
+    total = page.get("total", offset + len(items))
+    end = offset + len(items)
+    return {
+        "items": items,
+        "total": total,
+        "offset": offset,
+        "next_offset": end if end < total else None,
+    }
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+Listener = Callable[[Optional[dict]], Awaitable[None]]
+
+
+class PlaybackState:
+    """
+    Shared snapshot of GET /me/player, the source of every playback read
+    (current track, is playing, pause check, queue head).
+    - Reads reuse the snapshot while it is younger than `max_age` seconds;
+      playback commands call `invalidate()` so the next read sees their effect.
+      Commands deciding what to send read it with `max_age=0`: the state may
+      have been changed from another device.
+    - While listeners are subscribed, a background poller refreshes it every
+      `playing_interval` seconds during playback (and right after the current
+      track should end), every `idle_interval` seconds otherwise, and calls the
+      listeners when the track, play state, device or context changes.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        fetch: Callable[[], Awaitable[Optional[dict]]],
+        max_age: float = 5.0,
+        playing_interval: float = 5.0,
+        idle_interval: float = 30.0,
+        settle_delay: float = 1.0,
+    ):
+        self.logger = logger
+        self.fetch = fetch
+        self.max_age = max_age
+        self.playing_interval = playing_interval
+        self.idle_interval = idle_interval
+        # Délai avant de relire l'état après une commande, le temps que Spotify l'applique
+        self.settle_delay = settle_delay
+        self._snapshot: Optional[dict] = None
+        self._fetched_at: Optional[float] = None
+        self._key: Optional[tuple] = None
+        self._lock = asyncio.Lock()
+        self._listeners: List[Listener] = []
+        self._poller: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+        self.fetches = 0
+        self.changes = 0
+
+    def is_stale(self, max_age: Optional[float] = None) -> bool:
+        max_age = self.max_age if max_age is None else max_age
+        age = self.age()
+        return age is None or age > max_age
+
+    def age(self) -> Optional[float]:
+        """Seconds since the snapshot was fetched (None if it is invalidated)."""
+        if self._fetched_at is None:
+            return None
+        return time.monotonic() - self._fetched_at
+
+    def invalidate(self):
+        """Marks the snapshot outdated, after a command changed the playback."""
+        self._fetched_at = None
+        self._wakeup.set()
+
+    def peek(self) -> Optional[dict]:
+        """Returns the snapshot if it is fresh, without fetching it."""
+        return None if self.is_stale() else self._snapshot
+
+    async def snapshot(self, max_age: Optional[float] = None) -> Optional[dict]:
+        """
+        Returns the /me/player response (None if nothing is playing).
+        With `max_age=0`, the state is one received after the call: concurrent
+        calls share the same fetch.
+        """
+        if not self.is_stale(max_age):
+            return self._snapshot
+        called = time.monotonic()
+        changed = False
+        async with self._lock:
+            # Un autre appel a pu rafraîchir l'état pendant l'attente : il
+            # suffit s'il a été reçu après cet appel
+            fetched_since = self._fetched_at is not None and self._fetched_at >= called
+            if self.is_stale(max_age) and not fetched_since:
+                changed = await self._refresh()
+            snapshot = self._snapshot
+        if changed:
+            await self._notify(snapshot)
+        return snapshot
+
+    async def _refresh(self) -> bool:
+        """Fetches the state. Returns True if it changed since the last fetch."""
+        snapshot = await self.fetch()
+        self.fetches += 1
+        self._snapshot = snapshot
+        self._fetched_at = time.monotonic()
+        key = _key(snapshot)
+        if key == self._key:
+            return False
+        first, self._key = self._key is None, key
+        if not first:
+            self.changes += 1
+        return not first
+
+    async def _notify(self, snapshot: Optional[dict]):
+        results = await asyncio.gather(
+            *(listener(snapshot) for listener in self._listeners),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                self.logger.error("Playback listener failed: %s", result)
+
+    # Abonnements
+
+    def subscribe(self, listener: Listener):
+        """Calls `listener(snapshot)` on every change, polling in the background."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+
+    def unsubscribe(self, listener: Listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+        if not self._listeners and self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+
+    async def _poll(self):
+        while self._listeners:
+            try:
+                await self.snapshot(max_age=self.settle_delay)
+            except Exception as e:
+                self.logger.error("Playback poll failed: %s", e)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._next_interval())
+                # Réveillé par une commande : on lui laisse le temps de s'appliquer
+                await asyncio.sleep(self.settle_delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _next_interval(self) -> float:
+        snapshot = self._snapshot
+        if not snapshot or not snapshot.get("is_playing"):
+            return self.idle_interval
+        item = snapshot.get("item") or {}
+        remaining_ms = (item.get("duration_ms") or 0) - (
+            snapshot.get("progress_ms") or 0
+        )
+        if remaining_ms <= 0:
+            return self.playing_interval
+        # Relire juste après la fin du titre pour voir le suivant sans attendre
+        return max(1.0, min(self.playing_interval, remaining_ms / 1000 + 0.5))
+
+    async def close(self):
+        self._listeners.clear()
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+
+    def stats(self) -> dict:
+        return {
+            "fetches": self.fetches,
+            "changes": self.changes,
+            "listeners": len(self._listeners),
+            "polling": self._poller is not None and not self._poller.done(),
+        }
+
+
+def _key(snapshot: Optional[dict]) -> Optional[tuple]:
+    """What a now-playing subscriber cares about (not the progress)."""
+    if not snapshot:
+        return ("idle",)
+    return (
+        (snapshot.get("item") or {}).get("id"),
+        snapshot.get("is_playing"),
+        (snapshot.get("device") or {}).get("id"),
+        (snapshot.get("context") or {}).get("uri"),
+    )
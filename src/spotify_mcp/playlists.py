@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import time
+import unicodedata
+from typing import AsyncIterator, Callable, Optional
+
+
+def normalize_name(name: str) -> str:
+    """Lowercases, strips accents and collapses spaces: 'Été  Chill' -> 'ete chill'."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+class PlaylistIndex:
+    """
+    In-memory map of the user's playlist names to IDs, built from every page
+    of /me/playlists. Lookups are case- and accent-insensitive; when two
+    playlists share a name, the first one listed by Spotify wins.
+    A name that isn't found triggers one reload if the index is older than
+    `min_reload_interval`, to catch playlists created outside this server.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        fetch_all: Callable[[], AsyncIterator[dict]],
+        min_reload_interval: float = 30.0,
+    ):
+        self.logger = logger
+        self.fetch_all = fetch_all
+        self.min_reload_interval = min_reload_interval
+        self._ids: Optional[dict[str, str]] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _load(self):
+        ids = {}
+        async for playlist in self.fetch_all():
+            ids.setdefault(normalize_name(playlist["name"]), playlist["id"])
+        self._ids = ids
+        self._loaded_at = time.monotonic()
+        self.logger.info("Playlist index loaded: %s names", len(ids))
+
+    async def resolve(self, name: str) -> Optional[str]:
+        """Returns the ID of the user's playlist called `name`, or None."""
+        key = normalize_name(name)
+        async with self._lock:
+            if self._ids is None:
+                await self._load()
+            elif (
+                key not in self._ids
+                and time.monotonic() - self._loaded_at > self.min_reload_interval
+            ):
+                await self._load()
+        return self._ids.get(key)
+
+    def add(self, playlist: dict):
+        """
+        Records a playlist created by this server without reloading the index.
+        New playlists are listed first by Spotify, so it takes over the name.
+        """
+        if self._ids is not None:
+            self._ids[normalize_name(playlist["name"])] = playlist["id"]
+
+    def invalidate(self):
+        self._ids = None
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+
+@dataclass
+class PoolConfig:
+    """Connection pool settings, read from SPOTIFY_HTTP_* environment variables."""
+
+    max_connections: int = 20
+    max_keepalive: int = 10
+    keepalive_expiry: float = 60.0
+    per_host: int = 10
+    http2: bool = False
+    connect_timeout: float = 5.0
+    read_timeout: float = 10.0
+    pool_timeout: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        return cls(
+            max_connections=int(
+                os.getenv("SPOTIFY_HTTP_MAX_CONNECTIONS", cls.max_connections)
+            ),
+            max_keepalive=int(
+                os.getenv("SPOTIFY_HTTP_MAX_KEEPALIVE", cls.max_keepalive)
+            ),
+            keepalive_expiry=float(
+                os.getenv("SPOTIFY_HTTP_KEEPALIVE_EXPIRY", cls.keepalive_expiry)
+            ),
+            per_host=int(os.getenv("SPOTIFY_HTTP_PER_HOST", cls.per_host)),
+            http2=os.getenv("SPOTIFY_HTTP2", "").lower() in ("1", "true", "yes"),
+            connect_timeout=float(
+                os.getenv("SPOTIFY_HTTP_CONNECT_TIMEOUT", cls.connect_timeout)
+            ),
+            read_timeout=float(
+                os.getenv("SPOTIFY_HTTP_READ_TIMEOUT", cls.read_timeout)
+            ),
+            pool_timeout=float(
+                os.getenv("SPOTIFY_HTTP_POOL_TIMEOUT", cls.pool_timeout)
+            ),
+        )
+
+
+class ConnectionPool:
+    """
+    Shared httpx client used for every upstream call (Web API and accounts).
+    Keeps connections alive between tool calls, caps concurrent requests per
+    host and counts requests, new connections and TLS handshakes.
+    """
+
+    def __init__(self, logger: logging.Logger, config: Optional[PoolConfig] = None):
+        self.logger = logger
+        self.config = config or PoolConfig.from_env()
+
+        http2 = self.config.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                self.logger.error(
+                    "SPOTIFY_HTTP2 is set but the 'h2' package is missing, "
+                    "install spotify-mcp[http2]. Falling back to HTTP/1.1."
+                )
+                http2 = False
+
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.config.max_connections,
+                max_keepalive_connections=self.config.max_keepalive,
+                keepalive_expiry=self.config.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                connect=self.config.connect_timeout,
+                read=self.config.read_timeout,
+                write=self.config.read_timeout,
+                pool=self.config.pool_timeout,
+            ),
+        )
+        self.http2 = http2
+        self._host_slots: dict[str, asyncio.Semaphore] = {}
+
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.pool_timeouts = 0
+        self.slot_wait_seconds = 0.0
+
+    def _slots(self, host: str) -> asyncio.Semaphore:
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.config.per_host)
+        return self._host_slots[host]
+
+    async def _trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+        elif event_name == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Sends a request through the pool, waiting for a free per-host slot."""
+        slots = self._slots(urlsplit(url).netloc)
+        waited_from = time.perf_counter()
+        async with slots:
+            self.slot_wait_seconds += time.perf_counter() - waited_from
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                return await self.client.request(
+                    method, url, extensions={"trace": self._trace}, **kwargs
+                )
+            except httpx.PoolTimeout:
+                self.pool_timeouts += 1
+                raise
+            finally:
+                self.in_flight -= 1
+
+    def stats(self) -> dict:
+        """Returns pool counters, to size SPOTIFY_HTTP_* settings."""
+        pool = getattr(self.client._transport, "_pool", None)
+        connections = getattr(pool, "connections", [])
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "open_connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "connections_opened": self.connections_opened,
+            "tls_handshakes": self.tls_handshakes,
+            "pool_timeouts": self.pool_timeouts,
+            "slot_wait_seconds": round(self.slot_wait_seconds, 3),
+            "max_connections": self.config.max_connections,
+            "per_host": self.config.per_host,
+            "http2": self.http2,
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_shared_pool: Optional[ConnectionPool] = None
+# Les clients des utilisateurs sont créés dans des threads (voir tenants.py)
+_shared_pool_lock = threading.Lock()
+
+
+def shared_pool(logger: logging.Logger) -> ConnectionPool:
+    """Returns the process-wide pool, creating it on first use."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ConnectionPool(logger)
+    return _shared_pool
@@ -0,0 +1,334 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # extra 'recommend' non installé : calcul en Python pur
+    np = None
+
+# Durée de vie de la matrice de caractéristiques, en secondes
+RECOMMEND_MAX_AGE = float(os.getenv("SPOTIFY_RECOMMEND_MAX_AGE", "3600"))
+
+# Poids de chaque famille de caractéristiques, avant la pondération IDF
+WEIGHTS = {
+    "artist": 1.0,
+    "genre": 0.6,
+    "album": 0.4,
+    "playlist": 0.5,
+    "decade": 0.2,
+}
+# Poids des favoris par période dans le profil par défaut (sans graines)
+TOP_RANGE_WEIGHTS = {"short_term": 1.0, "medium_term": 0.6, "long_term": 0.3}
+TOP_ARTISTS_WEIGHT = 0.5
+# Au-delà, les morceaux d'un même artiste laissent la place aux autres
+MAX_PER_ARTIST = 2
+
+
+@dataclass
+class TasteData:
+    """
+    What the recommender learns from: data the server already has locally or
+    in its response cache (see Client._taste_data), or fixtures.
+    - tracks: id -> track object; its artists and album give its features,
+      and every track is a candidate
+    - artists: id -> full artist object, for the genres
+    - playlists: playlist id -> ids of its tracks (co-occurrence)
+    - library: ids of the saved tracks
+    - top_tracks: time range -> ids of the top tracks, best first
+    - top_artists: ids of the top artists, best first
+    """
+
+    tracks: dict
+    artists: dict = field(default_factory=dict)
+    playlists: dict = field(default_factory=dict)
+    library: set = field(default_factory=set)
+    top_tracks: dict = field(default_factory=dict)
+    top_artists: list = field(default_factory=list)
+
+
+class FeatureMatrix:
+    """
+    Sparse track x feature matrix: one row per track, one column per artist,
+    genre, album, playlist and release decade.
+    - Values are the family weight (WEIGHTS) times the inverse document
+      frequency, so a genre shared by half the library counts less than a
+      rare one; rows are L2-normalized, so X.p is a cosine similarity.
+    - Stored as coordinate arrays sorted by row: scoring every track against
+      a profile is one gather and one bincount with NumPy (a loop without it).
+    """
+
+    def __init__(self, data: TasteData):
+        self.genres = {
+            artist_id: artist.get("genres") or []
+            for artist_id, artist in data.artists.items()
+        }
+        playlists_of = defaultdict(list)
+        for playlist_id, track_ids in data.playlists.items():
+            for track_id in track_ids:
+                playlists_of[track_id].append(playlist_id)
+
+        self.ids = list(data.tracks)
+        self.row_of = {track_id: i for i, track_id in enumerate(self.ids)}
+        self.artists_of = [
+            [a["id"] for a in data.tracks[track_id]["artists"] if a.get("id")]
+            for track_id in self.ids
+        ]
+        features = [
+            self._features(data.tracks[track_id], playlists_of[track_id])
+            for track_id in self.ids
+        ]
+
+        # Fréquence documentaire -> IDF lissé, une valeur par colonne
+        document_frequency = defaultdict(int)
+        for row in features:
+            for feature in row:
+                document_frequency[feature] += 1
+        self.columns = {feature: i for i, feature in enumerate(document_frequency)}
+        n = len(self.ids)
+        self.idf = {
+            feature: math.log((1 + n) / (1 + df)) + 1
+            for feature, df in document_frequency.items()
+        }
+        self.features = list(self.columns)
+
+        # starts[i]:starts[i + 1] : les valeurs de la ligne i
+        rows, cols, vals, self.starts = [], [], [], [0]
+        for i, row in enumerate(features):
+            vector = self._weighted(row)
+            rows.extend([i] * len(vector))
+            cols.extend(self.columns[feature] for feature in vector)
+            vals.extend(vector.values())
+            self.starts.append(len(rows))
+        if np is not None:
+            self.rows = np.asarray(rows, dtype=np.int32)
+            self.cols = np.asarray(cols, dtype=np.int32)
+            self.vals = np.asarray(vals, dtype=np.float32)
+        else:
+            self.rows, self.cols, self.vals = rows, cols, vals
+
+    def _features(self, track: dict, playlists: Iterable[str] = ()) -> dict:
+        """Feature -> family weight, before IDF."""
+        features = {}
+        for artist in track.get("artists") or []:
+            if not artist.get("id"):
+                continue
+            features[f"artist:{artist['id']}"] = WEIGHTS["artist"]
+            genres = self.genres.get(artist["id"]) or []
+            for genre in genres:
+                # Un artiste aux nombreux genres ne pèse pas plus qu'un autre
+                weight = WEIGHTS["genre"] / math.sqrt(len(genres))
+                features[f"genre:{genre}"] = max(
+                    features.get(f"genre:{genre}", 0), weight
+                )
+        album = track.get("album") or {}
+        if album.get("id"):
+            features[f"album:{album['id']}"] = WEIGHTS["album"]
+        if album.get("release_date"):
+            decade = album["release_date"][:3]
+            features[f"decade:{decade}0s"] = WEIGHTS["decade"]
+        for playlist_id in playlists:
+            features[f"playlist:{playlist_id}"] = WEIGHTS["playlist"]
+        return features
+
+    def _weighted(self, features: dict) -> dict:
+        """Applies the IDF (unknown features are dropped) and L2-normalizes."""
+        vector = {
+            feature: weight * self.idf[feature]
+            for feature, weight in features.items()
+            if feature in self.idf
+        }
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {feature: v / norm for feature, v in vector.items()} if norm else {}
+
+    def track_vector(self, track: dict) -> dict:
+        """Sparse vector of a track, known or not (its playlists are ignored)."""
+        return self._weighted(self._features(track))
+
+    def artist_vector(self, artist: dict) -> dict:
+        """Sparse vector of an artist: the features a track of theirs would have."""
+        if artist.get("genres") is not None:
+            self.genres.setdefault(artist["id"], artist["genres"])
+        return self._weighted(self._features({"artists": [artist]}))
+
+    def row_vector(self, row: int) -> dict:
+        """Sparse vector of a track of the matrix, playlists included."""
+        start, end = self.starts[row], self.starts[row + 1]
+        return {
+            self.features[int(col)]: float(val)
+            for col, val in zip(self.cols[start:end], self.vals[start:end])
+        }
+
+    def scores(self, profile: dict) -> "np.ndarray | list":
+        """Cosine similarity of every track with a sparse profile vector."""
+        if np is not None:
+            dense = np.zeros(len(self.columns), dtype=np.float32)
+            for feature, value in profile.items():
+                if feature in self.columns:
+                    dense[self.columns[feature]] = value
+            norm = np.linalg.norm(dense)
+            if norm:
+                dense /= norm
+            return np.bincount(
+                self.rows, weights=self.vals * dense[self.cols], minlength=len(self.ids)
+            )
+
+        profile = {self.columns[f]: v for f, v in profile.items() if f in self.columns}
+        norm = math.sqrt(sum(v * v for v in profile.values())) or 1.0
+        scores = [0.0] * len(self.ids)
+        for row, col, val in zip(self.rows, self.cols, self.vals):
+            if col in profile:
+                scores[row] += val * profile[col] / norm
+        return scores
+
+    def rank(
+        self, profile: dict, limit: int, exclude: set, max_per_artist: int
+    ) -> List[tuple[str, float]]:
+        """Best tracks for a profile: [(track id, score)], best first."""
+        scores = self.scores(profile)
+        if np is not None:
+            order = np.argsort(-scores, kind="stable")
+        else:
+            order = sorted(range(len(scores)), key=lambda i: -scores[i])
+
+        ranked, per_artist = [], defaultdict(int)
+        for row in order:
+            score = float(scores[row])
+            if score <= 0 or len(ranked) == limit:
+                break
+            track_id = self.ids[row]
+            if track_id in exclude:
+                continue
+            artists = self.artists_of[row]
+            if any(per_artist[a] >= max_per_artist for a in artists):
+                continue
+            for artist_id in artists:
+                per_artist[artist_id] += 1
+            ranked.append((track_id, score))
+        return ranked
+
+
+def add_vector(profile: dict, vector: dict, weight: float):
+    for feature, value in vector.items():
+        profile[feature] = profile.get(feature, 0.0) + weight * value
+
+
+class Recommender:
+    """
+    Local replacement of the /recommendations endpoint, which Spotify no
+    longer serves to new apps: tracks are ranked by their similarity with a
+    taste profile over a precomputed FeatureMatrix.
+    - fetch() gathers the TasteData; the matrix is rebuilt from it when it is
+      older than `max_age`, one build at a time, off the event loop.
+    - The profile is the sum of the seed vectors; without seeds, the user's
+      top tracks (recent ones weigh more) and top artists.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        fetch: Callable[[], Awaitable[TasteData]],
+        max_age: float = RECOMMEND_MAX_AGE,
+    ):
+        self.logger = logger
+        self.fetch = fetch
+        self.max_age = max_age
+        self._data: Optional[TasteData] = None
+        self._matrix: Optional[FeatureMatrix] = None
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+
+        self.builds = 0
+        self.build_seconds = 0.0
+
+    async def matrix(self) -> tuple[FeatureMatrix, TasteData]:
+        async with self._lock:
+            if self._matrix is None or time.monotonic() - self._built_at > self.max_age:
+                data = await self.fetch()
+                started = time.perf_counter()
+                self._matrix = await asyncio.to_thread(FeatureMatrix, data)
+                self._data = data
+                self._built_at = time.monotonic()
+                self.builds += 1
+                self.build_seconds = time.perf_counter() - started
+                self.logger.info(
+                    "Recommendation matrix built: %d tracks, %d features in %.0f ms",
+                    len(self._matrix.ids),
+                    len(self._matrix.columns),
+                    self.build_seconds * 1000,
+                )
+        return self._matrix, self._data
+
+    def invalidate(self):
+        self._matrix = None
+
+    async def recommend(
+        self,
+        seed_tracks: Optional[dict] = None,
+        seed_artists: Optional[dict] = None,
+        limit: int = 20,
+        exclude_library: bool = False,
+        max_per_artist: int = MAX_PER_ARTIST,
+        artists: Optional[dict] = None,
+    ) -> List[tuple[dict, float]]:
+        """
+        Returns [(track object, score)], best first.
+        - seed_tracks, seed_artists: id -> object (tracks unknown to the
+          matrix are placed by their artists, genres and album)
+        - exclude_library: only tracks that aren't saved yet
+        - artists: id -> full artist object, for the genres of the artists
+          of seed tracks unknown to the matrix
+        """
+        matrix, data = await self.matrix()
+        for artist in (artists or {}).values():
+            matrix.genres.setdefault(artist["id"], artist.get("genres") or [])
+        profile: dict = {}
+        if seed_tracks or seed_artists:
+            for track_id, track in (seed_tracks or {}).items():
+                add_vector(profile, _vector_of(matrix, track_id, track), 1.0)
+            for artist in (seed_artists or {}).values():
+                add_vector(profile, matrix.artist_vector(artist), 1.0)
+            exclude = set(seed_tracks or ())
+        else:
+            for time_range, weight in TOP_RANGE_WEIGHTS.items():
+                for rank, track_id in enumerate(data.top_tracks.get(time_range, [])):
+                    if track_id in data.tracks:
+                        # Décroissance avec le rang : le n°1 compte plus que le n°50
+                        vector = _vector_of(matrix, track_id, data.tracks[track_id])
+                        add_vector(profile, vector, weight / (1 + rank / 10))
+            for rank, artist_id in enumerate(data.top_artists):
+                if artist_id in data.artists:
+                    vector = matrix.artist_vector(data.artists[artist_id])
+                    add_vector(profile, vector, TOP_ARTISTS_WEIGHT / (1 + rank / 10))
+            # Sans graines, on propose autre chose que les favoris récents
+            exclude = set(data.top_tracks.get("short_term", []))
+        if exclude_library:
+            exclude |= data.library
+
+        started = time.perf_counter()
+        ranked = matrix.rank(profile, limit, exclude, max_per_artist)
+        self.logger.debug(
+            "Ranked %d tracks in %.2f ms",
+            len(matrix.ids),
+            (time.perf_counter() - started) * 1000,
+        )
+        return [(data.tracks[track_id], score) for track_id, score in ranked]
+
+    def stats(self) -> dict:
+        return {
+            "tracks": len(self._matrix.ids) if self._matrix else 0,
+            "features": len(self._matrix.columns) if self._matrix else 0,
+            "builds": self.builds,
+            "build_ms": round(self.build_seconds * 1000, 1),
+            "numpy": np is not None,
+        }
+
+
+def _vector_of(matrix: FeatureMatrix, track_id: str, track: dict) -> dict:
+    row = matrix.row_of.get(track_id)
+    return matrix.row_vector(row) if row is not None else matrix.track_vector(track)
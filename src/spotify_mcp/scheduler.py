@@ -0,0 +1,160 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from .store import SharedStore, shared_store
+
+# Priorités : plus petit = servi en premier
+PLAYBACK = 0
+WRITE = 1
+READ = 2
+
+
+def priority_of(method: str, path: str) -> int:
+    """Playback control first, then other writes, then catalog/library reads."""
+    if path.startswith("me/player"):
+        return PLAYBACK
+    return READ if method == "GET" else WRITE
+
+
+class RequestScheduler:
+    """
+    Admission control for Web API requests, shared by every client of the process
+    (Spotify rate-limits per application over a rolling 30 second window).
+    - Token bucket: `rate` requests per second on average, bursts of `burst`.
+    - A 429 response pauses every request until its Retry-After has elapsed.
+      With a shared store (see store.py), the pause is written through to it
+      and read before each admission: it holds the requests of every worker
+      process of the server.
+    - When requests have to wait, they are admitted by priority, then in
+      arrival order.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        rate: float = 6.0,
+        burst: int = 20,
+        store: Optional[SharedStore] = None,
+    ):
+        self.logger = logger
+        self.rate = rate
+        self.burst = burst
+        self.store = store
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+        self.admitted = 0
+        self.delayed = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    def _delay(self, now: float) -> float:
+        """Seconds before the next request may be sent."""
+        self._refill(now)
+        if self.store is not None:
+            # Pause d'un autre processus : heure murale -> horloge monotone
+            until = self.store.get_pause()
+            if until:
+                self._paused_until = max(self._paused_until, now + until - time.time())
+        wait_tokens = max(0.0, (1 - self._tokens) / self.rate)
+        return max(wait_tokens, self._paused_until - now)
+
+    async def acquire(self, priority: int = READ):
+        """Waits until a request of this priority may be sent."""
+        now = time.monotonic()
+        if not self._waiters and self._delay(now) <= 0:
+            self._tokens -= 1
+            self.admitted += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        self.delayed += 1
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        self._wakeup.set()
+        await future
+        self.wait_seconds += time.monotonic() - now
+
+    async def _dispatch(self):
+        while self._waiters:
+            delay = self._delay(time.monotonic())
+            if delay > 0:
+                # Réveillé plus tôt si une pause 429 ou une requête arrive entre-temps
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():  # annulée pendant l'attente
+                continue
+            self._tokens -= 1
+            self.admitted += 1
+            future.set_result(None)
+
+    def pause(self, seconds: float):
+        """Holds every request for `seconds`, after a 429 Too Many Requests."""
+        self.throttled += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        if self.store is not None:
+            self.store.put_pause(time.time() + seconds)
+        self._wakeup.set()
+        self.logger.warning(
+            "Rate limited by Spotify, pausing requests for %ss", seconds
+        )
+
+    def stats(self) -> dict:
+        return {
+            "admitted": self.admitted,
+            "delayed": self.delayed,
+            "waiting": sum(1 for *_, f in self._waiters if not f.done()),
+            "throttled": self.throttled,
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            "wait_seconds": round(self.wait_seconds, 3),
+            "rate": self.rate,
+            "burst": self.burst,
+        }
+
+
+_shared_scheduler: Optional[RequestScheduler] = None
+_shared_scheduler_lock = threading.Lock()
+
+
+def shared_scheduler(logger: logging.Logger) -> RequestScheduler:
+    """
+    Returns the process-wide scheduler, configured from SPOTIFY_RATE_* variables.
+    The budget is the application's: with SPOTIFY_WORKERS processes, each one
+    gets its share of the rate and of the burst.
+    """
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            limit = float(os.getenv("SPOTIFY_RATE_LIMIT", "180"))
+            window = float(os.getenv("SPOTIFY_RATE_WINDOW", "30"))
+            workers = max(1, int(os.getenv("SPOTIFY_WORKERS", "1")))
+            _shared_scheduler = RequestScheduler(
+                logger,
+                rate=limit / window / workers,
+                burst=max(1, int(os.getenv("SPOTIFY_RATE_BURST", "20")) // workers),
+                store=shared_store(logger),
+            )
+    return _shared_scheduler
@@ -0,0 +1,42 @@
+import contextlib
+import contextvars
+from typing import Iterator, Optional
+
+
+class CallScope:
+    """
+    Request-scoped state of one tool call, shared by every task it spawns.
+    - responses: GET responses already received during the call, served again
+      instead of repeating the request (cleared by any write, which may change
+      what a GET returns)
+    - upstream: requests actually sent to Spotify, retries included
+    - memoized: GETs served from `responses`
+    - errors: upstream requests answered with an error (429s excepted, they
+      are retried)
+    """
+
+    def __init__(self):
+        self.responses: dict = {}
+        self.upstream = 0
+        self.memoized = 0
+        self.errors = 0
+
+
+_current: contextvars.ContextVar[Optional[CallScope]] = contextvars.ContextVar(
+    "spotify_call_scope", default=None
+)
+
+
+@contextlib.contextmanager
+def call_scope() -> Iterator[CallScope]:
+    """Opens a scope for the requests of the code run inside it."""
+    scope = CallScope()
+    token = _current.set(scope)
+    try:
+        yield scope
+    finally:
+        _current.reset(token)
+
+
+def current_scope() -> Optional[CallScope]:
+    return _current.get()
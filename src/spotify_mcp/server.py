@@ -1,68 +1,27 @@
 import sys
+import time
+
+STARTED_AT = time.perf_counter()
+
+import asyncio
+import contextlib
+import functools
 import json
+import os
 import traceback
-from typing import Optional, Any
+from typing import List, Optional, Any
 
 import mcp.types as types
 from mcp.server import Server  # , stdio_server
+from mcp.server.lowlevel.helper_types import ReadResourceContents
 import mcp.server.stdio
 from pydantic import BaseModel, Field
-from spotipy import SpotifyException
-
-from spotify_mcp import spotify_api
-
-
-def setup_logger():
-    class Logger:
-        def __init__(self):
-            # Créer un fichier de log avec le chemin complet
-            import os
 
-            log_dir = os.path.dirname(os.path.abspath(__file__))
-            self.log_file = open(
-                os.path.join(log_dir, "spotify_mcp.log"), "a", encoding="utf-8"
-            )
-
-        def info(self, message):
-            log_message = f"[INFO] {message}"
-            print(log_message, file=self.log_file)
-            self.log_file.flush()
-            print(log_message)  # Affiche aussi dans le terminal
-
-        def error(self, message):
-            log_message = f"[ERROR] {message}"
-            print(log_message, file=self.log_file)
-            self.log_file.flush()
-            print(log_message)
-
-        def debug(self, message):
-            log_message = f"[DEBUG] {message}"
-            print(log_message, file=self.log_file)
-            self.log_file.flush()
-            print(log_message)
-
-        def trace(self, message, obj=None):
-            log_message = f"[TRACE] {message}"
-            print(log_message, file=self.log_file)
-            if obj:
-                print(f"[TRACE] Object: {repr(obj)}", file=self.log_file)
-            self.log_file.flush()
-            print(log_message)
-            if obj:
-                print(f"[TRACE] Object: {repr(obj)}")
-
-        def exception(self, message):
-            log_message = f"[EXCEPTION] {message}\n{traceback.format_exc()}"
-            print(log_message, file=self.log_file)
-            self.log_file.flush()
-            print(log_message)
-
-        def __del__(self):
-            # Fermer le fichier de log quand l'objet est détruit
-            if hasattr(self, "log_file"):
-                self.log_file.close()
-
-    return Logger()
+from spotify_mcp import output
+from spotify_mcp.logs import Payload, setup_logger
+from spotify_mcp.metrics import METRICS_FILE, METRICS_INTERVAL, shared_metrics
+from spotify_mcp.scope import call_scope
+from spotify_mcp.tenants import TENANT_DIR, ClientPool, current_credentials
 
 
 def debug_object(obj: Any, name: str = "Object") -> str:
@@ -76,23 +35,42 @@ def debug_object(obj: Any, name: str = "Object") -> str:
 
 
 server = Server("spotify-mcp")
-options = server.create_initialization_options()
 global_logger = setup_logger()
 
 # Debug log startup information
-global_logger.debug(
-    f"Server initialized with options: {debug_object(options, 'options')}"
-)
-global_logger.debug(f"Python version: {sys.version}")
-global_logger.debug(f"Arguments: {debug_object(sys.argv, 'sys.argv')}")
+global_logger.debug("Python version: %s", sys.version)
+global_logger.debug("Arguments: %s", debug_object(sys.argv, "sys.argv"))
+
+# Transport MCP : "stdio" (un client) ou "sse" (HTTP, plusieurs clients et
+# processus, voir web.py)
+TRANSPORT = os.getenv("SPOTIFY_TRANSPORT", "stdio")
+
+
+def create_client(credentials: Optional[str], key: str):
+    """Builds the Spotify client of a user (see tenants.ClientPool)."""
+    # spotipy est long à importer : chargé ici plutôt qu'au démarrage
+    from spotify_mcp import spotify_api
+
+    if credentials is None:
+        return spotify_api.Client(global_logger)
+    os.makedirs(TENANT_DIR, exist_ok=True)
+    return spotify_api.Client(
+        global_logger,
+        refresh_token=credentials,
+        library_db=os.path.join(TENANT_DIR, f"{key}.db"),
+    )
+
+
+clients = ClientPool(global_logger, create_client)
 
-try:
-    global_logger.debug("Initializing Spotify client")
-    spotify_client = spotify_api.Client(global_logger)
-    global_logger.debug("Spotify client initialized successfully")
-except Exception as e:
-    global_logger.exception(f"Failed to initialize Spotify client: {str(e)}")
-    raise
+
+async def get_client():
+    """
+    Returns the Spotify client of the current session's user, creating it on
+    their first call: the OAuth setup reads (and may refresh) the token, so it
+    runs in a thread.
+    """
+    return await clients.get(current_credentials())
 
 
 class ToolModel(BaseModel):
@@ -129,13 +107,35 @@ class Queue(ToolModel):
     )
 
 
+# Champ de la réponse d'Info paginé par `offset`, selon le type d'objet
+INFO_WINDOWS = {"playlist": "tracks", "album": "tracks", "artist": "albums"}
+
+
 class Info(ToolModel):
     """Get information about an item (track, album, artist, or playlist)."""
 
-    item_uri: str = Field(
+    item_uri: Optional[str] = Field(
+        default=None,
         description="URI of the item to get information about. "
         + "If 'playlist' or 'album', returns its tracks. "
-        + "If 'artist', returns albums and top tracks."
+        + "If 'artist', returns albums and top tracks.",
+    )
+    item_uris: Optional[list[str]] = Field(
+        default=None,
+        description="List of URIs (tracks, albums, artists, playlists, mixed) to get "
+        + "information about in one call, instead of item_uri. Results are returned "
+        + "in the same order; artists come without albums and top tracks; "
+        + "an item that can't be found is returned with an 'error' field.",
+    )
+    offset: Optional[int] = Field(
+        default=0,
+        description="Index of the first track (playlist, album) or album (artist) "
+        + "to return. Use the 'next_offset' of a previous answer to get the next page.",
+    )
+    limit: Optional[int] = Field(
+        default=None,
+        description="Number of tracks (playlist, album) or albums (artist) to return. "
+        + "Defaults to 100 for playlists and albums, 20 for artists.",
     )
     # qtype: str = Field(default="track", description="Type of item: 'track', 'album', 'artist', or 'playlist'. "
     #                                                 )
@@ -164,10 +164,54 @@ class TopItems(ToolModel):
     )
     time_range: Optional[str] = Field(
         default="long_term",
-        description="Time period over which to retrieve top items: 'long_term' (~ 1 year), 'medium_term' (~ 6 months), or 'short_term' (~ 4 weeks)",
+        description="Time period over which to retrieve top items: 'long_term' (~ 1 year), 'medium_term' (~ 6 months), or 'short_term' (~ 4 weeks). "
+        + "'all' returns the top of the rankings of the three periods, with the items rising, falling, new or gone from the last year to the last 4 weeks over the whole rankings (up to 200 items).",
+    )
+    limit: Optional[int] = Field(
+        default=10,
+        description="Number of items to retrieve (max 50); with 'all', the number of items of each ranking and list of changes (max 25)",
+    )
+
+
+class Library(ToolModel):
+    """Search the user's saved tracks, saved albums and playlists in a local index of their library."""
+
+    action: Optional[str] = Field(
+        default="search",
+        description="'search' to query the library, 'sync' to update the local index "
+        + "(done automatically when it is older than a few minutes).",
+    )
+    query: Optional[str] = Field(
+        default=None,
+        description="Words to look for in names, artists and album names. "
+        + "If omitted, items are listed newest first.",
+    )
+    item_type: Optional[str] = Field(
+        default="tracks", description="'tracks', 'albums' or 'playlists'"
+    )
+    artist: Optional[str] = Field(
+        default=None, description="Only return items by this artist"
+    )
+    limit: Optional[int] = Field(
+        default=20, description="Maximum number of items to return"
+    )
+    offset: Optional[int] = Field(default=0, description="Index of the first item")
+
+
+class Recommend(ToolModel):
+    """Recommend tracks similar to seed tracks and artists, or to the user's taste if no seed is given."""
+
+    seed_tracks: Optional[List[str]] = Field(
+        default=None, description="IDs or URIs of tracks to find similar tracks to"
+    )
+    seed_artists: Optional[List[str]] = Field(
+        default=None, description="IDs or URIs of artists to find similar tracks to"
     )
     limit: Optional[int] = Field(
-        default=10, description="Number of items to retrieve (max 50)"
+        default=20, description="Maximum number of tracks to return"
+    )
+    exclude_library: Optional[bool] = Field(
+        default=False, description="Only recommend tracks the user hasn't saved"
     )
 
 
@@ -187,6 +231,11 @@ class PlaylistCreator(ToolModel):
         description="ID de la playlist (requis pour search_and_add)"
     )
     search_query: Optional[str] = Field(description="Recherche de titres à ajouter")
+    search_queries: Optional[List[str]] = Field(
+        default=None,
+        description="Plusieurs recherches à ajouter en une fois (mode groupé) : "
+        "un titre par recherche, doublons et titres déjà présents ignorés",
+    )
     limit: Optional[int] = Field(
         default=10, description="Nombre maximum de résultats de recherche"
     )
@@ -197,27 +246,140 @@ async def handle_list_prompts() -> list[types.Prompt]:
     return []
 
 
+NOW_PLAYING_URI = "spotify://player/now-playing"
+METRICS_URI = "spotify://server/metrics"
+
+# Sessions abonnées à la ressource now-playing, par client (un par utilisateur)
+subscribers: dict = {}
+
+
 @server.list_resources()
 async def handle_list_resources() -> list[types.Resource]:
-    return []
+    return [
+        types.Resource(
+            uri=NOW_PLAYING_URI,
+            name="Now playing",
+            description="Current track, play state, progress, device and context. "
+            "Subscribe to be notified when the track or play state changes.",
+            mimeType="application/json",
+        ),
+        types.Resource(
+            uri=METRICS_URI,
+            name="Server metrics",
+            description="Latency percentiles, errors and upstream requests per tool "
+            "and per Spotify endpoint, cache hit rate and rate-limit waits.",
+            mimeType="application/json",
+        ),
+    ]
 
 
-@server.list_tools()
-async def handle_list_tools() -> list[types.Tool]:
-    """List available tools."""
-    global_logger.info("Listing available tools")
-    global_logger.debug("handle_list_tools called")
-    # await server.request_context.session.send_notification("are you recieving this notification?")
-    tools = [
+@server.read_resource()
+async def handle_read_resource(uri) -> list[ReadResourceContents]:
+    if str(uri) == NOW_PLAYING_URI:
+        client = await get_client()
+        content = output.dumps(await client.get_now_playing())
+    elif str(uri) == METRICS_URI:
+        content = output.dumps(shared_metrics().snapshot(metrics_gauges()))
+    else:
+        raise ValueError(f"Unknown resource: {uri}")
+    return [ReadResourceContents(content=content, mime_type="application/json")]
+
+
+def metrics_gauges() -> dict:
+    # Cache, ordonnanceur et pool sont partagés : n'importe quel client les donne.
+    # Sans client (aucun appel d'outil encore), seules les métriques des outils existent
+    client = clients.recent()
+    gauges = client.metrics_gauges() if client is not None else {}
+    return {**gauges, "tenants": clients.stats()}
+
+
+async def dump_metrics(path: str):
+    """Rewrites the metrics file every SPOTIFY_METRICS_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(METRICS_INTERVAL)
+        try:
+            await asyncio.to_thread(
+                shared_metrics().write_prometheus, path, metrics_gauges()
+            )
+        except OSError as e:
+            global_logger.error("Failed to write metrics to %s: %s", path, e)
+
+
+def now_playing_listener(client):
+    """Playback listener of a client: tells its sessions to read the resource again."""
+
+    async def notify(snapshot: Optional[dict]):
+        sessions = subscribers.get(client, set())
+        for session in list(sessions):
+            try:
+                await session.send_resource_updated(NOW_PLAYING_URI)
+            except Exception as e:
+                # Session fermée : on l'oublie
+                global_logger.info("Dropping now-playing subscriber: %s", e)
+                sessions.discard(session)
+        if not sessions:
+            unsubscribe_now_playing(client)
+
+    return notify
+
+
+# Un écouteur par client, pour pouvoir le désinscrire
+listeners: dict = {}
+
+
+def unsubscribe_now_playing(client):
+    subscribers.pop(client, None)
+    listener = listeners.pop(client, None)
+    if listener is not None:
+        client.playback.unsubscribe(listener)
+
+
+@server.subscribe_resource()
+async def handle_subscribe_resource(uri):
+    if str(uri) != NOW_PLAYING_URI:
+        raise ValueError(f"Unknown resource: {uri}")
+    client = await get_client()
+    subscribers.setdefault(client, set()).add(server.request_context.session)
+    if client not in listeners:
+        listeners[client] = now_playing_listener(client)
+        client.playback.subscribe(listeners[client])
+
+
+@server.unsubscribe_resource()
+async def handle_unsubscribe_resource(uri):
+    if str(uri) != NOW_PLAYING_URI:
+        raise ValueError(f"Unknown resource: {uri}")
+    client = await get_client()
+    sessions = subscribers.get(client, set())
+    sessions.discard(server.request_context.session)
+    if not sessions:
+        unsubscribe_now_playing(client)
+
+
+@functools.cache
+def tool_definitions() -> tuple[types.Tool, ...]:
+    """Tool definitions, built once: generating the JSON schemas is slow."""
+    return (
         Play.as_tool(),
         Search.as_tool(),
         Queue.as_tool(),
         Info.as_tool(),
         TopItems.as_tool(),
+        Library.as_tool(),
+        Recommend.as_tool(),
         PlaylistCreator.as_tool(),
-    ]
-    global_logger.info(f"Available tools: {[tool.name for tool in tools]}")
-    global_logger.debug(f"Returning {len(tools)} tools")
+    )
+
+
+@server.list_tools()
+async def handle_list_tools() -> list[types.Tool]:
+    """List available tools."""
+    global_logger.info("Listing available tools")
+    global_logger.debug("handle_list_tools called")
+    # await server.request_context.session.send_notification("are you recieving this notification?")
+    tools = list(tool_definitions())
+    global_logger.info("Available tools: %s", [tool.name for tool in tools])
+    global_logger.debug("Returning %s tools", len(tools))
     return tools
 
 
@@ -226,8 +388,36 @@ async def handle_call_tool(
     name: str, arguments: dict | None
 ) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
     """Handle tool execution requests."""
-    global_logger.info(f"Tool called: {name} with arguments: {arguments}")
+    # Une lecture répétée pendant l'appel n'est envoyée qu'une fois
+    with call_scope() as scope:
+        started = time.perf_counter()
+        failed = True
+        try:
+            # Le client de l'utilisateur n'est pas fermé pendant l'appel
+            async with clients.lease(current_credentials()):
+                result = await call_tool(name, arguments)
+            failed = scope.errors > 0
+            return result
+        finally:
+            shared_metrics().observe_tool(
+                name, time.perf_counter() - started, failed, scope.upstream
+            )
+            global_logger.debug(
+                "Tool %s: %d upstream requests, %d repeated reads served from memo",
+                name,
+                scope.upstream,
+                scope.memoized,
+            )
+
+
+async def call_tool(
+    name: str, arguments: dict | None
+) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
+    global_logger.info("Tool called: %s with arguments: %s", name, Payload(arguments))
     assert name[:7] == "Spotify", f"Unknown tool: {name}"
+    spotify_client = await get_client()
+    from spotipy import SpotifyException
+
     try:
         match name[7:]:
             case "Play":
@@ -235,14 +425,15 @@ async def handle_call_tool(
                 match action:
                     case "get":
                         global_logger.info("Attempting to get current track")
-                        curr_track = spotify_client.get_current_track()
+                        curr_track = await spotify_client.get_current_track()
                         if curr_track:
                             global_logger.info(
-                                f"Current track retrieved: {curr_track.get('name', 'Unknown')}"
+                                "Current track retrieved: %s",
+                                curr_track.get("name", "Unknown"),
                             )
                             return [
                                 types.TextContent(
-                                    type="text", text=json.dumps(curr_track, indent=2)
+                                    type="text", text=output.dumps(curr_track)
                                 )
                             ]
                         global_logger.info("No track currently playing")
@@ -251,9 +442,9 @@ async def handle_call_tool(
                         ]
                     case "start":
                         global_logger.info(
-                            f"Starting playback with arguments: {arguments}"
+                            "Starting playback with arguments: %s", Payload(arguments)
                         )
-                        spotify_client.start_playback(
+                        await spotify_client.start_playback(
                             spotify_uri=arguments.get("spotify_uri")
                         )
                         global_logger.info("Playback started successfully")
@@ -262,35 +453,42 @@ async def handle_call_tool(
                         ]
                     case "pause":
                         global_logger.info("Attempting to pause playback")
-                        spotify_client.pause_playback()
+                        await spotify_client.pause_playback()
                         global_logger.info("Playback paused successfully")
                         return [types.TextContent(type="text", text="Playback paused.")]
                     case "skip":
                         num_skips = int(arguments.get("num_skips", 1))
-                        global_logger.info(f"Skipping {num_skips} tracks.")
-                        spotify_client.skip_track(n=num_skips)
+                        global_logger.info("Skipping %s tracks.", num_skips)
+                        await spotify_client.skip_track(n=num_skips)
                         return [
                             types.TextContent(
-                                type="text", text="Skipped to next track."
+                                type="text",
+                                text=(
+                                    "Skipped to next track."
+                                    if num_skips == 1
+                                    else f"Skipped {num_skips} tracks."
+                                ),
                             )
                         ]
 
             case "Search":
-                global_logger.info(f"Performing search with arguments: {arguments}")
-                search_results = spotify_client.search(
+                global_logger.info(
+                    "Performing search with arguments: %s", Payload(arguments)
+                )
+                search_results = await spotify_client.search(
                     query=arguments.get("query", ""),
                     qtype=arguments.get("qtype", "track"),
                     limit=arguments.get("limit", 10),
                 )
                 global_logger.info("Search completed successfully.")
                 return [
-                    types.TextContent(
-                        type="text", text=json.dumps(search_results, indent=2)
-                    )
+                    types.TextContent(type="text", text=output.dumps(search_results))
                 ]
 
             case "Queue":
-                global_logger.info(f"Queue operation with arguments: {arguments}")
+                global_logger.info(
+                    "Queue operation with arguments: %s", Payload(arguments)
+                )
                 action = arguments.get("action")
 
                 match action:
@@ -306,7 +504,7 @@ async def handle_call_tool(
                                     text="track_id is required for add action",
                                 )
                             ]
-                        spotify_client.add_to_queue(track_id)
+                        await spotify_client.add_to_queue(track_id)
                         return [
                             types.TextContent(
                                 type="text", text=f"Track added to queue."
@@ -314,11 +512,9 @@ async def handle_call_tool(
                         ]
 
                     case "get":
-                        queue = spotify_client.get_queue()
+                        queue = await spotify_client.get_queue()
                         return [
-                            types.TextContent(
-                                type="text", text=json.dumps(queue, indent=2)
-                            )
+                            types.TextContent(type="text", text=output.dumps(queue))
                         ]
 
                     case _:
@@ -330,29 +526,97 @@ async def handle_call_tool(
                         ]
 
             case "Info":
-                global_logger.info(f"Getting item info with arguments: {arguments}")
-                item_info = spotify_client.get_info(item_uri=arguments.get("item_uri"))
+                global_logger.info(
+                    "Getting item info with arguments: %s", Payload(arguments)
+                )
+                item_uri = arguments.get("item_uris") or arguments.get("item_uri")
+                if not item_uri:
+                    global_logger.error("item_uri or item_uris is required for info.")
+                    return [
+                        types.TextContent(
+                            type="text",
+                            text="item_uri or item_uris is required for info",
+                        )
+                    ]
+                item_info = await spotify_client.get_info(
+                    item_uri=item_uri,
+                    offset=int(arguments.get("offset") or 0),
+                    limit=int(arguments.get("limit") or 0) or None,
+                )
+                paged = None
+                if isinstance(item_uri, str):
+                    paged = INFO_WINDOWS.get(item_uri.split(":")[1])
                 return [
-                    types.TextContent(type="text", text=json.dumps(item_info, indent=2))
+                    types.TextContent(
+                        type="text",
+                        text=output.dumps(
+                            item_info,
+                            offset=arguments.get("offset") or 0,
+                            paged=paged,
+                        ),
+                    )
                 ]
 
             case "TopItems":
-                global_logger.info(f"Getting top items with arguments: {arguments}")
+                global_logger.info(
+                    "Getting top items with arguments: %s", Payload(arguments)
+                )
                 item_type = arguments.get("item_type", "artists")
                 time_range = arguments.get("time_range", "long_term")
                 limit = arguments.get("limit", 10)
 
-                top_items = spotify_client.get_top_items(
+                top_items = await spotify_client.get_top_items(
                     item_type=item_type, time_range=time_range, limit=limit
                 )
 
+                return [types.TextContent(type="text", text=output.dumps(top_items))]
+
+            case "Library":
+                global_logger.info(
+                    "Library operation with arguments: %s", Payload(arguments)
+                )
+                match arguments.get("action", "search"):
+                    case "sync":
+                        result = await spotify_client.sync_library()
+                    case "search":
+                        result = await spotify_client.search_library(
+                            query=arguments.get("query"),
+                            kind=arguments.get("item_type", "tracks"),
+                            artist=arguments.get("artist"),
+                            limit=int(arguments.get("limit") or 20),
+                            offset=int(arguments.get("offset") or 0),
+                        )
+                    case action:
+                        return [
+                            types.TextContent(
+                                type="text",
+                                text=f"Unknown library action: {action}. Supported actions are: search, sync.",
+                            )
+                        ]
                 return [
-                    types.TextContent(type="text", text=json.dumps(top_items, indent=2))
+                    types.TextContent(
+                        type="text",
+                        text=output.dumps(
+                            result, offset=arguments.get("offset") or 0, paged="items"
+                        ),
+                    )
                 ]
 
+            case "Recommend":
+                global_logger.info(
+                    "Getting recommendations with arguments: %s", Payload(arguments)
+                )
+                tracks = await spotify_client.recommendations(
+                    artists=arguments.get("seed_artists"),
+                    tracks=arguments.get("seed_tracks"),
+                    limit=int(arguments.get("limit") or 20),
+                    exclude_library=bool(arguments.get("exclude_library")),
+                )
+                return [types.TextContent(type="text", text=output.dumps(tracks))]
+
             case "PlaylistCreator":
                 global_logger.info(
-                    f"Handling playlist operation with arguments: {arguments}"
+                    "Handling playlist operation with arguments: %s", Payload(arguments)
                 )
                 action = arguments.get("action")
 
@@ -373,12 +637,7 @@ async def handle_call_tool(
                         if "name" not in details:
                             raise ValueError("Le nom de la playlist est requis")
 
-                        # Récupérer l'ID de l'utilisateur courant
-                        user_id = spotify_client.sp.current_user()["id"]
-
-                        # Créer la playlist en utilisant la méthode correcte de spotipy
-                        new_playlist = spotify_client.sp.user_playlist_create(
-                            user=user_id,
+                        new_playlist = await spotify_client.create_playlist(
                             name=details.get("name"),
                             public=details.get("public", True),
                             collaborative=details.get("collaborative", False),
@@ -396,71 +655,71 @@ async def handle_call_tool(
                         global_logger.info("Searching tracks and adding to playlist")
                         playlist_id = arguments.get("playlist_id")
                         search_query = arguments.get("search_query")
+                        search_queries = arguments.get("search_queries")
                         limit = arguments.get("limit", 10)
 
-                        global_logger.info(
-                            f"Arguments reçus: {json.dumps(arguments, indent=2)}"
-                        )
+                        global_logger.debug("Arguments reçus: %s", Payload(arguments))
 
                         # Vérifier si l'ID de playlist est un nom plutôt qu'un ID
                         try:
-                            # Rechercher d'abord la playlist par son nom si ce n'est pas un ID valide
-                            if (
-                                not playlist_id.startswith("spotify:playlist:")
-                                and not len(playlist_id) == 22
-                            ):
-                                playlists = spotify_client.sp.current_user_playlists()
-                                for playlist in playlists["items"]:
-                                    if playlist["name"] == playlist_id:
-                                        playlist_id = playlist["id"]
-                                        global_logger.info(
-                                            f"Playlist trouvée par nom, ID: {playlist_id}"
-                                        )
-                                        break
-                                else:
-                                    raise ValueError(
-                                        f"Playlist non trouvée : {playlist_id}"
+                            # Résoudre le nom de playlist via l'index local
+                            resolved_id = await spotify_client.resolve_playlist(
+                                playlist_id
+                            )
+                            if resolved_id is None:
+                                raise ValueError(
+                                    f"Playlist non trouvée : {playlist_id}"
+                                )
+                            if resolved_id != playlist_id:
+                                global_logger.info(
+                                    "Playlist trouvée par nom, ID: %s", resolved_id
+                                )
+                            playlist_id = resolved_id
+
+                            if search_queries:
+                                report = await spotify_client.search_and_add(
+                                    playlist_id, search_queries, market="FR"
+                                )
+                                return [
+                                    types.TextContent(
+                                        type="text", text=output.dumps(report)
                                     )
+                                ]
 
                             # Recherche du titre
-                            global_logger.info(f"Recherche du titre : {search_query}")
-                            sp_results = spotify_client.sp.search(
-                                q=search_query,
-                                type="track",
-                                limit=1,
+                            global_logger.info("Recherche du titre : %s", search_query)
+                            track = await spotify_client.find_track(
+                                search_query,
                                 market="FR",  # Ajout du marché pour de meilleurs résultats
                             )
 
                             global_logger.info(
-                                f"Résultats de recherche reçus: {bool(sp_results)}"
+                                "Résultats de recherche reçus: %s", bool(track)
                             )
                             global_logger.debug(
-                                f"Résultats détaillés: {json.dumps(sp_results, indent=2)}"
+                                "Résultats détaillés: %s", Payload(track)
                             )
 
-                            if not sp_results or not sp_results.get("tracks", {}).get(
-                                "items"
-                            ):
+                            if not track:
                                 raise ValueError(
                                     f"Aucun titre trouvé pour : {search_query}"
                                 )
 
-                            track = sp_results["tracks"]["items"][0]
                             track_uri = track["uri"]
                             global_logger.info(
-                                f"Titre trouvé : {track['name']} ({track_uri})"
+                                "Titre trouvé : %s (%s)", track["name"], track_uri
                             )
 
                             # Ajouter le titre à la playlist
-                            add_result = spotify_client.sp.playlist_add_items(
-                                playlist_id=playlist_id, items=[track_uri]
+                            add_result = await spotify_client.add_to_playlist(
+                                playlist_id=playlist_id, uris=[track_uri]
                             )
-                            global_logger.info(f"Résultat de l'ajout : {add_result}")
+                            global_logger.info("Résultat de l'ajout : %s", add_result)
 
                             return [
                                 types.TextContent(
                                     type="text",
-                                    text=json.dumps(
+                                    text=output.dumps(
                                         {
                                             "message": "Titre ajouté avec succès !",
                                             "track": {
@@ -468,8 +727,7 @@ async def handle_call_tool(
                                                 "artist": track["artists"][0]["name"],
                                                 "uri": track_uri,
                                             },
-                                        },
-                                        indent=2,
+                                        }
                                     ),
                                 )
                             ]
@@ -511,24 +769,89 @@ async def handle_call_tool(
         raise
 
 
+@functools.cache
+def initialization_options():
+    # Après l'enregistrement des handlers : les capacités en dépendent
+    options = server.create_initialization_options()
+    # mcp 1.3 déclare toujours subscribe=False, alors que les abonnements sont gérés
+    options.capabilities.resources.subscribe = True
+    global_logger.debug(
+        "Server initialized with options: %s", debug_object(options, "options")
+    )
+    return options
+
+
+async def run_session(read_stream, write_stream):
+    try:
+        global_logger.debug("About to call server.run()")
+        await server.run(read_stream, write_stream, initialization_options())
+        global_logger.debug("server.run() completed normally")
+    except Exception as e:
+        global_logger.exception("Error in server.run(): %s", e)
+        raise
+
+
+@contextlib.asynccontextmanager
+async def running(metrics_file: Optional[str]):
+    """Process lifetime: periodic metrics dump, then clients shut down."""
+    dumper = asyncio.create_task(dump_metrics(metrics_file)) if metrics_file else None
+    try:
+        yield
+    finally:
+        if dumper is not None:
+            dumper.cancel()
+            shared_metrics().write_prometheus(metrics_file, metrics_gauges())
+        client = clients.recent()
+        await clients.close()
+        if client is not None:
+            await client.pool.aclose()
+
+
+async def serve_http(worker: int, sockets: list, peers: dict):
+    """Serves MCP over HTTP/SSE in one worker process (see web.serve)."""
+    from spotify_mcp import web
+
+    metrics_file = METRICS_FILE
+    if peers:
+        shared_metrics().labels = (("worker", str(worker)),)
+        if metrics_file:
+            metrics_file = web.metrics_path(metrics_file, worker, len(peers))
+    async with running(metrics_file):
+        global_logger.info(
+            "Worker %d ready in %.0f ms",
+            worker,
+            (time.perf_counter() - STARTED_AT) * 1000,
+        )
+        await web.serve_sessions(global_logger, run_session, worker, sockets, peers)
+
+
 async def main():
     global_logger.debug("====== main() function started ======")
+    initialization_options()
     try:
-        global_logger.debug("Initializing stdio server")
-        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-            global_logger.debug(
-                f"stdio server initialized: read_stream={debug_object(read_stream, 'read_stream')}, write_stream={debug_object(write_stream, 'write_stream')}"
-            )
-            try:
-                global_logger.debug("About to call server.run()")
-                await server.run(read_stream, write_stream, options)
-                global_logger.debug("server.run() completed normally")
-            except Exception as e:
-                global_logger.exception(f"Error in server.run(): {str(e)}")
-                raise
-        global_logger.debug("stdio server context exited")
+        if TRANSPORT == "sse":
+            # Chargé seulement pour ce transport (uvicorn, starlette)
+            from spotify_mcp import web
+
+            await web.serve(global_logger, serve_http)
+            return
+
+        async with running(METRICS_FILE):
+            global_logger.debug("Initializing stdio server")
+            async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+                global_logger.debug(
+                    "stdio server initialized: read_stream=%s, write_stream=%s",
+                    debug_object(read_stream, "read_stream"),
+                    debug_object(write_stream, "write_stream"),
+                )
+                global_logger.info(
+                    "Server ready in %.0f ms",
+                    (time.perf_counter() - STARTED_AT) * 1000,
+                )
+                await run_session(read_stream, write_stream)
+            global_logger.debug("stdio server context exited")
     except Exception as e:
-        global_logger.exception(f"Error in main(): {str(e)}")
+        global_logger.exception("Error in main(): %s", e)
         raise
     finally:
         global_logger.debug("====== main() function exiting ======")
@@ -536,13 +859,11 @@ async def main():
 
 if __name__ == "__main__":
     global_logger.debug("Module executed directly")
-    import asyncio
-
     global_logger.debug("Starting asyncio.run(main())")
     try:
         asyncio.run(main())
         global_logger.debug("asyncio.run(main()) completed successfully")
     except Exception as e:
-        global_logger.exception(f"Uncaught exception in asyncio.run(main()): {str(e)}")
+        global_logger.exception("Uncaught exception in asyncio.run(main()): %s", e)
         sys.exit(1)
     global_logger.debug("Script exiting")
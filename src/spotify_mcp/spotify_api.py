@@ -1,13 +1,30 @@
+import asyncio
 import logging
 import os
-from typing import Optional, Dict, List
+from collections import defaultdict
+from typing import Any, AsyncIterator, Awaitable, Optional, Dict, List
 
-import spotipy
 from dotenv import load_dotenv
-from spotipy.cache_handler import CacheFileHandler
+from spotipy import SpotifyException
+from spotipy.cache_handler import CacheHandler, MemoryCacheHandler
 from spotipy.oauth2 import SpotifyOAuth
 
-from . import utils
+from . import models, utils
+from .auth import TokenManager
+from .cache import shared_cache
+from .devices import DeviceRegistry
+from .library import LibraryIndex, check_kind
+from .logs import Payload
+from .metrics import shared_metrics
+from .pager import fetch_window, paginate
+from .playback import PlaybackState
+from .playlists import PlaylistIndex
+from .pool import shared_pool
+from .recommend import Recommender, TasteData
+from .scheduler import shared_scheduler
+from .store import StoreCacheHandler, shared_store
+from .tenants import tenant_key
+from .transport import API_PREFIX, Transport
 
 load_dotenv()
 
@@ -15,6 +32,49 @@ CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI")
 
+# URL de base de la Web API (un serveur local pour les benchmarks, voir benchmarks/)
+API_URL = os.getenv("SPOTIFY_API_URL", API_PREFIX)
+
+# Appareil cible : nom ou ID, et politique 'active' ou 'preferred' (voir devices.py)
+PREFERRED_DEVICE = os.getenv("SPOTIFY_PREFERRED_DEVICE")
+DEVICE_POLICY = os.getenv("SPOTIFY_DEVICE_POLICY", "active")
+DEVICE_TTL = float(os.getenv("SPOTIFY_DEVICE_TTL", "30"))
+
+# Nombre max d'IDs par appel des endpoints /tracks, /albums et /artists
+BULK_LIMITS = {"track": 50, "album": 20, "artist": 50}
+
+# Index local de la bibliothèque (titres et albums sauvegardés, playlists)
+LIBRARY_DB = os.getenv("SPOTIFY_LIBRARY_DB", ".spotify_library.db")
+LIBRARY_MAX_AGE = float(os.getenv("SPOTIFY_LIBRARY_MAX_AGE", "600"))
+
+# Taille par défaut de la fenêtre de titres/albums renvoyée par get_info
+DEFAULT_WINDOWS = {"playlist": 100, "album": 100, "artist": 20}
+
+# Nombre max de sous-requêtes simultanées pour les appels composites
+FANOUT_LIMIT = int(os.getenv("SPOTIFY_FANOUT_LIMIT", "4"))
+
+# Nombre max d'URIs par appel de POST /playlists/{id}/tracks
+PLAYLIST_ADD_LIMIT = 100
+
+# Recommandations locales (voir recommend.py) : playlists de la bibliothèque
+# lues pour les co-occurrences, et artistes favoris dont les meilleurs titres
+# s'ajoutent aux candidats
+RECOMMEND_PLAYLISTS = 20
+RECOMMEND_DISCOVERY_ARTISTS = 20
+TOP_RANGES = ("short_term", "medium_term", "long_term")
+
+# Instantané des favoris (get_top_items en mode 'all') : pages lues par période
+TOP_PAGE_SIZE = 50
+TOP_ITEMS_MAX = 200
+# Limite des listes renvoyées par l'instantané, pour tenir dans OUTPUT_MAX_CHARS
+TOP_SNAPSHOT_MAX_LIMIT = 25
+
+# État de lecture partagé : âge max servi aux lectures, et intervalles de
+# rafraîchissement en tâche de fond tant qu'un client suit la ressource now-playing
+PLAYBACK_MAX_AGE = float(os.getenv("SPOTIFY_PLAYBACK_MAX_AGE", "5"))
+PLAYBACK_POLL_PLAYING = float(os.getenv("SPOTIFY_PLAYBACK_POLL_PLAYING", "5"))
+PLAYBACK_POLL_IDLE = float(os.getenv("SPOTIFY_PLAYBACK_POLL_IDLE", "30"))
+
 SCOPES = [
     "user-read-currently-playing",
     "user-read-playback-state",
@@ -36,36 +96,137 @@ SCOPES = [
 
 
 class Client:
-    def __init__(self, logger: logging.Logger):
-        """Initialize Spotify client with necessary permissions"""
+    def __init__(
+        self,
+        logger: logging.Logger,
+        refresh_token: Optional[str] = None,
+        library_db: str = LIBRARY_DB,
+    ):
+        """
+        Initialize Spotify client with necessary permissions.
+        - refresh_token: the user's OAuth refresh token, kept in memory (one
+          client per user, see tenants.py). Without it, the token is read from
+          the local OAuth cache file, authenticating interactively if needed.
+        - library_db: path of the user's library index
+        """
         self.logger = logger
         self.logger.info("Initializing Spotify client with logger")
 
         scope = "user-library-read,user-read-playback-state,user-modify-playback-state,user-read-currently-playing,user-top-read,playlist-modify-public,playlist-modify-private"
 
         try:
-            self.sp = spotipy.Spotify(
-                auth_manager=SpotifyOAuth(
-                    scope=scope,
-                    client_id=CLIENT_ID,
-                    client_secret=CLIENT_SECRET,
-                    redirect_uri=REDIRECT_URI,
-                )
+            cache_handler = None
+            if refresh_token is not None:
+                # Jeton expiré : get_access_token le rafraîchit tout de suite
+                initial = {
+                    "access_token": "",
+                    "token_type": "Bearer",
+                    "expires_in": 0,
+                    "expires_at": 0,
+                    "refresh_token": refresh_token,
+                    "scope": scope.replace(",", " "),
+                }
+                # Avec plusieurs processus, le jeton est partagé par le store
+                store = shared_store(self.logger)
+                if store is not None:
+                    cache_handler = StoreCacheHandler(
+                        store, tenant_key(refresh_token), initial
+                    )
+                else:
+                    cache_handler = MemoryCacheHandler(initial)
+            self.auth_manager = SpotifyOAuth(
+                scope=scope,
+                client_id=CLIENT_ID,
+                client_secret=CLIENT_SECRET,
+                redirect_uri=REDIRECT_URI,
+                cache_handler=cache_handler,
+                open_browser=refresh_token is None,
             )
+            self.cache_handler: CacheHandler = self.auth_manager.cache_handler
+            # Authentification interactive au démarrage si aucun token n'est en cache
+            self.auth_manager.get_access_token(as_dict=False)
 
-            self.auth_manager: SpotifyOAuth = self.sp.auth_manager
-            self.cache_handler: CacheFileHandler = self.auth_manager.cache_handler
-            self.username = self.get_username()
+            self.pool = shared_pool(self.logger)
+            self.tokens = TokenManager(self.logger, self.auth_manager, self.pool)
+            self.cache = shared_cache(self.logger)
+            self.scheduler = shared_scheduler(self.logger)
+            self.api = Transport(
+                self.logger,
+                self.tokens.access_token,
+                self.pool,
+                self.cache,
+                self.scheduler,
+                prefix=API_URL,
+                metrics=shared_metrics(),
+                tenant=tenant_key(refresh_token),
+            )
+            self.devices = DeviceRegistry(
+                self.logger,
+                self.get_devices,
+                ttl=DEVICE_TTL,
+                preferred=PREFERRED_DEVICE,
+                policy=DEVICE_POLICY,
+            )
+            self.username: Optional[str] = None
+            self.fanout = asyncio.Semaphore(FANOUT_LIMIT)
+            self.playlists = PlaylistIndex(self.logger, self.iter_user_playlists)
+            self.playback = PlaybackState(
+                self.logger,
+                self._fetch_playback,
+                max_age=PLAYBACK_MAX_AGE,
+                playing_interval=PLAYBACK_POLL_PLAYING,
+                idle_interval=PLAYBACK_POLL_IDLE,
+            )
+            self.library = LibraryIndex(
+                self.logger, library_db, max_age=LIBRARY_MAX_AGE
+            )
+            self.recommender = Recommender(self.logger, self._taste_data)
         except Exception as e:
-            self.logger.error(f"Failed to initialize Spotify client: {str(e)}")
+            self.logger.error("Failed to initialize Spotify client: %s", e)
             raise
 
+    async def close(self):
+        await self.playback.close()
+        await self.tokens.close()
+        self.library.close()
+        self.logger.info("HTTP pool stats: %s", self.pool_stats())
+        self.logger.info("Response cache stats: %s", self.cache_stats())
+        self.logger.info("Scheduler stats: %s", self.scheduler_stats())
+        self.logger.info("Playback state stats: %s", self.playback_stats())
+
+    def pool_stats(self) -> dict:
+        return self.pool.stats()
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats()
+
+    def scheduler_stats(self) -> dict:
+        return {**self.scheduler.stats(), "coalesced": self.api.coalesced}
+
+    def playback_stats(self) -> dict:
+        return self.playback.stats()
+
+    def metrics_gauges(self) -> dict:
+        """Counters of the client's components, for the metrics resource."""
+        return {
+            "cache": self.cache_stats(),
+            "scheduler": self.scheduler_stats(),
+            "pool": self.pool_stats(),
+            "playback": self.playback_stats(),
+            "recommend": self.recommender.stats(),
+        }
+
     @utils.validate
-    def get_username(self, device=None):
-        return self.sp.current_user()["display_name"]
+    async def get_username(self, device=None):
+        return await self._fetch_username()
+
+    async def _fetch_username(self) -> str:
+        if self.username is None:
+            self.username = (await self.api.get("me"))["display_name"]
+        return self.username
 
     @utils.validate
-    def search(self, query: str, qtype: str = "track", limit=10, device=None):
+    async def search(self, query: str, qtype: str = "track", limit=10, device=None):
         """
         Searches based of query term.
         - query: query term
@@ -73,19 +234,160 @@ class Client:
                  If multiple types are desired, pass in a comma separated string; e.g. 'track,album'
         - limit: max # items to return
         """
-        results = self.sp.search(q=query, limit=limit, type=qtype)
-        return utils.parse_search_results(results, qtype, self.username)
+        results = await self.api.get("search", q=query, limit=limit, type=qtype)
+        return utils.parse_search_results(results, qtype, await self._fetch_username())
 
-    def recommendations(
-        self, artists: Optional[List] = None, tracks: Optional[List] = None, limit=20
-    ):
-        # doesnt work
-        recs = self.sp.recommendations(
-            seed_artists=artists, seed_tracks=tracks, limit=limit
+    async def recommendations(
+        self,
+        artists: Optional[List] = None,
+        tracks: Optional[List] = None,
+        limit=20,
+        exclude_library=False,
+    ) -> List[dict]:
+        """
+        Recommends tracks similar to the seeds, computed locally: Spotify no
+        longer serves /recommendations to new apps. Candidates are the saved
+        tracks, the tracks of the user's playlists and top items, and the top
+        tracks of their favourite artists (see recommend.py).
+        - artists, tracks: seed IDs or URIs. Without seeds, the user's top
+          tracks and artists are used.
+        - exclude_library: only recommend tracks that aren't saved yet
+        """
+        track_ids = [utils.get_id("track", t) for t in tracks or []]
+        artist_ids = [utils.get_id("artist", a) for a in artists or []]
+        seed_tracks = await self._bulk_items("track", track_ids)
+        # Avec les artistes des titres graines, pour leurs genres
+        artists = await self._bulk_items(
+            "artist",
+            [
+                *artist_ids,
+                *(a["id"] for t in seed_tracks.values() for a in t["artists"]),
+            ],
         )
-        return recs
+        seed_artists = {i: artists[i] for i in artist_ids if i in artists}
+        recommended = await self.recommender.recommend(
+            seed_tracks,
+            seed_artists,
+            limit=limit,
+            exclude_library=exclude_library,
+            artists=artists,
+        )
+        return [
+            {**utils.parse_track(track), "score": round(score, 3)}
+            for track, score in recommended
+        ]
 
-    def get_top_items(self, item_type="artists", time_range="long_term", limit=10):
+    async def _taste_data(self) -> TasteData:
+        """Gathers what the recommender learns from, mostly from the caches."""
+        await self.library.sync_if_stale(self.api)
+        saved = await self.library.saved_tracks()
+        playlists = await self.library.query("playlists", limit=RECOMMEND_PLAYLISTS)
+        responses = await utils.gather_limited(
+            self.fanout,
+            *(self._top_page("tracks", time_range) for time_range in TOP_RANGES),
+            self._top_page("artists", "medium_term"),
+            *(
+                self._or_error(
+                    self.api.cached_get(f"playlists/{playlist['id']}", "playlist")
+                )
+                for playlist in playlists["items"]
+            ),
+        )
+        top_tracks = responses[: len(TOP_RANGES)]
+        top_artists = responses[len(TOP_RANGES)]
+        pages = responses[len(TOP_RANGES) + 1 :]
+        discovery = await utils.gather_limited(
+            self.fanout,
+            *(
+                self._or_error(
+                    self.api.cached_get(
+                        f"artists/{artist['id']}/top-tracks",
+                        "artist_top_tracks",
+                        country="US",
+                    )
+                )
+                for artist in top_artists["items"][:RECOMMEND_DISCOVERY_ARTISTS]
+            ),
+        )
+
+        data = TasteData(
+            tracks={track["id"]: track for track in saved},
+            library={track["id"] for track in saved},
+            top_artists=[artist["id"] for artist in top_artists["items"]],
+        )
+        for time_range, page in zip(TOP_RANGES, top_tracks):
+            data.top_tracks[time_range] = [track["id"] for track in page["items"]]
+            data.tracks.update((track["id"], track) for track in page["items"])
+        for playlist in pages:
+            if isinstance(playlist, Exception):
+                self.logger.error(
+                    "Failed to read playlist for recommendations: %s", playlist
+                )
+                continue
+            tracks = [
+                item["track"]
+                for item in playlist["tracks"]["items"]
+                if item.get("track") and item["track"].get("id")
+            ]
+            data.playlists[playlist["id"]] = [track["id"] for track in tracks]
+            for track in tracks:
+                data.tracks.setdefault(track["id"], track)
+        for page in discovery:
+            if not isinstance(page, Exception):
+                for track in page["tracks"]:
+                    data.tracks.setdefault(track["id"], track)
+
+        data.artists = {artist["id"]: artist for artist in top_artists["items"]}
+        data.artists.update(
+            await self._bulk_items(
+                "artist",
+                [
+                    artist["id"]
+                    for track in data.tracks.values()
+                    for artist in track["artists"]
+                    if artist.get("id") and artist["id"] not in data.artists
+                ],
+            )
+        )
+        return data
+
+    async def _bulk_items(self, qtype: str, ids: List[str]) -> dict:
+        """
+        Full objects of tracks, albums or artists: id -> object, from the cache
+        or the bulk endpoint. Items that can't be fetched are left out.
+        """
+        found, missing = {}, []
+        for item_id in dict.fromkeys(ids):
+            cached = self.api.peek(f"{qtype}s/{item_id}")
+            if cached is not None:
+                found[item_id] = cached
+            else:
+                missing.append(item_id)
+
+        chunks = [
+            missing[i : i + BULK_LIMITS[qtype]]
+            for i in range(0, len(missing), BULK_LIMITS[qtype])
+        ]
+        pages = await utils.gather_limited(
+            self.fanout,
+            *(
+                self._or_error(self.api.get(f"{qtype}s", ids=",".join(c)))
+                for c in chunks
+            ),
+        )
+        for page in pages:
+            if isinstance(page, Exception):
+                self.logger.error("Bulk %s lookup failed: %s", qtype, page)
+                continue
+            for item in page[f"{qtype}s"]:
+                if item:
+                    found[item["id"]] = item
+                    self.api.store(f"{qtype}s/{item['id']}", qtype, item)
+        return found
+
+    async def get_top_items(
+        self, item_type="artists", time_range="long_term", limit=10
+    ):
         """
         Get the current user's top artists or tracks.
 
@@ -93,8 +395,11 @@ class Client:
             item_type: Type of items to retrieve ('artists' or 'tracks')
             time_range: Time period over which to retrieve top items:
                     'long_term' (~ 1 year), 'medium_term' (~ 6 months),
-                    or 'short_term' (~ 4 weeks)
-            limit: Number of items to retrieve (max 50)
+                    or 'short_term' (~ 4 weeks); 'all' for a snapshot of the
+                    three (see `get_top_snapshot`)
+            limit: Number of items to retrieve (max 50); with 'all', the
+                    length of each ranking and list of rank changes (max
+                    TOP_SNAPSHOT_MAX_LIMIT)
 
         Returns:
             JSON response from the Spotify API containing the top items
@@ -102,9 +407,9 @@ class Client:
         if item_type not in ["artists", "tracks"]:
             raise ValueError("item_type must be 'artists' or 'tracks'")
 
-        if time_range not in ["long_term", "medium_term", "short_term"]:
+        if time_range not in ["long_term", "medium_term", "short_term", "all"]:
             raise ValueError(
-                "time_range must be 'long_term', 'medium_term', or 'short_term'"
+                "time_range must be 'long_term', 'medium_term', 'short_term' or 'all'"
             )
 
         # Convert limit to int if it's a string
@@ -116,68 +421,265 @@ class Client:
         if not 1 <= limit <= 50:
             raise ValueError("limit must be between 1 and 50")
 
+        if time_range == "all":
+            if limit > TOP_SNAPSHOT_MAX_LIMIT:
+                raise ValueError(
+                    f"limit must be between 1 and {TOP_SNAPSHOT_MAX_LIMIT} with 'all'"
+                )
+            return await self.get_top_snapshot(item_type, limit)
+
         try:
             self.logger.info(
-                f"Getting user's top {item_type} for {time_range} with limit {limit}"
+                "Getting user's top %s for %s with limit %s",
+                item_type,
+                time_range,
+                limit,
             )
-            results = (
-                self.sp.current_user_top_artists(
-                    limit=limit, offset=0, time_range=time_range
-                )
-                if item_type == "artists"
-                else self.sp.current_user_top_tracks(
-                    limit=limit, offset=0, time_range=time_range
-                )
+            results = await self.api.get(
+                f"me/top/{item_type}", limit=limit, offset=0, time_range=time_range
             )
             self.logger.info(
-                f"Retrieved {len(results.get('items', []))} top {item_type}"
+                "Retrieved %s top %s", len(results.get("items", [])), item_type
             )
             return results
         except Exception as e:
-            self.logger.error(f"Error getting top {item_type}: {str(e)}")
+            self.logger.error("Error getting top %s: %s", item_type, e)
             raise
 
-    def get_info(self, item_uri: str) -> dict:
+    async def get_top_snapshot(self, item_type="artists", limit=10) -> dict:
+        """
+        Returns the user's top artists or tracks of the three time ranges,
+        parsed, and how their ranks changed.
+        - ranges: time range -> its first `limit` items, with their 'rank'
+          (1 = top)
+        - ranked: time range -> number of items ranked, at most TOP_ITEMS_MAX
+        - rising, falling, new, gone: rank changes from the last year
+          ('long_term') to the last 4 weeks ('short_term') over the whole
+          rankings, `limit` items each, see `utils.rank_changes`
+        Every page of the three ranges is fetched concurrently and cached for
+        12 hours, Spotify recomputes them once a day.
+        """
+        first_pages = await utils.gather_limited(
+            self.fanout,
+            *(self._top_page(item_type, time_range) for time_range in TOP_RANGES),
+        )
+        following = [
+            (time_range, offset)
+            for time_range, page in zip(TOP_RANGES, first_pages)
+            for offset in range(
+                TOP_PAGE_SIZE, min(page["total"], TOP_ITEMS_MAX), TOP_PAGE_SIZE
+            )
+        ]
+        pages = await utils.gather_limited(
+            self.fanout,
+            *(self._top_page(item_type, r, offset) for r, offset in following),
+        )
+
+        items = {r: list(page["items"]) for r, page in zip(TOP_RANGES, first_pages)}
+        for (time_range, _), page in zip(following, pages):
+            items[time_range].extend(page["items"])
+        parse = utils.parse_artist if item_type == "artists" else utils.parse_track
+        ranges = {
+            time_range: [
+                {**parse(item), "rank": rank}
+                for rank, item in enumerate(items[time_range][:TOP_ITEMS_MAX], 1)
+            ]
+            for time_range in TOP_RANGES
+        }
+        return {
+            "item_type": item_type,
+            "ranges": {r: ranking[:limit] for r, ranking in ranges.items()},
+            "ranked": {r: len(ranking) for r, ranking in ranges.items()},
+            "compared": ["long_term", "short_term"],
+            **utils.rank_changes(ranges["long_term"], ranges["short_term"], limit),
+        }
+
+    async def _top_page(self, item_type: str, time_range: str, offset=0) -> dict:
+        return await self.api.cached_get(
+            f"me/top/{item_type}",
+            "top_items",
+            limit=TOP_PAGE_SIZE,
+            offset=offset,
+            time_range=time_range,
+        )
+
+    async def get_info(
+        self, item_uri: str | List[str], offset: int = 0, limit: Optional[int] = None
+    ) -> dict | List[dict]:
         """
         Returns more info about item.
         - item_uri: uri. Looks like 'spotify:track:xxxxxx', 'spotify:album:xxxxxx', etc.
+                    A list of uris is resolved in bulk, see `get_infos`.
+        - offset, limit: window of the tracks (playlist, album) or albums (artist)
+                    to return. 'next_offset' is set when more items remain.
         """
+        if isinstance(item_uri, list):
+            return await self.get_infos(item_uri)
+
         _, qtype, item_id = item_uri.split(":")
+        limit = limit or DEFAULT_WINDOWS.get(qtype)
         match qtype:
             case "track":
-                return utils.parse_track(self.sp.track(item_id), detailed=True)
+                return utils.parse_track(
+                    await self.api.cached_get(f"tracks/{item_id}", "track"),
+                    detailed=True,
+                )
             case "album":
-                album_info = utils.parse_album(self.sp.album(item_id), detailed=True)
+                album = await self.api.cached_get(f"albums/{item_id}", "album")
+                album_info = utils.parse_album(album, detailed=True)
+                window = await fetch_window(
+                    self.api,
+                    f"albums/{item_id}/tracks",
+                    offset,
+                    limit,
+                    utils.parse_track,
+                    first_page=album["tracks"],
+                    item_type=models.Track,
+                )
+                album_info["tracks"] = window["items"]
+                if window["next_offset"] is not None:
+                    album_info["next_offset"] = window["next_offset"]
                 return album_info
             case "artist":
-                artist_info = utils.parse_artist(self.sp.artist(item_id), detailed=True)
-                albums = self.sp.artist_albums(item_id)
-                top_tracks = self.sp.artist_top_tracks(item_id)["tracks"]
-                albums_and_tracks = {"albums": albums, "tracks": {"items": top_tracks}}
-                parsed_info = utils.parse_search_results(
-                    albums_and_tracks, qtype="album,track"
+                artist, albums, top_tracks = await utils.gather_limited(
+                    self.fanout,
+                    self.api.cached_get(f"artists/{item_id}", "artist"),
+                    self.api.cached_get(
+                        f"artists/{item_id}/albums",
+                        "artist_albums",
+                        offset=offset,
+                        limit=min(limit, 50),
+                    ),
+                    self.api.cached_get(
+                        f"artists/{item_id}/top-tracks",
+                        "artist_top_tracks",
+                        country="US",
+                    ),
+                )
+                artist_info = utils.parse_artist(artist, detailed=True)
+                artist_info["top_tracks"] = [
+                    utils.parse_track(track) for track in top_tracks["tracks"]
+                ]
+                window = await fetch_window(
+                    self.api,
+                    f"artists/{item_id}/albums",
+                    offset,
+                    limit,
+                    utils.parse_album,
+                    first_page=albums,
                 )
-                artist_info["top_tracks"] = parsed_info["tracks"]
-                artist_info["albums"] = parsed_info["albums"]
+                artist_info["albums"] = window["items"]
+                artist_info["total_albums"] = window["total"]
+                if window["next_offset"] is not None:
+                    artist_info["next_offset"] = window["next_offset"]
 
                 return artist_info
             case "playlist":
-                playlist = self.sp.playlist(item_id)
-                self.logger.info(f"playlist info is {playlist}")
+                playlist = await self.api.cached_get(f"playlists/{item_id}", "playlist")
+                self.logger.debug("Playlist info: %s", Payload(playlist))
                 playlist_info = utils.parse_playlist(
-                    playlist, self.username, detailed=True
+                    playlist, await self._fetch_username()
+                )
+                playlist_info["description"] = playlist.get("description")
+                window = await fetch_window(
+                    self.api,
+                    f"playlists/{item_id}/tracks",
+                    offset,
+                    limit,
+                    utils.parse_playlist_track,
+                    first_page=playlist["tracks"],
+                    page_size=100,
+                    item_type=models.PlaylistTrack,
                 )
+                playlist_info["tracks"] = window["items"]
+                playlist_info["total_tracks"] = window["total"]
+                if window["next_offset"] is not None:
+                    playlist_info["next_offset"] = window["next_offset"]
 
                 return playlist_info
 
         raise ValueError(f"Unknown qtype {qtype}")
 
-    def get_current_track(self) -> Optional[Dict]:
+    async def get_infos(self, item_uris: List[str]) -> List[dict]:
+        """
+        Returns info about several items, in the order of `item_uris`.
+        Tracks, albums and artists are fetched through the bulk endpoints
+        (artists without their albums and top tracks), playlists one by one.
+        An item that can't be resolved is returned as {"uri": ..., "error": ...}.
+        """
+        found = {qtype: {} for qtype in [*BULK_LIMITS, "playlist"]}
+        missing = defaultdict(list)
+        for uri in dict.fromkeys(item_uris):
+            parts = uri.split(":")
+            if len(parts) != 3 or parts[1] not in BULK_LIMITS:
+                continue
+            qtype, item_id = parts[1], parts[2]
+            cached = self.api.peek(f"{qtype}s/{item_id}")
+            if cached is not None:
+                found[qtype][item_id] = cached
+            else:
+                missing[qtype].append(item_id)
+
+        chunks = [
+            (qtype, ids[i : i + BULK_LIMITS[qtype]])
+            for qtype, ids in missing.items()
+            for i in range(0, len(ids), BULK_LIMITS[qtype])
+        ]
+        playlists = [uri for uri in dict.fromkeys(item_uris) if ":playlist:" in uri]
+        responses = await utils.gather_limited(
+            self.fanout,
+            *(
+                self._or_error(self.api.get(f"{q}s", ids=",".join(c)))
+                for q, c in chunks
+            ),
+            *(self._or_error(self.get_info(uri)) for uri in playlists),
+        )
+
+        for (qtype, chunk), page in zip(chunks, responses):
+            if isinstance(page, Exception):
+                self.logger.error("Bulk %s lookup failed: %s", qtype, page)
+                found[qtype].update(dict.fromkeys(chunk, page))
+                continue
+            for item in page[f"{qtype}s"]:
+                if item:
+                    found[qtype][item["id"]] = item
+                    self.api.store(f"{qtype}s/{item['id']}", qtype, item)
+        found["playlist"] = dict(zip(playlists, responses[len(chunks) :]))
+
+        results = []
+        for uri in item_uris:
+            parts = uri.split(":")
+            if len(parts) != 3 or parts[1] not in found:
+                results.append({"uri": uri, "error": "Unsupported uri"})
+                continue
+            _, qtype, item_id = parts
+            item = found[qtype].get(uri if qtype == "playlist" else item_id)
+            if item is None:
+                item = {"uri": uri, "error": "Not found"}
+            elif isinstance(item, Exception):
+                item = {"uri": uri, "error": str(item)}
+            elif qtype == "track":
+                item = utils.parse_track(item, detailed=True)
+            elif qtype == "album":
+                item = utils.parse_album(item, detailed=True)
+            elif qtype == "artist":
+                item = utils.parse_artist(item, detailed=True)
+            results.append(item)
+        return results
+
+    @staticmethod
+    async def _or_error(aw: Awaitable) -> Any:
+        """Awaits `aw`, returning the exception instead of raising it."""
+        try:
+            return await aw
+        except Exception as e:
+            return e
+
+    async def get_current_track(self) -> Optional[Dict]:
         """Get information about the currently playing track"""
         try:
-            # current_playback vs current_user_playing_track?
-            current = self.sp.current_user_playing_track()
-            if not current:
+            current = await self.playback.snapshot()
+            if not current or not current.get("item"):
                 self.logger.info("No playback session found")
                 return None
             if current.get("currently_playing_type") != "track":
@@ -189,33 +691,75 @@ class Client:
                 track_info["is_playing"] = current["is_playing"]
 
             self.logger.info(
-                f"Current track: {track_info.get('name', 'Unknown')} by {track_info.get('artist', 'Unknown')}"
+                "Current track: %s by %s",
+                track_info.get("name", "Unknown"),
+                track_info.get("artist", "Unknown"),
             )
             return track_info
         except Exception as e:
             self.logger.error("Error getting current track info")
             raise
 
+    async def _fetch_playback(self) -> Optional[dict]:
+        # 204 (aucune session de lecture) : None
+        return await self.api.get("me/player")
+
+    async def get_now_playing(self) -> dict:
+        """
+        Returns what is playing now, from the shared playback snapshot: track,
+        play state, device, context and a progress extrapolated from the
+        snapshot's age (so it stays accurate between two refreshes).
+        """
+        current = await self.playback.snapshot()
+        if not current:
+            return {"is_playing": False, "track": None}
+        item = current.get("item")
+        progress_ms = current.get("progress_ms")
+        age = self.playback.age()
+        if progress_ms is not None and current.get("is_playing") and age:
+            progress_ms += int(age * 1000)
+            if item and item.get("duration_ms"):
+                progress_ms = min(progress_ms, item["duration_ms"])
+        device = current.get("device") or {}
+        context = current.get("context") or {}
+        return {
+            "is_playing": bool(current.get("is_playing")),
+            "track": (
+                utils.parse_track(item)
+                if item and current.get("currently_playing_type") == "track"
+                else None
+            ),
+            "progress_ms": progress_ms,
+            "device": device.get("name"),
+            "context": context.get("uri"),
+        }
+
     @utils.validate
-    def start_playback(self, spotify_uri=None, device=None):
+    async def start_playback(self, spotify_uri=None, device=None):
         """
         Starts spotify playback of uri. If spotify_uri is omitted, resumes current playback.
         - spotify_uri: ID of resource to play, or None. Typically looks like 'spotify:track:xxxxxx' or 'spotify:album:xxxxxx'.
         """
         try:
             self.logger.info(
-                f"Starting playback for spotify_uri: {spotify_uri} on {device}"
+                "Starting playback for spotify_uri: %s on %s", spotify_uri, device
             )
             if not spotify_uri:
-                if self.is_track_playing():
+                # État relu : la lecture a pu changer depuis un autre appareil
+                current = await self.playback.snapshot(max_age=0)
+                if (
+                    not current
+                    or not current.get("item")
+                    or current.get("currently_playing_type") != "track"
+                ):
+                    raise ValueError(
+                        "No track_id provided and no current playback to resume."
+                    )
+                if current.get("is_playing"):
                     self.logger.info(
                         "No track_id provided and playback already active."
                     )
                     return
-                if not self.get_current_track():
-                    raise ValueError(
-                        "No track_id provided and no current playback to resume."
-                    )
 
             if spotify_uri is not None:
                 if spotify_uri.startswith("spotify:track:"):
@@ -231,41 +775,63 @@ class Client:
             device_id = device.get("id") if device else None
 
             self.logger.info(
-                f"Starting playback of on {device}: context_uri={context_uri}, uris={uris}"
+                "Starting playback of on %s: context_uri=%s, uris=%s",
+                device,
+                context_uri,
+                uris,
             )
-            result = self.sp.start_playback(
-                uris=uris, context_uri=context_uri, device_id=device_id
+            payload = {}
+            if context_uri is not None:
+                payload["context_uri"] = context_uri
+            if uris is not None:
+                payload["uris"] = uris
+            result = await self.api.put(
+                "me/player/play", payload=payload, device_id=device_id
             )
-            self.logger.info(f"Playback result: {result}")
+            self.playback.invalidate()
+            self.logger.info("Playback result: %s", result)
             return result
         except Exception as e:
-            self.logger.error(f"Error starting playback: {str(e)}")
+            self.logger.error("Error starting playback: %s", e)
             raise
 
     @utils.validate
-    def pause_playback(self, device=None):
+    async def pause_playback(self, device=None):
         """Pauses playback."""
-        playback = self.sp.current_playback()
+        playback = await self.playback.snapshot(max_age=0)
         if playback and playback.get("is_playing"):
-            self.sp.pause_playback(device.get("id") if device else None)
+            await self.api.put(
+                "me/player/pause", device_id=device.get("id") if device else None
+            )
+            self.playback.invalidate()
 
     @utils.validate
-    def add_to_queue(self, track_id: str, device=None):
+    async def add_to_queue(self, track_id: str, device=None):
         """
         Adds track to queue.
         - track_id: ID of track to play.
         """
-        self.sp.add_to_queue(track_id, device.get("id") if device else None)
+        await self.api.post(
+            "me/player/queue",
+            uri=utils.get_uri("track", track_id),
+            device_id=device.get("id") if device else None,
+        )
+        self.playback.invalidate()
 
     @utils.validate
-    def get_queue(self, device=None):
+    async def get_queue(self, device=None):
         """Returns the current queue of tracks."""
-        queue_info = self.sp.queue()
-        self.logger.info(
-            f"currently playing keys {queue_info['currently_playing'].keys()}"
-        )
-
-        queue_info["currently_playing"] = self.get_current_track()
+        queue_info = await self.api.get("me/player/queue")
+        # La file contient déjà le titre en cours ; l'état de lecture vient de
+        # l'instantané partagé s'il est frais, sans nouvelle requête
+        current = queue_info.get("currently_playing")
+        current_track = None
+        if current and current.get("type", "track") == "track":
+            current_track = utils.parse_track(current)
+            playback = self.playback.peek()
+            if playback and (playback.get("item") or {}).get("id") == current.get("id"):
+                current_track["is_playing"] = playback.get("is_playing")
+        queue_info["currently_playing"] = current_track
 
         queue_info["queue"] = [
             utils.parse_track(track) for track in queue_info.pop("queue")
@@ -273,70 +839,138 @@ class Client:
 
         return queue_info
 
-    def get_liked_songs(self):
-        # todo
-        results = self.sp.current_user_saved_tracks()
-        for idx, item in enumerate(results["items"]):
-            track = item["track"]
-            print(idx, track["artists"][0]["name"], " – ", track["name"])
+    async def get_liked_songs(self, limit=50, offset=0) -> dict:
+        """Returns the user's saved tracks, newest first, from the local index."""
+        return await self.search_library(kind="tracks", limit=limit, offset=offset)
+
+    async def sync_library(self, full=False) -> dict:
+        """Updates the local library index. Returns the number of new items per kind."""
+        return await self.library.sync(self.api, full=full)
+
+    async def search_library(
+        self, query=None, kind="tracks", artist=None, limit=20, offset=0
+    ) -> dict:
+        """
+        Searches the user's library in the local index, syncing it first if it
+        is older than SPOTIFY_LIBRARY_MAX_AGE seconds.
+        - query: words to look for in names, artists and album names
+        - kind: 'tracks', 'albums' or 'playlists'
+        - artist: only items by this artist
+        """
+        # Avant la synchronisation, qui peut relire toute la bibliothèque
+        check_kind(kind)
+        await self.library.sync_if_stale(self.api)
+        return await self.library.query(kind, query, artist, limit, offset)
 
-    def is_track_playing(self) -> bool:
+    async def is_track_playing(self) -> bool:
         """Returns if a track is actively playing."""
-        curr_track = self.get_current_track()
+        curr_track = await self.get_current_track()
         if not curr_track:
             return False
         if curr_track.get("is_playing"):
             return True
         return False
 
-    def get_devices(self) -> dict:
-        return self.sp.devices()["devices"]
+    async def get_devices(self) -> dict:
+        return (await self.api.get("me/player/devices"))["devices"]
 
-    def is_active_device(self):
-        return any([device.get("is_active") for device in self.get_devices()])
+    async def is_active_device(self):
+        return await self.devices.is_active_device()
 
-    def _get_candidate_device(self):
-        devices = self.get_devices()
-        for device in devices:
-            if device.get("is_active"):
-                return device
-        self.logger.info(f"No active device, assigning {devices[0]['name']}.")
-        return devices[0]
+    async def _get_candidate_device(self, refresh=False):
+        return await self.devices.target(refresh=refresh)
 
-    def auth_ok(self) -> bool:
-        try:
-            token = self.cache_handler.get_cached_token()
-            if token is None:
-                self.logger.info("Auth check result: no token exists")
-                return False
+    async def auth_ok(self) -> bool:
+        is_valid = self.tokens.is_valid()
+        if not is_valid:
+            self.logger.info("Auth check result: expired or missing token")
+        return is_valid
 
-            is_expired = self.auth_manager.is_token_expired(token)
-            self.logger.info(
-                f"Auth check result: {'valid' if not is_expired else 'expired'}"
-            )
-            return not is_expired  # Return True if token is NOT expired
-        except Exception as e:
-            self.logger.error(f"Error checking auth status: {str(e)}")
-            return False  # Return False on error rather than raising
+    async def auth_refresh(self):
+        await self.tokens.refresh()
 
-    def auth_refresh(self):
-        self.auth_manager.validate_token(self.cache_handler.get_cached_token())
+    async def skip_track(self, n=1):
+        """
+        Skips `n` tracks. Several skips take a single request when possible:
+        the current album or playlist is restarted at the n-th track of the
+        queue. Otherwise the tracks are skipped one by one.
+        """
+        try:
+            if n > 1 and await self._jump_in_context(n):
+                return
+            for _ in range(n):
+                await self.api.post("me/player/next")
+        finally:
+            self.playback.invalidate()
 
-    def skip_track(self, n=1):
-        # todo: Better error handling
-        for _ in range(n):
-            self.sp.next_track()
+    async def _jump_in_context(self, n: int) -> bool:
+        """
+        Starts the playing context at the n-th upcoming track of the queue.
+        Returns False, without changing the playback, if that is not possible:
+        no album/playlist context, queue shorter than `n`, (album) queued
+        tracks from elsewhere before the target, or the target track also
+        playing or queued before it: the offset by URI starts at its first
+        occurrence in the context.
+        Limitations: tracks added with 'add to queue' stay queued (a
+        playlist's queue can't tell them apart), and a target that also
+        appears before the current track, which the queue doesn't show, is
+        started there, earlier in the playlist.
+        """
+        # État frais : la file l'est, le contexte et l'appareil doivent l'être aussi
+        playback, queue = await utils.gather_limited(
+            self.fanout,
+            self.playback.snapshot(max_age=0),
+            self.api.get("me/player/queue"),
+        )
+        context_uri = ((playback or {}).get("context") or {}).get("uri") or ""
+        parts = context_uri.split(":")
+        kind = parts[1] if len(parts) == 3 else None
+        upcoming = (queue or {}).get("queue") or []
+        if kind not in ("album", "playlist") or len(upcoming) < n:
+            return False
+        skipped = upcoming[:n]
+        if any(track.get("type") != "track" for track in skipped):
+            return False
+        if kind == "album" and any(
+            (track.get("album") or {}).get("uri") != context_uri for track in skipped
+        ):
+            return False
 
-    def previous_track(self):
-        self.sp.previous_track()
+        target = skipped[-1]
+        current = ((playback or {}).get("item") or {}).get("uri")
+        if target["uri"] in {current, *(track["uri"] for track in skipped[:-1])}:
+            return False
+        try:
+            await self.api.put(
+                "me/player/play",
+                payload={
+                    "context_uri": context_uri,
+                    "offset": {"uri": target["uri"]},
+                    "position_ms": 0,
+                },
+                device_id=(playback.get("device") or {}).get("id"),
+            )
+        except SpotifyException as e:
+            self.logger.info("Skip by offset failed, skipping one by one: %s", e)
+            return False
+        self.logger.info(
+            "Skipped %d tracks to %s in %s", n, target.get("name"), context_uri
+        )
+        return True
 
-    def seek_to_position(self, position_ms):
-        self.sp.seek_track(position_ms=position_ms)
+    async def previous_track(self):
+        await self.api.post("me/player/previous")
+        self.playback.invalidate()
 
-    def set_volume(self, volume_percent):
-        self.sp.volume(volume_percent)
+    async def seek_to_position(self, position_ms):
+        await self.api.put("me/player/seek", position_ms=position_ms)
+        self.playback.invalidate()
 
-    def get_track_uri_from_title(self, track_title, limit=1):
+    async def set_volume(self, volume_percent):
+        await self.api.put("me/player/volume", volume_percent=volume_percent)
+        self.playback.invalidate()
+
+    async def get_track_uri_from_title(self, track_title, limit=1):
         """
         Recherche une chanson par son titre et retourne son URI Spotify
 
@@ -348,10 +982,149 @@ class Client:
             - URI de la chanson ou None si rien n'est trouvé
         """
         try:
-            results = self.sp.search(q=track_title, type="track", limit=limit)
+            results = await self.api.get(
+                "search", q=track_title, type="track", limit=limit
+            )
             if results["tracks"]["items"]:
                 return results["tracks"]["items"][0]["uri"]
             return None
         except Exception as e:
-            self.logger.error(f"Erreur lors de la recherche du titre: {str(e)}")
+            self.logger.error("Erreur lors de la recherche du titre: %s", e)
             return None
+
+    async def find_track(
+        self, query: str, market: Optional[str] = None
+    ) -> Optional[Dict]:
+        """
+        Recherche le meilleur titre correspondant à la requête.
+
+        Returns:
+            - l'objet track brut de l'API, ou None si rien n'est trouvé
+        """
+        results = await self.api.get(
+            "search", q=query, type="track", limit=1, market=market
+        )
+        if not results or not results.get("tracks", {}).get("items"):
+            return None
+        return results["tracks"]["items"][0]
+
+    async def get_user_playlists(self, limit=50, offset=0) -> dict:
+        """Returns a page of the current user's playlists."""
+        return await self.api.get("me/playlists", limit=limit, offset=offset)
+
+    async def iter_user_playlists(self) -> AsyncIterator[dict]:
+        """Yields all the current user's playlists, page after page."""
+        async for playlist in paginate(self.api, await self.get_user_playlists()):
+            yield playlist
+
+    async def create_playlist(
+        self, name: str, public=True, collaborative=False, description=""
+    ) -> dict:
+        """Creates a playlist owned by the current user."""
+        user_id = (await self.api.get("me"))["id"]
+        playlist = await self.api.post(
+            f"users/{user_id}/playlists",
+            payload={
+                "name": name,
+                "public": public,
+                "collaborative": collaborative,
+                "description": description,
+            },
+        )
+        self.playlists.add(playlist)
+        return playlist
+
+    async def resolve_playlist(self, playlist: str) -> Optional[str]:
+        """
+        Returns the ID of a playlist given as ID, URI or name of one of the
+        user's playlists (case and accents ignored), or None if not found.
+        """
+        if playlist.startswith("spotify:playlist:"):
+            return utils.get_id("playlist", playlist)
+        if len(playlist) == 22 and playlist.isalnum():
+            return playlist
+        return await self.playlists.resolve(playlist)
+
+    async def add_to_playlist(self, playlist_id: str, uris: List[str]) -> dict:
+        """Adds track uris to a playlist."""
+        return await self.api.post(
+            f"playlists/{utils.get_id('playlist', playlist_id)}/tracks",
+            payload={"uris": uris},
+        )
+
+    async def get_playlist_track_uris(self, playlist_id: str) -> set:
+        """Returns the uris of every track already in a playlist."""
+        first_page = await self.api.get(
+            f"playlists/{utils.get_id('playlist', playlist_id)}/tracks",
+            fields="items(track(uri)),next,total",
+            limit=100,
+        )
+        return {
+            item["track"]["uri"]
+            async for item in paginate(self.api, first_page)
+            if item.get("track")
+        }
+
+    async def search_and_add(
+        self,
+        playlist_id: str,
+        queries: List[str],
+        market: Optional[str] = None,
+        skip_existing: bool = True,
+    ) -> dict:
+        """
+        Searches a track for each query and adds the results to a playlist.
+        Identical queries are searched once; tracks found twice or already in
+        the playlist (if `skip_existing`) are not added again. Searches run
+        concurrently, then the uris are added in chunks of 100, in query order.
+
+        Returns:
+            {"added": int, "snapshot_id": str, "results": [
+                {"query", "status", "track"?, "error"?}, ...]}
+            with status one of 'added', 'duplicate', 'already_in_playlist',
+            'not_found' or 'error'.
+        """
+        playlist_id = utils.get_id("playlist", playlist_id)
+        unique = list(dict.fromkeys(" ".join(q.split()) for q in queries))
+        searches = [self._or_error(self.find_track(q, market=market)) for q in unique]
+        if skip_existing:
+            existing, *tracks = await utils.gather_limited(
+                self.fanout, self.get_playlist_track_uris(playlist_id), *searches
+            )
+        else:
+            existing, tracks = set(), await utils.gather_limited(self.fanout, *searches)
+        found = dict(zip(unique, tracks))
+
+        results, to_add = [], []
+        for query in queries:
+            track = found[" ".join(query.split())]
+            result = {"query": query}
+            if isinstance(track, Exception):
+                result.update(status="error", error=str(track))
+            elif track is None:
+                result["status"] = "not_found"
+            else:
+                result["track"] = {**utils.parse_track(track), "uri": track["uri"]}
+                if track["uri"] in existing:
+                    result["status"] = "already_in_playlist"
+                elif track["uri"] in to_add:
+                    result["status"] = "duplicate"
+                else:
+                    result["status"] = "added"
+                    to_add.append(track["uri"])
+            results.append(result)
+
+        snapshot_id = None
+        for i in range(0, len(to_add), PLAYLIST_ADD_LIMIT):
+            # Séquentiel : l'ordre des ajouts doit suivre l'ordre des requêtes
+            response = await self.add_to_playlist(
+                playlist_id, to_add[i : i + PLAYLIST_ADD_LIMIT]
+            )
+            snapshot_id = (response or {}).get("snapshot_id", snapshot_id)
+        self.logger.info(
+            "Added %s tracks to %s for %s queries",
+            len(to_add),
+            playlist_id,
+            len(queries),
+        )
+        return {"added": len(to_add), "snapshot_id": snapshot_id, "results": results}
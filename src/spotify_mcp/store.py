@@ -0,0 +1,250 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from spotipy.cache_handler import CacheHandler
+
+# Base SQLite partagée par les processus d'un même serveur (réponses du catalogue
+# et jetons OAuth des utilisateurs). Désactivée si vide.
+SHARED_STORE = os.getenv("SPOTIFY_SHARED_STORE", "")
+SHARED_STORE_MAX_MB = float(os.getenv("SPOTIFY_SHARED_STORE_MAX_MB", "256"))
+
+# Nettoyage des réponses expirées et des plus anciennes toutes les N écritures
+PRUNE_EVERY = 512
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    etag TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tokens (
+    tenant TEXT PRIMARY KEY,
+    token TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pause (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    until REAL NOT NULL
+);
+"""
+
+
+class SharedStore:
+    """
+    SQLite database in WAL mode shared by the worker processes of one server,
+    so that a response fetched or a token refreshed by one worker is reused by
+    the others, and a 429 received by one of them pauses them all.
+    - Reads run in the caller's thread: in WAL mode they never wait for a
+      writer, and a point lookup costs tens of microseconds.
+    - Writes are queued to a single writer thread with its own connection, so
+      the event loop never waits for another process holding the write lock.
+    Expiry times are wall-clock times, the only clock the processes share.
+    The database holds the users' tokens in clear: it is created, with its
+    WAL files, readable by its owner only.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        path: str,
+        max_bytes: int = int(SHARED_STORE_MAX_MB * 1024**2),
+    ):
+        self.logger = logger
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.db = self._connect()
+        self.db.executescript(SCHEMA)
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="spotify-store")
+        self._write_db: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.write_errors = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # Jetons en clair : base et fichiers WAL lisibles par le seul propriétaire
+        for path in (self.path, self.path + "-wal", self.path + "-shm"):
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                os.fchmod(fd, 0o600)
+            finally:
+                os.close(fd)
+        db = sqlite3.connect(
+            self.path, timeout=5.0, check_same_thread=False, isolation_level=None
+        )
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _read(self, sql: str, *args) -> Optional[tuple]:
+        with self._lock:
+            return self.db.execute(sql, args).fetchone()
+
+    def _write(self, func, *args):
+        """Queues a write; returns its future."""
+
+        def run():
+            if self._write_db is None:
+                self._write_db = self._connect()
+            try:
+                with self._write_db:
+                    return func(self._write_db, *args)
+            except sqlite3.Error as e:
+                self.write_errors += 1
+                self.logger.error("Shared store write failed: %s", e)
+
+        return self._writer.submit(run)
+
+    # Réponses
+
+    def get_response(self, key: str) -> Optional[tuple[Any, int, float, Optional[str]]]:
+        """Returns (value, size, expires_at, etag), None if the key is unknown."""
+        row = self._read(
+            "SELECT value, size, expires_at, etag FROM responses WHERE key = ?", key
+        )
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        value, size, expires_at, etag = row
+        return json.loads(value), size, expires_at, etag
+
+    def put_response(
+        self, key: str, value: Any, size: int, expires_at: float, etag: Optional[str]
+    ):
+        def put(db: sqlite3.Connection):
+            db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    json.dumps(value, separators=(",", ":")),
+                    size,
+                    expires_at,
+                    etag,
+                    time.time(),
+                ),
+            )
+
+        self._write(put)
+        self._writes += 1
+        if self._writes % PRUNE_EVERY == 0:
+            self._write(self._prune)
+
+    def renew_response(self, key: str, expires_at: float):
+        self._write(
+            lambda db: db.execute(
+                "UPDATE responses SET expires_at = ?, updated_at = ? WHERE key = ?",
+                (expires_at, time.time(), key),
+            )
+        )
+
+    def _prune(self, db: sqlite3.Connection):
+        # Expirées sans ETag (inutiles), puis les moins récentes au-delà de max_bytes
+        db.execute(
+            "DELETE FROM responses WHERE expires_at < ? AND etag IS NULL",
+            (time.time(),),
+        )
+        db.execute(
+            """
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY updated_at DESC) AS total
+                    FROM responses
+                ) WHERE total > ?
+            )
+            """,
+            (self.max_bytes,),
+        )
+
+    # Jetons
+
+    def get_token(self, tenant: str) -> Optional[dict]:
+        row = self._read("SELECT token FROM tokens WHERE tenant = ?", tenant)
+        return json.loads(row[0]) if row else None
+
+    def put_token(self, tenant: str, token: dict):
+        """Stores a token and waits for the write: it must outlive the process."""
+        self._write(
+            lambda db: db.execute(
+                "INSERT OR REPLACE INTO tokens VALUES (?, ?)",
+                (tenant, json.dumps(token)),
+            )
+        ).result()
+
+    # Pause après un 429 (voir scheduler.py)
+
+    def get_pause(self) -> float:
+        """Returns the wall-clock time until which requests are paused."""
+        row = self._read("SELECT until FROM pause WHERE id = 0")
+        return row[0] if row else 0.0
+
+    def put_pause(self, until: float):
+        self._write(
+            lambda db: db.execute(
+                "INSERT INTO pause VALUES (0, ?) "
+                "ON CONFLICT (id) DO UPDATE SET until = MAX(until, excluded.until)",
+                (until,),
+            )
+        )
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        if self._write_db is not None:
+            self._write_db.close()
+        with self._lock:
+            self.db.close()
+
+    def stats(self) -> dict:
+        row = self._read("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses")
+        return {
+            "entries": row[0],
+            "bytes": row[1],
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "write_errors": self.write_errors,
+        }
+
+
+class StoreCacheHandler(CacheHandler):
+    """
+    spotipy cache handler keeping a user's token in the shared store, so the
+    workers serving that user share one access token instead of each
+    refreshing its own.
+    - initial: token used until one is stored (e.g. an expired token holding
+      the refresh token, refreshed on first use)
+    """
+
+    def __init__(self, store: SharedStore, tenant: str, initial: Optional[dict]):
+        self.store = store
+        self.tenant = tenant
+        self.initial = initial
+
+    def get_cached_token(self) -> Optional[dict]:
+        return self.store.get_token(self.tenant) or self.initial
+
+    def save_token_to_cache(self, token_info: dict):
+        self.store.put_token(self.tenant, token_info)
+
+
+_shared_store: Optional[SharedStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def shared_store(logger: logging.Logger) -> Optional[SharedStore]:
+    """Returns the process's shared store, None unless SPOTIFY_SHARED_STORE is set."""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None and SHARED_STORE:
+            _shared_store = SharedStore(logger, SHARED_STORE)
+    return _shared_store
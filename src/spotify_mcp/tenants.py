@@ -0,0 +1,167 @@
+import asyncio
+import contextlib
+import contextvars
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Optional
+
+# Nombre max de clients gardés en mémoire, et inactivité après laquelle un
+# client est fermé (jetons, index de bibliothèque, état de lecture)
+MAX_TENANTS = int(os.getenv("SPOTIFY_MAX_TENANTS", "256"))
+TENANT_IDLE = float(os.getenv("SPOTIFY_TENANT_IDLE", "1800"))
+# Répertoire des index de bibliothèque des utilisateurs identifiés par jeton
+TENANT_DIR = os.getenv("SPOTIFY_TENANT_DIR", ".spotify_tenants")
+
+DEFAULT_TENANT = "default"
+
+# Identifiants Spotify (refresh token) de la session en cours. None : utilisateur
+# du cache OAuth local, le seul en stdio.
+_credentials: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "spotify_credentials", default=None
+)
+
+
+def set_credentials(refresh_token: Optional[str]) -> contextvars.Token:
+    """Selects the user of the code run in the current context."""
+    return _credentials.set(refresh_token)
+
+
+def current_credentials() -> Optional[str]:
+    return _credentials.get()
+
+
+def tenant_key(credentials: Optional[str]) -> str:
+    """Stable, non-secret name of a user, for logs and file names."""
+    if credentials is None:
+        return DEFAULT_TENANT
+    return hashlib.sha256(credentials.encode()).hexdigest()[:16]
+
+
+class Tenant:
+    def __init__(self, client: Any):
+        self.client = client
+        self.last_used = time.monotonic()
+        self.leases = 0
+
+
+class ClientPool:
+    """
+    Spotify clients by user, so that one process can serve many users.
+    Each client has its own tokens, library index and playback state; the HTTP
+    pool, rate limiter and response cache are process-wide and shared.
+    - factory(credentials, key) builds a client, in a worker thread (the OAuth
+      setup blocks); concurrent first calls for a user share one creation.
+    - Least recently used clients are closed beyond `max_clients`, and any
+      client idle for `idle_ttl` seconds, unless a tool call holds it
+      (`lease`) or a session follows its playback.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        factory: Callable[[Optional[str], str], Any],
+        max_clients: int = MAX_TENANTS,
+        idle_ttl: float = TENANT_IDLE,
+    ):
+        self.logger = logger
+        self.factory = factory
+        self.max_clients = max_clients
+        self.idle_ttl = idle_ttl
+        self._tenants: OrderedDict[str, Tenant] = OrderedDict()
+        self._creating: dict[str, asyncio.Future] = {}
+
+        self.created = 0
+        self.evicted = 0
+
+    async def get(self, credentials: Optional[str] = None) -> Any:
+        """Returns the client of a user, creating it on first use."""
+        return (await self._tenant(credentials)).client
+
+    @contextlib.asynccontextmanager
+    async def lease(self, credentials: Optional[str] = None) -> AsyncIterator[Any]:
+        """Holds the client of a user for the duration of a call."""
+        tenant = await self._tenant(credentials)
+        tenant.leases += 1
+        try:
+            yield tenant.client
+        finally:
+            tenant.leases -= 1
+            tenant.last_used = time.monotonic()
+
+    async def _tenant(self, credentials: Optional[str]) -> Tenant:
+        key = tenant_key(credentials)
+        tenant = self._tenants.get(key)
+        if tenant is None:
+            creating = self._creating.get(key)
+            if creating is None:
+                creating = asyncio.ensure_future(self._create(credentials, key))
+                self._creating[key] = creating
+                creating.add_done_callback(lambda _: self._creating.pop(key, None))
+            tenant = await asyncio.shield(creating)
+        tenant.last_used = time.monotonic()
+        self._tenants.move_to_end(key)
+        await self._evict(keep=key)
+        return tenant
+
+    async def _create(self, credentials: Optional[str], key: str) -> Tenant:
+        self.logger.debug("Initializing Spotify client for tenant %s", key)
+        started = time.perf_counter()
+        try:
+            client = await asyncio.to_thread(self.factory, credentials, key)
+        except Exception as e:
+            self.logger.exception("Failed to initialize Spotify client: %s", e)
+            raise
+        self.logger.info(
+            "Spotify client for tenant %s initialized in %.0f ms",
+            key,
+            (time.perf_counter() - started) * 1000,
+        )
+        tenant = self._tenants[key] = Tenant(client)
+        self.created += 1
+        return tenant
+
+    def _busy(self, tenant: Tenant) -> bool:
+        return tenant.leases > 0 or bool(tenant.client.playback.stats()["listeners"])
+
+    async def _evict(self, keep: str):
+        now = time.monotonic()
+        # Du moins récemment utilisé au plus récent : on s'arrête au premier
+        # client ni en trop ni inactif
+        for key, tenant in list(self._tenants.items()):
+            over = len(self._tenants) > self.max_clients
+            idle = now - tenant.last_used > self.idle_ttl
+            if not over and not idle:
+                break
+            if key == keep or self._busy(tenant):
+                continue
+            del self._tenants[key]
+            self.evicted += 1
+            self.logger.info("Closing Spotify client of tenant %s", key)
+            try:
+                await tenant.client.close()
+            except Exception as e:
+                self.logger.error("Failed to close client of tenant %s: %s", key, e)
+
+    def clients(self) -> list:
+        return [tenant.client for tenant in self._tenants.values()]
+
+    def recent(self) -> Optional[Any]:
+        """The most recently used client, None if there is none yet."""
+        return next(reversed(self._tenants.values())).client if self._tenants else None
+
+    async def close(self):
+        for tenant in self._tenants.values():
+            await tenant.client.close()
+        self._tenants.clear()
+
+    def stats(self) -> dict:
+        return {
+            "tenants": len(self._tenants),
+            "active": sum(1 for tenant in self._tenants.values() if tenant.leases),
+            "created": self.created,
+            "evicted": self.evicted,
+            "max_tenants": self.max_clients,
+        }
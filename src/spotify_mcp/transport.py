@@ -0,0 +1,280 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+from urllib.parse import urlencode
+
+import httpx
+from spotipy import SpotifyException
+
+from . import models
+from .cache import ResponseCache
+from .metrics import Metrics
+from .pool import ConnectionPool
+from .scheduler import RequestScheduler, priority_of
+from .scope import current_scope
+
+API_PREFIX = "https://api.spotify.com/v1/"
+
+# Nombre de nouvelles tentatives après un 429, et pause si Retry-After est absent
+MAX_RETRIES = 3
+DEFAULT_RETRY_AFTER = 1.0
+
+
+class Transport:
+    """
+    Non-blocking HTTP layer for the Spotify Web API.
+    Every upstream call of `spotify_api.Client` goes through `request`, so that
+    concurrent tool calls overlap their network waits instead of serializing.
+    Requests are sent through the shared `ConnectionPool`, once admitted by the
+    `RequestScheduler`; identical GETs in flight at the same time share a
+    single upstream request, and within a tool call (`scope.call_scope`) a GET
+    already answered is not sent again.
+    The response cache is shared by every user: the cached responses of the
+    user's own resources (`me/...`) are keyed by `tenant`.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        token_provider: Callable[[], Awaitable[str]],
+        pool: ConnectionPool,
+        cache: Optional[ResponseCache] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        prefix: str = API_PREFIX,
+        metrics: Optional[Metrics] = None,
+        tenant: str = "default",
+    ):
+        self.logger = logger
+        self.token_provider = token_provider
+        self.pool = pool
+        self.cache = cache
+        self.scheduler = scheduler
+        self.prefix = prefix
+        self.metrics = metrics
+        self.tenant = tenant
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self.coalesced = 0
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[dict] = None,
+        payload: Optional[Any] = None,
+        item_type: Optional[type] = None,
+    ) -> Optional[dict]:
+        """
+        Sends a request and returns the decoded JSON body (None if empty).
+        Errors are raised as `SpotifyException`, like spotipy does.
+        - item_type: the body is a paging object whose items are decoded as
+          this `models` class, see `models.decode_page`
+        """
+        response = await self._send(method, path, params, payload)
+        if item_type is not None and response.content:
+            return models.decode_page(response.content, item_type)
+        return _decode(response)
+
+    async def cached_get(self, path: str, kind: str, **params) -> Optional[dict]:
+        """
+        GET served from the response cache when possible.
+        - kind: type of object ('track', 'album', ...), selects the TTL
+        Stale entries are revalidated with If-None-Match when they have an ETag.
+        """
+        if self.cache is None:
+            return await self.get(path, **params)
+
+        key = self._cache_key(path, params)
+        entry, fresh = self.cache.lookup(key)
+        if fresh:
+            return entry.value
+
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        response = await self._send("GET", path, params, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            self.cache.renew(key, kind, entry)
+            return entry.value
+
+        value = _decode(response)
+        self.cache.put(
+            key, kind, value, len(response.content), response.headers.get("ETag")
+        )
+        return value
+
+    async def get_next(
+        self, page: dict, item_type: Optional[type] = None
+    ) -> Optional[dict]:
+        """Fetches the page following a paging object, from its `next` link."""
+        if not page.get("next"):
+            return None
+        return await self.request(
+            "GET", page["next"].removeprefix(self.prefix), item_type=item_type
+        )
+
+    def peek(self, path: str, **params) -> Optional[dict]:
+        """Returns the fresh cached response of a GET, without any request."""
+        if self.cache is None:
+            return None
+        entry, fresh = self.cache.lookup(self._cache_key(path, params))
+        return entry.value if fresh else None
+
+    def store(self, path: str, kind: str, value: dict, **params):
+        """Caches an object as the response of a GET, e.g. from a bulk lookup."""
+        if self.cache is not None:
+            size = len(json.dumps(value, separators=(",", ":")))
+            self.cache.put(self._cache_key(path, params), kind, value, size)
+
+    def _cache_key(self, path: str, params: dict) -> str:
+        key = _cache_key(path, params)
+        # Ressources propres à l'utilisateur : jamais servies à un autre
+        return f"{self.tenant}:{key}" if path.startswith("me/") else key
+
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        params: Optional[dict] = None,
+        payload: Optional[Any] = None,
+        headers: Optional[dict] = None,
+    ) -> httpx.Response:
+        if params:
+            params = {k: v for k, v in params.items() if v is not None}
+        scope = current_scope()
+        if method != "GET":
+            if scope is not None:
+                scope.responses.clear()
+            return await self._send_once(method, path, params, payload, headers)
+
+        key = _cache_key(path, params or {}) + repr(sorted((headers or {}).items()))
+        if scope is not None and key in scope.responses:
+            scope.memoized += 1
+            return scope.responses[key]
+        shared = self._in_flight.get(key)
+        if shared is not None:
+            self.coalesced += 1
+        else:
+            shared = asyncio.ensure_future(
+                self._send_once(method, path, params, payload, headers)
+            )
+            self._in_flight[key] = shared
+            shared.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # shield : un appelant annulé n'annule pas la requête des autres
+        response = await asyncio.shield(shared)
+        if scope is not None:
+            scope.responses[key] = response
+        return response
+
+    async def _send_once(
+        self,
+        method: str,
+        path: str,
+        params: Optional[dict],
+        payload: Optional[Any],
+        headers: Optional[dict],
+    ) -> httpx.Response:
+        for attempt in range(MAX_RETRIES + 1):
+            if self.scheduler is not None:
+                await self.scheduler.acquire(priority_of(method, path))
+            token = await self.token_provider()
+            scope = current_scope()
+            if scope is not None:
+                scope.upstream += 1
+            started = time.perf_counter()
+            try:
+                response = await self.pool.request(
+                    method,
+                    self.prefix + path,
+                    params=params,
+                    json=payload,
+                    headers={**(headers or {}), "Authorization": f"Bearer {token}"},
+                )
+            except httpx.HTTPError as e:
+                self._observe(method, path, started, 599, scope)
+                self.logger.error("HTTP error on %s %s: %s", method, path, e)
+                raise SpotifyException(599, -1, f"{path}:\n {str(e)}")
+            self._observe(method, path, started, response.status_code, scope)
+
+            if (
+                response.status_code == 429
+                and self.scheduler is not None
+                and attempt < MAX_RETRIES
+            ):
+                self.scheduler.pause(_retry_after(response))
+                continue
+            if response.status_code >= 400:
+                raise _to_spotify_exception(response)
+            return response
+
+    def _observe(self, method, path, started, status, scope):
+        if self.metrics is not None:
+            self.metrics.observe_request(
+                method, path, time.perf_counter() - started, status
+            )
+        if scope is not None and status >= 400 and status != 429:
+            scope.errors += 1
+
+    async def get(
+        self, path: str, item_type: Optional[type] = None, **params
+    ) -> Optional[dict]:
+        return await self.request("GET", path, params=params, item_type=item_type)
+
+    async def post(
+        self, path: str, payload: Optional[Any] = None, **params
+    ) -> Optional[dict]:
+        return await self.request("POST", path, params=params, payload=payload)
+
+    async def put(
+        self, path: str, payload: Optional[Any] = None, **params
+    ) -> Optional[dict]:
+        return await self.request("PUT", path, params=params, payload=payload)
+
+    async def delete(
+        self, path: str, payload: Optional[Any] = None, **params
+    ) -> Optional[dict]:
+        return await self.request("DELETE", path, params=params, payload=payload)
+
+
+def _cache_key(path: str, params: dict) -> str:
+    return path + "?" + urlencode(sorted(params.items()))
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return max(0.0, float(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+def _decode(response: httpx.Response) -> Optional[dict]:
+    if not response.content:
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+def _to_spotify_exception(response: httpx.Response) -> SpotifyException:
+    """Builds the same exception spotipy raises for an HTTP error response."""
+    msg = response.reason_phrase or "error"
+    reason = None
+    try:
+        error = response.json().get("error", {})
+        if isinstance(error, dict):
+            msg = error.get("message", msg)
+            reason = error.get("reason")
+        elif error:
+            msg = str(error)
+    except (ValueError, AttributeError):
+        pass
+
+    return SpotifyException(
+        response.status_code,
+        -1,
+        f"{response.request.url}:\n {msg}",
+        reason=reason,
+        headers=dict(response.headers),
+    )
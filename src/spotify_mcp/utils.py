@@ -1,16 +1,26 @@
+import asyncio
 from collections import defaultdict
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 import functools
-from typing import Callable, TypeVar
+import re
+from typing import Awaitable, Callable, TypeVar
 from urllib.parse import quote
 
+from spotipy import SpotifyException
+
+from . import models
 
 T = TypeVar("T")
 
+# Valeur de `reason` renvoyée par l'API quand aucun appareil n'est actif
+NO_ACTIVE_DEVICE = "NO_ACTIVE_DEVICE"
+
 
-def parse_track(track_item: dict, detailed=False) -> Optional[dict]:
+def parse_track(track_item: dict | models.Track, detailed=False) -> Optional[dict]:
     if not track_item:
         return None
+    if isinstance(track_item, models.Track):
+        return track_item.to_dict(detailed)
     narrowed_item = {
         "name": track_item["name"],
         "id": track_item["id"],
@@ -27,9 +37,10 @@ def parse_track(track_item: dict, detailed=False) -> Optional[dict]:
     if not track_item.get("is_playable", True):
         narrowed_item["is_playable"] = False
 
-    artists = [a["name"] for a in track_item["artists"]]
     if detailed:
         artists = [parse_artist(a) for a in track_item["artists"]]
+    else:
+        artists = [a["name"] for a in track_item["artists"]]
 
     if len(artists) == 1:
         narrowed_item["artist"] = artists[0]
@@ -71,14 +82,21 @@ def parse_playlist(playlist_item: dict, username, detailed=False) -> Optional[di
     return narrowed_item
 
 
+def parse_playlist_track(
+    playlist_track_item: dict | models.PlaylistTrack,
+) -> Optional[dict]:
+    """Parses an item of a playlist's tracks page ({added_at, track, ...})."""
+    if isinstance(playlist_track_item, models.PlaylistTrack):
+        return playlist_track_item.to_dict()
+    return parse_track(playlist_track_item.get("track"))
+
+
 def parse_album(album_item: dict, detailed=False) -> dict:
     narrowed_item = {
         "name": album_item["name"],
         "id": album_item["id"],
     }
 
-    artists = [a["name"] for a in album_item["artists"]]
-
     if detailed:
         tracks = []
         for t in album_item["tracks"]["items"]:
@@ -88,6 +106,8 @@ def parse_album(album_item: dict, detailed=False) -> dict:
 
         for k in ["total_tracks", "release_date", "genres"]:
             narrowed_item[k] = album_item.get(k)
+    else:
+        artists = [a["name"] for a in album_item["artists"]]
 
     if len(artists) == 1:
         narrowed_item["artist"] = artists[0]
@@ -131,6 +151,41 @@ def parse_search_results(results: Dict, qtype: str, username: Optional[str] = No
     return dict(_results)
 
 
+def rank_changes(before: List[dict], after: List[dict], limit: int = 10) -> dict:
+    """
+    Compares two rankings of the same kind of items, e.g. the top artists of
+    the last year and of the last 4 weeks. Items are dicts with an 'id' and a
+    'rank' (1 = top).
+    Returns, with at most `limit` items each:
+    - rising / falling: items ranked higher / lower in `after`, biggest moves
+      first, with their 'previous_rank' and 'change' (positive when rising)
+    - new: items only in `after`; gone: items only in `before`, by rank
+    """
+    previous = {item["id"]: item["rank"] for item in before}
+    current = {item["id"] for item in after}
+    moved = [
+        {
+            **item,
+            "previous_rank": previous[item["id"]],
+            "change": previous[item["id"]] - item["rank"],
+        }
+        for item in after
+        if item["id"] in previous
+    ]
+    return {
+        "rising": sorted(
+            (item for item in moved if item["change"] > 0),
+            key=lambda item: -item["change"],
+        )[:limit],
+        "falling": sorted(
+            (item for item in moved if item["change"] < 0),
+            key=lambda item: item["change"],
+        )[:limit],
+        "new": [item for item in after if item["id"] not in previous][:limit],
+        "gone": [item for item in before if item["id"] not in current][:limit],
+    }
+
+
 def build_search_query(
     base_query: str,
     artist: Optional[str] = None,
@@ -184,24 +239,77 @@ def build_search_query(
     return quote(" ".join(query_parts))
 
 
-def validate(func: Callable[..., T]) -> Callable[..., T]:
+_SPOTIFY_URI = re.compile(r"^spotify:(?P<type>[a-z]+):(?P<id>[0-9A-Za-z]+)$")
+_SPOTIFY_URL = re.compile(
+    r"^https?://open\.spotify\.com/(?:intl-\w+/)?(?P<type>[a-z]+)/(?P<id>[0-9A-Za-z]+)"
+)
+
+
+def get_id(qtype: str, value: str) -> str:
+    """
+    Returns the bare Spotify ID of an ID, URI or open.spotify.com URL.
+    Raises ValueError if the URI/URL points to another type of item.
+    """
+    match = _SPOTIFY_URI.match(value) or _SPOTIFY_URL.match(value)
+    if match is None:
+        return value
+    if match.group("type") != qtype:
+        raise ValueError(f"Expected a {qtype} uri, got {value}")
+    return match.group("id")
+
+
+def get_uri(qtype: str, value: str) -> str:
+    """Returns the 'spotify:<qtype>:<id>' URI of an ID, URI or URL."""
+    return f"spotify:{qtype}:{get_id(qtype, value)}"
+
+
+async def gather_limited(semaphore: asyncio.Semaphore, *aws: Awaitable) -> list:
+    """
+    Runs independent requests concurrently, at most `semaphore` at a time.
+    Results are returned in argument order; the first error is raised.
+    Do not nest: an awaitable holding a slot must not wait on the same semaphore.
+    """
+
+    async def run(aw: Awaitable):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws))
+
+
+def validate(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
     """
     Decorator for Spotify API methods that handles authentication and device validation.
     - Checks and refreshes authentication if needed
-    - Validates active device and retries with candidate device if needed
+    - Picks the target device from the cached device registry
+    - Retries once with a refreshed device list if Spotify reports no active device
     """
 
     @functools.wraps(func)
-    def wrapper(self, *args, **kwargs):
+    async def wrapper(self, *args, **kwargs):
         # Handle authentication
-        if not self.auth_ok():
-            self.auth_refresh()
+        if not await self.auth_ok():
+            await self.auth_refresh()
 
         # Handle device validation
-        if not self.is_active_device():
-            kwargs["device"] = self._get_candidate_device()
-
-        # TODO: try-except RequestException
-        return func(self, *args, **kwargs)
+        device = await self._get_candidate_device()
+        if device is not None:
+            kwargs["device"] = device
+
+        try:
+            result = await func(self, *args, **kwargs)
+        except SpotifyException as e:
+            if e.reason != NO_ACTIVE_DEVICE:
+                raise
+            self.logger.info("No active device reported, refreshing device list")
+            device = await self._get_candidate_device(refresh=True)
+            if device is None:
+                raise
+            kwargs["device"] = device
+            result = await func(self, *args, **kwargs)
+
+        if device is not None:
+            self.devices.mark_active(device["id"])
+        return result
 
     return wrapper
@@ -0,0 +1,318 @@
+import asyncio
+import contextlib
+import ipaddress
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from typing import Awaitable, Callable, Optional
+
+import anyio
+import httpx
+import uvicorn
+from mcp.server.sse import SseServerTransport
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from .logs import worker_path
+from .tenants import set_credentials
+
+# Adresse du transport HTTP/SSE, et nombre de processus qui se la partagent
+HOST = os.getenv("SPOTIFY_HOST", "127.0.0.1")
+PORT = int(os.getenv("SPOTIFY_PORT", "8000"))
+WORKERS = int(os.getenv("SPOTIFY_WORKERS", "1"))
+# Store partagé par défaut quand il y a plusieurs processus (voir store.py),
+# créé dans le répertoire privé des sockets de relais
+DEFAULT_SHARED_STORE = "shared.db"
+
+# Délai laissé aux sessions SSE ouvertes à l'arrêt d'un processus
+SHUTDOWN_TIMEOUT = 5
+# Un processus mort moins de N secondes après son démarrage est relancé plus tard
+RESTART_DELAY = 1.0
+
+# serve_worker(worker, sockets, peers): sert les sessions d'un processus
+ServeWorker = Callable[[int, list, dict], Awaitable[None]]
+# run_session(read_stream, write_stream): une session MCP
+RunSession = Callable[[object, object], Awaitable[None]]
+
+
+def bearer_token(request: Request) -> Optional[str]:
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token.strip():
+        return token.strip()
+    return None
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class WorkerApp:
+    """
+    ASGI app of one worker process: MCP over SSE (mcp 1.3 has no streamable
+    HTTP server).
+    - GET /sse opens a session. The user is given by an `Authorization: Bearer
+      <Spotify refresh token>` header; without it, the local OAuth cache user
+      is served, and only when listening on a loopback address.
+    - The client then POSTs its messages to /messages/<worker>/. The workers
+      share one port, so such a POST may reach another worker than the one
+      holding the session: it is relayed over that worker's Unix socket.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        run_session: RunSession,
+        worker: int,
+        peers: dict,
+        local_user: bool,
+    ):
+        self.logger = logger
+        self.run_session = run_session
+        self.worker = worker
+        self.peers = peers
+        self.local_user = local_user
+        self.sse = SseServerTransport(f"/messages/{worker}/")
+        self._relays: dict[int, httpx.AsyncClient] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return
+        path, method = scope["path"], scope["method"]
+        if path == "/sse" and method == "GET":
+            await self._connect(scope, receive, send)
+        elif path.startswith("/messages/") and method == "POST":
+            await self._post(scope, receive, send)
+        else:
+            await Response("Not found", status_code=404)(scope, receive, send)
+
+    async def _connect(self, scope: Scope, receive: Receive, send: Send):
+        credentials = bearer_token(Request(scope, receive))
+        if credentials is None and not self.local_user:
+            response = Response(
+                "A Spotify refresh token is required (Authorization: Bearer)",
+                status_code=401,
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+            return await response(scope, receive, send)
+
+        # Hérité par toutes les tâches de la session : voir tenants.ClientPool
+        set_credentials(credentials)
+        # mcp 1.3 ne termine pas la session quand le client se déconnecte :
+        # sans cela, chaque session fermée resterait en mémoire
+        disconnected = anyio.CancelScope()
+
+        async def watched_receive():
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.cancel()
+            return message
+
+        async with self.sse.connect_sse(scope, watched_receive, send) as streams:
+            with disconnected:
+                await self.run_session(*streams)
+
+    async def _post(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            worker = int(scope["path"].split("/")[2])
+        except ValueError:
+            worker = None
+        if worker == self.worker:
+            return await self.sse.handle_post_message(scope, receive, send)
+        if worker not in self.peers:
+            return await Response("Unknown worker", status_code=404)(
+                scope, receive, send
+            )
+
+        request = Request(scope, receive)
+        url = f"http://worker{scope['path']}?{scope['query_string'].decode()}"
+        try:
+            relayed = await self._relay(worker).post(
+                url,
+                content=await request.body(),
+                headers={"Content-Type": request.headers.get("Content-Type", "")},
+            )
+            response = Response(relayed.content, status_code=relayed.status_code)
+        except httpx.HTTPError as e:
+            self.logger.error("Failed to relay message to worker %d: %s", worker, e)
+            response = Response("Worker unavailable", status_code=502)
+        await response(scope, receive, send)
+
+    def _relay(self, worker: int) -> httpx.AsyncClient:
+        client = self._relays.get(worker)
+        if client is None:
+            client = self._relays[worker] = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=self.peers[worker])
+            )
+        return client
+
+    async def close(self):
+        for client in self._relays.values():
+            await client.aclose()
+
+
+class _Server(uvicorn.Server):
+    # uvicorn relance les signaux reçus après son arrêt, ce qui tuerait le
+    # processus avant le nettoyage (clients, métriques) : on les garde
+    @contextlib.contextmanager
+    def capture_signals(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.handle_exit, sig, None)
+        try:
+            yield
+        finally:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(sig)
+
+
+async def serve_sessions(
+    logger: logging.Logger,
+    run_session: RunSession,
+    worker: int,
+    sockets: list,
+    peers: dict,
+):
+    """Serves the MCP sessions of one worker process until it is stopped."""
+    app = WorkerApp(logger, run_session, worker, peers, is_loopback(HOST))
+    config = uvicorn.Config(
+        app,
+        lifespan="off",
+        log_level="warning",
+        timeout_graceful_shutdown=SHUTDOWN_TIMEOUT,
+    )
+    try:
+        await _Server(config).serve(sockets=sockets)
+    finally:
+        await app.close()
+
+
+def metrics_path(path: str, worker: int, workers: int) -> str:
+    """'metrics.prom' -> 'metrics.1.prom': one metrics file per worker."""
+    return worker_path(path, worker if workers > 1 else None)
+
+
+def _bind_tcp(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _bind_unix(path: str) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(serve_worker: ServeWorker, worker: int, sockets: list, peers: dict):
+    # Le superviseur arrête les processus : un Ctrl-C du terminal ne doit pas
+    # interrompre leur nettoyage (uvicorn gère les signaux pendant le service)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    asyncio.run(serve_worker(worker, sockets, peers))
+
+
+async def serve(
+    logger: logging.Logger, serve_worker: ServeWorker, workers: int = WORKERS
+):
+    """
+    Runs the HTTP/SSE transport on HOST:PORT.
+    With one worker, it is served in this process. Otherwise the port is bound
+    here and shared by `workers` processes (spawned, so each has its own event
+    loop, clients and caches), restarted if they die; the response cache and
+    the users' tokens are shared through SPOTIFY_SHARED_STORE. If empty, it
+    is set to DEFAULT_SHARED_STORE in a private temporary directory, removed
+    on exit.
+    """
+    listener = _bind_tcp(HOST, PORT)
+    if workers <= 1:
+        logger.info("Serving MCP over SSE on http://%s:%d/sse", HOST, PORT)
+        await serve_worker(0, [listener], {})
+        return
+
+    # Les processus se partagent le budget de requêtes (voir scheduler.py)
+    os.environ["SPOTIFY_WORKERS"] = str(workers)
+    # Répertoire privé (0700) des sockets de relais entre processus
+    directory = tempfile.mkdtemp(prefix="spotify-mcp-")
+    if not os.getenv("SPOTIFY_SHARED_STORE"):
+        os.environ["SPOTIFY_SHARED_STORE"] = os.path.join(
+            directory, DEFAULT_SHARED_STORE
+        )
+    peers = {i: os.path.join(directory, f"worker-{i}.sock") for i in range(workers)}
+    relays = {i: _bind_unix(path) for i, path in peers.items()}
+    context = multiprocessing.get_context("spawn")
+    processes: dict[int, multiprocessing.Process] = {}
+    started: dict[int, float] = {}
+
+    def start(worker: int):
+        process = context.Process(
+            target=_run_worker,
+            args=(serve_worker, worker, [listener, relays[worker]], peers),
+            name=f"spotify-mcp-worker-{worker}",
+        )
+        # Lu à l'import par le processus (fichier de log, voir logs.py)
+        os.environ["SPOTIFY_WORKER"] = str(worker)
+        try:
+            process.start()
+        finally:
+            del os.environ["SPOTIFY_WORKER"]
+        processes[worker] = process
+        started[worker] = time.monotonic()
+
+    # SIGTERM : même arrêt propre que Ctrl-C
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGTERM, asyncio.current_task().cancel
+    )
+    try:
+        for worker in range(workers):
+            start(worker)
+        logger.info(
+            "Serving MCP over SSE on http://%s:%d/sse with %d workers",
+            HOST,
+            PORT,
+            workers,
+        )
+        while True:
+            sentinels = {p.sentinel: w for w, p in processes.items()}
+            ready = await asyncio.to_thread(
+                multiprocessing.connection.wait, list(sentinels)
+            )
+            for sentinel in ready:
+                worker = sentinels[sentinel]
+                logger.error(
+                    "Worker %d exited with code %s, restarting it",
+                    worker,
+                    processes[worker].exitcode,
+                )
+                if time.monotonic() - started[worker] < RESTART_DELAY:
+                    await asyncio.sleep(RESTART_DELAY)
+                start(worker)
+    except asyncio.CancelledError:
+        logger.info("Stopping %d workers", workers)
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            await asyncio.to_thread(process.join, SHUTDOWN_TIMEOUT + 5)
+            if process.is_alive():
+                process.kill()
+        for sock in (listener, *relays.values()):
+            sock.close()
+        shutil.rmtree(directory, ignore_errors=True)
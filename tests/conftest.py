@@ -0,0 +1,39 @@
+import logging
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+
+class FakeApi:
+    """
+    Stand-in for transport.Transport serving paged collections from memory:
+    path -> list of items. Records the requested paths.
+    """
+
+    def __init__(self, collections: dict):
+        self.collections = collections
+        self.requests = []
+
+    async def get(self, path: str, item_type=None, offset=0, limit=20, **params):
+        self.requests.append(path)
+        items = self.collections[path]
+        end = offset + limit
+        return {
+            "items": items[offset:end],
+            "offset": offset,
+            "limit": limit,
+            "total": len(items),
+            "next": f"{path}?offset={end}&limit={limit}" if end < len(items) else None,
+        }
+
+    async def get_next(self, page: dict, item_type=None):
+        if not page.get("next"):
+            return None
+        url = urlsplit(page["next"])
+        params = {k: int(v[0]) for k, v in parse_qs(url.query).items()}
+        return await self.get(url.path, item_type, **params)
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger("tests")
@@ -0,0 +1,61 @@
+from spotify_mcp.cache import ResponseCache
+
+
+def test_lookup_returns_stale_entry_with_etag():
+    cache = ResponseCache(max_bytes=100)
+    cache.put("playlists/a", "playlist", {"id": "a"}, 10, etag='"v1"')
+
+    entry, fresh = cache.lookup("playlists/a")
+
+    assert entry.value == {"id": "a"}
+    assert not fresh
+
+
+def test_renew_makes_entry_fresh():
+    cache = ResponseCache(max_bytes=100, ttls={"playlist": 60})
+    cache.put("playlists/a", "playlist", {"id": "a"}, 10, etag='"v1"')
+    entry, _ = cache.lookup("playlists/a")
+    entry.expires_at = 0
+
+    cache.renew("playlists/a", "playlist", entry)
+
+    assert cache.lookup("playlists/a") == (entry, True)
+    assert cache.revalidated == 1
+
+
+def test_renew_after_eviction_caches_entry_again():
+    # Entrée évincée pendant la requête If-None-Match : le 304 la rétablit
+    cache = ResponseCache(max_bytes=100)
+    cache.put("playlists/a", "playlist", {"id": "a"}, 60, etag='"v1"')
+    entry, fresh = cache.lookup("playlists/a")
+    assert not fresh
+    cache.put("tracks/b", "track", {"id": "b"}, 60)
+    assert cache.lookup("playlists/a") == (None, False)
+
+    cache.renew("playlists/a", "playlist", entry)
+
+    assert cache.lookup("playlists/a")[0] is entry
+    assert cache.size <= cache.max_bytes
+
+
+def test_renew_keeps_newer_entry():
+    cache = ResponseCache(max_bytes=100)
+    cache.put("playlists/a", "playlist", {"id": "a"}, 10, etag='"v1"')
+    stale, _ = cache.lookup("playlists/a")
+    cache.put("playlists/a", "playlist", {"id": "a", "v": 2}, 10, etag='"v2"')
+
+    cache.renew("playlists/a", "playlist", stale)
+
+    assert cache.lookup("playlists/a")[0].value == {"id": "a", "v": 2}
+
+
+def test_size_budget_evicts_least_recently_used():
+    cache = ResponseCache(max_bytes=100)
+    cache.put("tracks/a", "track", {"id": "a"}, 40)
+    cache.put("tracks/b", "track", {"id": "b"}, 40)
+    cache.lookup("tracks/a")
+    cache.put("tracks/c", "track", {"id": "c"}, 40)
+
+    assert cache.lookup("tracks/a")[1]
+    assert cache.lookup("tracks/b") == (None, False)
+    assert cache.evictions == 1
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+from conftest import FakeApi
+
+from spotify_mcp.library import LibraryIndex
+
+
+def saved_track(n: int) -> dict:
+    return {
+        "added_at": f"2024-01-01T00:{n // 60:02d}:{n % 60:02d}Z",
+        "track": {
+            "id": f"t{n}",
+            "name": f"Track {n}",
+            "artists": [{"id": f"a{n % 5}", "name": f"Artist {n % 5}"}],
+            "album": {"id": f"al{n}", "name": f"Album {n}"},
+            "duration_ms": 1000,
+        },
+    }
+
+
+def library_api(tracks: list) -> FakeApi:
+    # Plus récents d'abord, comme l'API
+    return FakeApi(
+        {
+            "me/tracks": sorted(tracks, key=lambda t: t["added_at"], reverse=True),
+            "me/albums": [],
+            "me/playlists": [],
+        }
+    )
+
+
+@pytest.fixture
+def library(logger, tmp_path):
+    index = LibraryIndex(logger, str(tmp_path / "library.db"))
+    yield index
+    index.close()
+
+
+def indexed_ids(library: LibraryIndex) -> set:
+    return {row["id"] for row in library.db.execute("SELECT id FROM tracks")}
+
+
+def test_sync_adds_only_new_items(library):
+    tracks = [saved_track(n) for n in range(120)]
+    asyncio.run(library.sync(library_api(tracks)))
+
+    api = library_api(tracks + [saved_track(200)])
+    new = asyncio.run(library.sync(api))
+
+    assert new["tracks"] == 1
+    assert api.requests.count("me/tracks") == 1
+    assert len(indexed_ids(library)) == 121
+
+
+def test_sync_detects_removal_hidden_by_unavailable_item(library):
+    # Un titre indisponible (null) compte dans le total mais n'est pas indexé :
+    # après un retrait, le nombre de titres indexés égale de nouveau le total
+    unavailable = {"added_at": "2023-01-01T00:00:00Z", "track": None}
+    tracks = [saved_track(n) for n in range(120)] + [unavailable]
+    asyncio.run(library.sync(library_api(tracks)))
+
+    tracks = [t for t in tracks if (t["track"] or {}).get("id") != "t110"]
+    asyncio.run(library.sync(library_api(tracks)))
+
+    assert "t110" not in indexed_ids(library)
+    assert len(indexed_ids(library)) == 119
+
+
+def test_unavailable_item_does_not_force_full_syncs(library):
+    unavailable = {"added_at": "2023-01-01T00:00:00Z", "track": None}
+    tracks = [saved_track(n) for n in range(120)] + [unavailable]
+    asyncio.run(library.sync(library_api(tracks)))
+
+    for _ in range(2):
+        api = library_api(tracks)
+        new = asyncio.run(library.sync(api))
+
+        assert new["tracks"] == 0
+        assert api.requests.count("me/tracks") == 1
+
+
+def test_query_rejects_unknown_kind(library):
+    with pytest.raises(ValueError):
+        asyncio.run(library.query("songs"))
+
+
+def test_saved_tracks_keep_artist_ids(library):
+    asyncio.run(library.sync(library_api([saved_track(3)])))
+
+    (track,) = asyncio.run(library.saved_tracks())
+
+    assert track["artists"] == [{"id": "a3", "name": "Artist 3"}]
+    assert track["album"] == {"id": "al3", "name": "Album 3"}
+
+
+def test_search_library_checks_kind_before_syncing(library):
+    from types import SimpleNamespace
+
+    from spotify_mcp.spotify_api import Client
+
+    api = library_api([saved_track(1)])
+    client = SimpleNamespace(library=library, api=api)
+
+    with pytest.raises(ValueError):
+        asyncio.run(Client.search_library(client, kind="songs"))
+    assert api.requests == []
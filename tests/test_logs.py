@@ -0,0 +1,7 @@
+from spotify_mcp.logs import worker_path
+
+
+def test_each_worker_has_its_own_file():
+    assert worker_path("/var/log/spotify_mcp.log", None) == "/var/log/spotify_mcp.log"
+    assert worker_path("/var/log/spotify_mcp.log", 1) == "/var/log/spotify_mcp.1.log"
+    assert worker_path("/var/log/spotify_mcp.log", "0") == "/var/log/spotify_mcp.0.log"
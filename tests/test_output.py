@@ -0,0 +1,51 @@
+import json
+
+from spotify_mcp import output
+
+
+def artist_info(top_tracks: int, albums: int) -> dict:
+    return {
+        "name": "Artist",
+        "top_tracks": [{"name": f"Top track {n}" * 10} for n in range(top_tracks)],
+        "albums": [{"name": f"Album {n}"} for n in range(albums)],
+        "next_offset": 40,
+    }
+
+
+def test_small_result_is_not_cut():
+    result = {"items": [1, 2, 3], "total": 3}
+
+    assert json.loads(output.dumps(result, max_chars=1000)) == result
+
+
+def test_cut_of_paged_field_gives_next_offset():
+    result = {"total": 500, "items": [{"name": "x" * 50} for _ in range(100)]}
+
+    cut = json.loads(output.dumps(result, offset=100, max_chars=2000, paged="items"))
+
+    kept = cut["truncated"]["returned"]
+    assert 0 < kept < 100
+    assert cut["items"] == result["items"][:kept]
+    assert cut["truncated"]["next_offset"] == 100 + kept
+    assert len(output.dumps(result, offset=100, max_chars=2000, paged="items")) <= 2000
+
+
+def test_cut_of_other_field_keeps_collection_cursor():
+    # top_tracks est coupé, mais next_offset porte sur les albums
+    result = artist_info(top_tracks=100, albums=20)
+
+    cut = json.loads(output.dumps(result, offset=20, max_chars=3000, paged="albums"))
+
+    assert cut["truncated"]["field"] == "top_tracks"
+    assert "next_offset" not in cut["truncated"]
+    assert cut["next_offset"] == 40
+    assert cut["albums"] == result["albums"]
+
+
+def test_cut_without_paged_field_has_no_cursor():
+    result = [{"name": "x" * 50} for _ in range(100)]
+
+    cut = json.loads(output.dumps(result, max_chars=2000))
+
+    assert "next_offset" not in cut["truncated"]
+    assert cut["truncated"]["omitted"] == 100 - cut["truncated"]["returned"]
@@ -0,0 +1,36 @@
+import asyncio
+
+from conftest import FakeApi
+
+from spotify_mcp.pager import fetch_window
+
+ITEMS = [{"id": f"i{n}"} for n in range(120)]
+
+
+def test_window_across_pages():
+    api = FakeApi({"me/tracks": ITEMS})
+    window = asyncio.run(
+        fetch_window(api, "me/tracks", offset=30, limit=60, parse=lambda i: i["id"])
+    )
+    assert window["items"] == [f"i{n}" for n in range(30, 90)]
+    assert (window["total"], window["offset"], window["next_offset"]) == (120, 30, 90)
+    assert len(api.requests) == 2
+
+
+def test_last_window_has_no_next_offset():
+    api = FakeApi({"me/tracks": ITEMS})
+    window = asyncio.run(fetch_window(api, "me/tracks", offset=100, limit=50))
+    assert len(window["items"]) == 20 and window["next_offset"] is None
+
+
+def test_first_page_saves_a_request():
+    api = FakeApi({"me/tracks": ITEMS})
+
+    async def run():
+        first_page = await api.get("me/tracks", offset=0, limit=50)
+        return await fetch_window(
+            api, "me/tracks", offset=10, limit=20, first_page=first_page
+        )
+
+    window = asyncio.run(run())
+    assert window["items"] == ITEMS[10:30] and len(api.requests) == 1
@@ -0,0 +1,62 @@
+import asyncio
+
+from spotify_mcp.playback import PlaybackState
+
+
+class Player:
+    """Fetch function of PlaybackState, returning the current state."""
+
+    def __init__(self, is_playing: bool):
+        self.is_playing = is_playing
+        self.fetches = 0
+
+    async def __call__(self):
+        self.fetches += 1
+        await asyncio.sleep(0.01)
+        return {"is_playing": self.is_playing, "item": {"id": "t1"}}
+
+
+def test_snapshot_is_reused_while_fresh(logger):
+    async def run():
+        player = Player(is_playing=True)
+        state = PlaybackState(logger, player, max_age=60)
+        await state.snapshot()
+        player.is_playing = False
+        return await state.snapshot(), player.fetches
+
+    snapshot, fetches = asyncio.run(run())
+    assert snapshot["is_playing"] and fetches == 1
+
+
+def test_max_age_zero_sees_change_from_another_device(logger):
+    async def run():
+        player = Player(is_playing=False)
+        state = PlaybackState(logger, player, max_age=60)
+        await state.snapshot()
+        # Reprise depuis un autre appareil : aucune commande de ce serveur
+        player.is_playing = True
+        return await state.snapshot(max_age=0)
+
+    assert asyncio.run(run())["is_playing"]
+
+
+def test_concurrent_fresh_reads_share_one_fetch(logger):
+    async def run():
+        player = Player(is_playing=True)
+        state = PlaybackState(logger, player, max_age=60)
+        await asyncio.gather(*(state.snapshot(max_age=0) for _ in range(5)))
+        return player.fetches
+
+    assert asyncio.run(run()) == 1
+
+
+def test_invalidate_forces_a_fetch(logger):
+    async def run():
+        player = Player(is_playing=True)
+        state = PlaybackState(logger, player, max_age=60)
+        await state.snapshot()
+        state.invalidate()
+        await state.snapshot()
+        return player.fetches
+
+    assert asyncio.run(run()) == 2
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from spotify_mcp import recommend
+from spotify_mcp.recommend import Recommender, TasteData
+
+
+def track(track_id: str, artist_id: str, album_id: str, year: int) -> dict:
+    return {
+        "id": track_id,
+        "name": track_id,
+        "artists": [{"id": artist_id, "name": artist_id}],
+        "album": {"id": album_id, "release_date": f"{year}-01-01"},
+    }
+
+
+@pytest.fixture
+def data() -> TasteData:
+    # Deux artistes indie (a1, a2) partageant une playlist, deux artistes jazz
+    tracks = [
+        track("t1", "a1", "al1", 2010),
+        track("t2", "a1", "al1", 2010),
+        track("t3", "a1", "al1", 2011),
+        track("t4", "a2", "al2", 2012),
+        track("t5", "a2", "al2", 2013),
+        track("t6", "a3", "al3", 1960),
+        track("t7", "a3", "al3", 1961),
+        track("t8", "a4", "al4", 1958),
+    ]
+    return TasteData(
+        tracks={t["id"]: t for t in tracks},
+        artists={
+            "a1": {"id": "a1", "genres": ["indie rock"]},
+            "a2": {"id": "a2", "genres": ["indie rock"]},
+            "a3": {"id": "a3", "genres": ["jazz"]},
+            "a4": {"id": "a4", "genres": ["jazz", "bebop"]},
+        },
+        playlists={"p1": ["t1", "t4", "t5"], "p2": ["t6", "t8"]},
+        library={"t2", "t6"},
+        top_tracks={"short_term": ["t6"], "long_term": ["t1"]},
+        top_artists=["a3"],
+    )
+
+
+def ranking(logger, data: TasteData, **kwargs) -> list[tuple[str, float]]:
+    async def fetch():
+        return data
+
+    recommender = Recommender(logger, fetch)
+    ranked = asyncio.run(recommender.recommend(**kwargs))
+    return [(t["id"], score) for t, score in ranked]
+
+
+def ids(ranked: list) -> list[str]:
+    return [track_id for track_id, _ in ranked]
+
+
+def test_seed_track_ranks_similar_tracks(logger, data):
+    ranked = ranking(logger, data, seed_tracks={"t1": data.tracks["t1"]})
+    # Même artiste et album d'abord, puis l'artiste du même genre et de la
+    # même playlist ; le jazz ne partage rien avec la graine
+    assert ids(ranked) == ["t2", "t3", "t4", "t5"]
+    scores = [score for _, score in ranked]
+    assert scores == sorted(scores, reverse=True) and scores[-1] > 0
+
+
+def test_exclusions(logger, data):
+    seeds = {"t1": data.tracks["t1"]}
+    ranked = ranking(logger, data, seed_tracks=seeds, exclude_library=True)
+    assert ids(ranked) == ["t3", "t4", "t5"]
+    # Sans graines : profil des favoris (t6 et l'artiste a3 en tête), sans
+    # les favoris récents
+    ranked = ids(ranking(logger, data))
+    assert ranked[0] == "t7" and "t6" not in ranked
+
+
+def test_max_per_artist(logger, data):
+    seeds = {"t1": data.tracks["t1"]}
+    assert recommend.MAX_PER_ARTIST == 2
+    ranked = ranking(logger, data, seed_tracks=seeds, max_per_artist=1)
+    assert ids(ranked) == ["t2", "t4"]
+
+
+def test_unknown_seeds_are_placed_by_their_features(logger, data):
+    seed = track("new", "a4", "al9", 1959)
+    ranked = ranking(logger, data, seed_tracks={"new": seed})
+    assert ids(ranked)[0] == "t8"
+    ranked = ranking(logger, data, seed_artists={"a2": data.artists["a2"]})
+    assert ids(ranked)[:2] == ["t4", "t5"]
+
+
+@pytest.mark.parametrize("seeded", [True, False])
+def test_numpy_and_pure_python_agree(logger, data, monkeypatch, seeded):
+    pytest.importorskip("numpy")
+    kwargs = {"seed_tracks": {"t4": data.tracks["t4"]}} if seeded else {}
+    with_numpy = ranking(logger, data, **kwargs)
+    monkeypatch.setattr(recommend, "np", None)
+    pure_python = ranking(logger, data, **kwargs)
+    assert ids(with_numpy) == ids(pure_python)
+    for (_, a), (_, b) in zip(with_numpy, pure_python):
+        assert a == pytest.approx(b, abs=1e-6)
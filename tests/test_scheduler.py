@@ -0,0 +1,47 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from spotify_mcp import scheduler
+from spotify_mcp.scheduler import RequestScheduler
+from spotify_mcp.store import SharedStore
+
+
+def test_workers_share_the_application_budget(logger, monkeypatch):
+    monkeypatch.setenv("SPOTIFY_WORKERS", "3")
+    monkeypatch.setattr(scheduler, "_shared_scheduler", None)
+    shared = scheduler.shared_scheduler(logger)
+    assert shared.rate == 2.0 and shared.burst == 6
+
+
+def test_pause_holds_the_other_workers(logger, tmp_path):
+    path = str(tmp_path / "shared.db")
+    first, second = SharedStore(logger, path), SharedStore(logger, path)
+    try:
+        throttled = RequestScheduler(logger, store=first)
+        other = RequestScheduler(logger, store=second)
+        assert other._delay(time.monotonic()) == 0
+        throttled.pause(30)
+        first.close()  # attend l'écriture de la pause
+        assert 29 < other._delay(time.monotonic()) <= 30
+    finally:
+        second.close()
+
+
+def test_concurrent_first_calls_share_one_scheduler(logger, monkeypatch):
+    class SlowScheduler(RequestScheduler):
+        def __init__(self, *args, **kwargs):
+            time.sleep(0.05)  # laisse les autres threads passer le test
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(scheduler, "_shared_scheduler", None)
+    monkeypatch.setattr(scheduler, "RequestScheduler", SlowScheduler)
+    barrier = threading.Barrier(4)
+
+    def first_call(_):
+        barrier.wait()
+        return scheduler.shared_scheduler(logger)
+
+    with ThreadPoolExecutor(4) as threads:
+        schedulers = list(threads.map(first_call, range(4)))
+    assert len({id(s) for s in schedulers}) == 1
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from spotify_mcp import server
+
+
+class FakeClient:
+    """Records the arguments of get_info."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def get_info(self, item_uri, offset=0, limit=None):
+        self.calls.append((item_uri, offset, limit))
+        return {"name": "x"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeClient()
+
+    async def get_client():
+        return client
+
+    monkeypatch.setattr(server, "get_client", get_client)
+    return client
+
+
+@pytest.mark.parametrize("arguments", [{}, {"item_uris": []}, {"item_uri": None}])
+def test_info_requires_an_uri(client, arguments):
+    (content,) = asyncio.run(server.call_tool("SpotifyInfo", arguments))
+
+    assert "item_uri or item_uris is required" in content.text
+    assert client.calls == []
+
+
+def test_info_converts_offset_and_limit(client):
+    arguments = {"item_uri": "spotify:artist:a1", "offset": "20", "limit": "5"}
+    asyncio.run(server.call_tool("SpotifyInfo", arguments))
+    asyncio.run(server.call_tool("SpotifyInfo", {"item_uri": "spotify:album:al1"}))
+
+    assert client.calls == [
+        ("spotify:artist:a1", 20, 5),
+        ("spotify:album:al1", 0, None),
+    ]
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from spotify_mcp.playback import PlaybackState
+from spotify_mcp.spotify_api import Client
+
+
+def track(uri: str) -> dict:
+    return {"type": "track", "uri": uri, "name": uri}
+
+
+class Api:
+    """Transport returning a fixed queue, recording the play requests."""
+
+    def __init__(self, queue: list):
+        self.queue = queue
+        self.played = []
+        self.devices = []
+
+    async def get(self, path):
+        return {"queue": self.queue}
+
+    async def put(self, path, payload=None, device_id=None):
+        self.played.append(payload)
+        self.devices.append(device_id)
+
+
+def jump(current: str, queue: list, n: int):
+    playback = {
+        "context": {"uri": "spotify:playlist:p1"},
+        "item": track(current),
+        "device": {"id": "d1"},
+    }
+
+    async def snapshot(max_age=None):
+        return playback
+
+    api = Api(queue)
+    client = SimpleNamespace(
+        api=api,
+        fanout=asyncio.Semaphore(4),
+        playback=SimpleNamespace(snapshot=snapshot),
+        logger=logging.getLogger("test"),
+    )
+    return asyncio.run(Client._jump_in_context(client, n)), api.played
+
+
+def test_jumps_to_the_nth_track_of_the_context():
+    done, played = jump("a", [track("b"), track("c"), track("d")], 2)
+    assert done and played[0]["offset"] == {"uri": "c"}
+
+
+def test_duplicate_target_before_it_skips_one_by_one():
+    # offset.uri démarrerait à la première occurrence de 'c', en arrière
+    done, played = jump("a", [track("c"), track("b"), track("c")], 3)
+    assert not done and not played
+    done, played = jump("c", [track("b"), track("c")], 2)
+    assert not done and not played
+
+
+def test_context_is_read_fresh():
+    state = {
+        "context": {"uri": "spotify:playlist:old"},
+        "item": track("a"),
+        "device": {"id": "d1"},
+    }
+
+    async def fetch():
+        return dict(state)
+
+    async def run():
+        playback = PlaybackState(logging.getLogger("test"), fetch, max_age=60)
+        await playback.snapshot()
+        # Lecture changée depuis un autre appareil : l'instantané en cache est périmé
+        state["context"] = {"uri": "spotify:playlist:new"}
+        state["device"] = {"id": "d2"}
+        api = Api([track("b"), track("c")])
+        client = SimpleNamespace(
+            api=api,
+            fanout=asyncio.Semaphore(4),
+            playback=playback,
+            logger=logging.getLogger("test"),
+        )
+        return await Client._jump_in_context(client, 2), api
+
+    done, api = asyncio.run(run())
+    assert done and api.played[0]["context_uri"] == "spotify:playlist:new"
+    assert api.devices == ["d2"]
@@ -0,0 +1,23 @@
+import os
+import stat
+
+from spotify_mcp.store import SharedStore
+
+
+def test_database_and_wal_files_are_private(logger, tmp_path):
+    path = str(tmp_path / "shared.db")
+    store = SharedStore(logger, path)
+    store.put_token("tenant", {"access_token": "secret"})
+    try:
+        for name in (path, path + "-wal", path + "-shm"):
+            assert stat.S_IMODE(os.stat(name).st_mode) == 0o600
+        assert store.get_token("tenant") == {"access_token": "secret"}
+    finally:
+        store.close()
+
+
+def test_existing_database_is_made_private(logger, tmp_path):
+    path = tmp_path / "shared.db"
+    path.touch(mode=0o644)
+    SharedStore(logger, str(path)).close()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
@@ -0,0 +1,68 @@
+import asyncio
+import json
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from spotify_mcp import output
+from spotify_mcp.spotify_api import TOP_SNAPSHOT_MAX_LIMIT, Client
+
+N_TRACKS = 400
+
+
+def rankings() -> dict:
+    """Three rankings of 200 tracks with long names, partly reordered."""
+    tracks = [
+        {
+            "id": f"{n:022d}",
+            "name": f"A rather long track name, number {n:04d} (Remastered)",
+            "artists": [{"name": f"Some Artist With A Long Name {n % 40}"}],
+        }
+        for n in range(N_TRACKS)
+    ]
+    rng = random.Random(1)
+    ranked = {}
+    for time_range, start in (
+        ("long_term", 0),
+        ("medium_term", 50),
+        ("short_term", 100),
+    ):
+        window = tracks[start : start + 200]
+        ranked[time_range] = sorted(window, key=lambda t: rng.random())
+    return ranked
+
+
+def snapshot(limit: int) -> dict:
+    ranked = rankings()
+
+    async def top_page(item_type, time_range, offset=0):
+        items = ranked[time_range]
+        return {"items": items[offset : offset + 50], "total": len(items)}
+
+    client = SimpleNamespace(fanout=asyncio.Semaphore(4), _top_page=top_page)
+    return asyncio.run(Client.get_top_snapshot(client, "tracks", limit))
+
+
+def test_snapshot_fits_the_output_budget():
+    result = snapshot(TOP_SNAPSHOT_MAX_LIMIT)
+    text = output.dumps(result, max_chars=40000)
+    assert len(text) <= 40000 and "truncated" not in json.loads(text)
+    assert result["ranked"] == {r: 200 for r in result["ranges"]}
+    for time_range, ranking in result["ranges"].items():
+        assert [t["rank"] for t in ranking] == list(range(1, 26))
+    for changes in ("rising", "falling", "new", "gone"):
+        assert len(result[changes]) == TOP_SNAPSHOT_MAX_LIMIT
+
+
+def test_changes_cover_the_whole_rankings():
+    result = snapshot(5)
+    # Les 100 premiers titres de long_term ne sont plus dans short_term
+    assert len(result["gone"]) == 5
+    assert any(t["rank"] > 5 for t in result["rising"] + result["falling"])
+
+
+def test_all_rejects_a_limit_over_the_snapshot_max():
+    client = Client.__new__(Client)
+    with pytest.raises(ValueError):
+        asyncio.run(client.get_top_items("tracks", "all", TOP_SNAPSHOT_MAX_LIMIT + 1))
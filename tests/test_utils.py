@@ -0,0 +1,26 @@
+from spotify_mcp.utils import rank_changes
+
+
+def ranked(*ids: str) -> list[dict]:
+    return [{"id": item_id, "rank": rank} for rank, item_id in enumerate(ids, 1)]
+
+
+def test_rank_changes():
+    changes = rank_changes(ranked("a", "b", "c", "d"), ranked("d", "a", "e", "c"))
+    assert [(i["id"], i["previous_rank"], i["change"]) for i in changes["rising"]] == [
+        ("d", 4, 3)
+    ]
+    assert [(i["id"], i["change"]) for i in changes["falling"]] == [
+        ("a", -1),
+        ("c", -1),
+    ]
+    assert [i["id"] for i in changes["new"]] == ["e"]
+    assert [i["id"] for i in changes["gone"]] == ["b"]
+
+
+def test_rank_changes_limit_keeps_biggest_moves():
+    before = ranked("a", "b", "c", "d", "e")
+    after = ranked("e", "d", "c", "b", "a")
+    changes = rank_changes(before, after, limit=1)
+    assert [i["id"] for i in changes["rising"]] == ["e"]
+    assert [i["id"] for i in changes["falling"]] == ["a"]